@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+class ApiConfig(AppConfig):
+    name = 'api'
+
+    def ready(self):
+        # Model signal receivers (option field parsing, cache and index
+        # invalidation) live in api.signals; importing it here registers them
+        # in every process.
+        from api import signals  # noqa: F401
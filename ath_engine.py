@@ -0,0 +1,95 @@
+from datetime import date, datetime
+from decimal import Decimal
+from api.utils.option_symbol_utils import (
+    NET_LOSS_MULTIPLIERS, get_multiplier, normalize_stock_symbol, parse_option_symbols,
+)
+import numpy as np
+import pandas as pd
+
+ATH_TRADE_FIELDS = ('account_id', 'stock_name', 'quantity', 'market_value', 'price')
+
+def _to_decimal(value):
+    return Decimal(str(value)) if value is not None and not pd.isna(value) else None
+
+def _date_str(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    return None if pd.isna(value) else value
+
+def _futures_multiplier(symbol):
+    multiplier = get_multiplier(NET_LOSS_MULTIPLIERS, symbol)
+    return Decimal(str(multiplier)) if multiplier is not None else Decimal('1')
+
+def ath_trade_frame(trades):
+    # Parses each trade once: option flag, normalized symbol and the futures
+    # multiplier (1 for equities), with Decimal quantity and trade price.
+    df = pd.DataFrame.from_records(trades, columns=ATH_TRADE_FIELDS)
+    parsed = parse_option_symbols(df['stock_name'])
+    df['is_option'] = parsed['option_type'].isin(['C', 'P'])
+
+    symbols = parsed['underlying']
+    unique_symbols = symbols.dropna().unique()
+    normalized = dict(zip(unique_symbols, map(normalize_stock_symbol, unique_symbols)))
+    df['stock_symbol'] = symbols.map(normalized)
+    multipliers = {symbol: _futures_multiplier(symbol) for symbol in set(normalized.values())}
+    df['multiplier'] = df['stock_symbol'].map(multipliers)
+
+    df['quantity'] = df['quantity'].map(_to_decimal)
+    df['price'] = df['price'].map(_to_decimal)
+    return df
+
+def ath_submission_frame(submissions):
+    df = pd.DataFrame.from_records(
+        submissions, columns=['account_id', 'portfolioATHValue', 'portfolioATHDate', 'currentNAVValue']
+    )
+    df['submission'] = range(len(df))
+    df['ath_date_str'] = pd.Series([_date_str(value) for value in df['portfolioATHDate']], dtype=object)
+    return df
+
+def ath_positions(submissions, trades):
+    # One row per (submission, trade) of the submitting account.
+    return submissions[['submission', 'account_id', 'ath_date_str']].merge(trades, on='account_id')
+
+def ath_price_pairs(positions):
+    # Every (symbol, ATH date) that needs a price, once, however many
+    # accounts share it.
+    priced = positions[~positions['is_option'] & positions['stock_symbol'].notna()]
+    return list(priced[['stock_symbol', 'ath_date_str']].drop_duplicates().itertuples(index=False, name=None))
+
+def portfolio_ath_values(submissions, positions, prices):
+    # `prices` maps (symbol, date string) to a Decimal price. Returns
+    # {account_id: result} like calculate_account_ath; a later submission
+    # for the same account wins.
+    submitted = submissions['portfolioATHValue'].map(lambda v: _to_decimal(v) or Decimal('0.0'))
+    nav = submissions['currentNAVValue'].map(lambda v: _to_decimal(v) or Decimal('0.0'))
+    has_trades = set(positions['submission'])
+
+    options = positions[positions['is_option']]
+    options_value = options.groupby('submission')['market_value'].sum()
+
+    priced = positions[~positions['is_option'] & positions['stock_symbol'].notna()]
+    stock_prices = np.array(
+        [prices[key] for key in zip(priced['stock_symbol'], priced['ath_date_str'])], dtype=object
+    )
+    quantities = priced['quantity'].to_numpy() * priced['multiplier'].to_numpy()
+    value_change = pd.Series(
+        stock_prices * quantities - quantities * priced['price'].to_numpy(), dtype=object
+    ).groupby(priced['submission'].to_numpy()).sum()
+
+    results = {}
+    for row in submissions.itertuples(index=False):
+        i = row.submission
+        if i not in has_trades:
+            results[row.account_id] = {
+                "new_ath_value": Decimal('0.0'),
+                "ath_difference": -submitted[i],
+                "total_options_value": Decimal('0.0'),
+            }
+            continue
+        new_ath_value = nav[i] + value_change.get(i, Decimal('0.0'))
+        results[row.account_id] = {
+            "new_ath_value": new_ath_value,
+            "ath_difference": new_ath_value - submitted[i],
+            "total_options_value": Decimal(str(options_value.get(i, Decimal('0.0')))),
+        }
+    return results
@@ -0,0 +1,105 @@
+from contextlib import ExitStack, contextmanager
+from datetime import date
+from unittest import mock
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+
+from api.utils.price_fetcher import RateLimiter
+
+HISTORY_START = "2015-01-02"
+
+class FakeMarket:
+    # Deterministic stand-in for the parts of yfinance and yahooquery the
+    # app calls. Every ticker gets a fixed random-walk price history seeded
+    # from its name; each call sleeps `latency` seconds to mimic the network.
+    def __init__(self, latency=0.0, end=None):
+        self.latency = latency
+        self.end = pd.Timestamp(end or date.today())
+        self.calls = {"history": 0, "download": 0, "search": 0}
+        self._histories = {}
+        self._lock = threading.Lock()
+
+    def _call(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def price_history(self, ticker):
+        with self._lock:
+            history = self._histories.get(ticker)
+        if history is not None:
+            return history
+
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+        index = pd.bdate_range(HISTORY_START, self.end)
+        close = rng.uniform(20, 500) * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(index))))
+        spread = np.abs(rng.normal(0, 0.01, len(index))) * close
+        history = pd.DataFrame({
+            "Open": close + rng.normal(0, 0.005, len(index)) * close,
+            "High": close + spread,
+            "Low": close - spread,
+            "Close": close,
+            "Volume": rng.integers(1_000, 1_000_000, len(index)),
+            "Dividends": 0.0,
+            "Stock Splits": 0.0,
+        }, index=index)
+        with self._lock:
+            self._histories[ticker] = history
+        return history
+
+    def _window(self, ticker, period=None, start=None):
+        history = self.price_history(ticker)
+        if start is not None:
+            return history[history.index >= pd.Timestamp(start)]
+        if period in (None, "max"):
+            return history
+        return history.tail(int(period.rstrip("d")))
+
+    def history(self, ticker, period=None, start=None, **kwargs):
+        self._call("history")
+        return self._window(ticker, period, start).copy()
+
+    def download(self, tickers, period="5d", **kwargs):
+        self._call("download")
+        if isinstance(tickers, str):
+            tickers = tickers.split()
+        frames = {ticker: self._window(ticker, period) for ticker in tickers}
+        return pd.concat(frames, axis=1)
+
+    def search(self, query):
+        self._call("search")
+        symbol = query.strip().lstrip("$").upper()
+        return {"quotes": [{"symbol": symbol}]} if symbol.replace(" ", "").isalnum() else {"quotes": []}
+
+    def yfinance(self):
+        market = self
+
+        class Ticker:
+            def __init__(self, ticker):
+                self.ticker = ticker
+
+            def history(self, period=None, start=None, **kwargs):
+                return market.history(self.ticker, period=period, start=start, **kwargs)
+
+        return mock.Mock(Ticker=Ticker, download=self.download)
+
+    def yahooquery(self):
+        return mock.Mock(search=self.search)
+
+@contextmanager
+def fake_market(latency=0.0, end=None):
+    # Routes every yfinance / yahooquery call in the app through a FakeMarket.
+    market = FakeMarket(latency=latency, end=end)
+    yf, yq = market.yfinance(), market.yahooquery()
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch("api.utils.stock_utils.yf", yf))
+        stack.enter_context(mock.patch("api.utils.stock_utils.yq", yq))
+        stack.enter_context(mock.patch("api.utils.price_history_store.yf", yf))
+        # Nothing remote to protect: the limiter's sleeps would only swamp the
+        # timings. Simulated latency still applies per call.
+        stack.enter_context(mock.patch("api.utils.price_fetcher._rate_limiter", RateLimiter(0)))
+        yield market
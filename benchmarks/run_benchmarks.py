@@ -0,0 +1,194 @@
+"""Offline benchmarks for the import and analytics paths.
+
+Run from the Django project root with the project's settings:
+
+    DJANGO_SETTINGS_MODULE=<project>.settings python benchmarks/run_benchmarks.py --sizes 1000 10000 100000
+
+Yahoo is replaced by benchmarks.fake_market (deterministic prices, optional
+latency, no rate limiting) and all database writes are rolled back at the end
+of each size. on_commit callbacks (cache and index invalidation) still run at
+the end of each stage, as they would after a real commit, and count towards it.
+Results are written to benchmarks/results/ as JSON; pass --compare with an
+earlier file to print the change per stage.
+"""
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+sys.path.insert(0, os.getcwd())
+
+import django
+
+django.setup()
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from fake_market import fake_market
+from synthetic_csv import write_ibkr_positions_csv, write_ibkr_trades_csv, write_schwab_positions_csv
+
+from api.models import ATHSubmission
+from api.utils.position_book import POSITION_BOOK_CACHE, get_portfolio_trades_version
+from api.utils.price_cache import PRICE_CACHE
+from api.utils.trade_csv_parser import import_trades_from_csv as import_positions_csv, parse_ibkr_trades, parse_schwab_trades
+from api.utils.trade_history_csv_parser import import_trades_from_csv as import_history_csv, parse_raw_ibkr
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+# Module holding calculate_portfolio_exposures & co.; override with
+# --analytics-module if the service lives elsewhere in the project.
+ANALYTICS_MODULE = "api.services.trade_analysis_utils"
+ROWS_PER_ACCOUNT = 500
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+class _Rollback(Exception):
+    pass
+
+def measure(stage, func, market, trace_memory=True):
+    calls_before = dict(market.calls)
+    if trace_memory:
+        tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        # Everything runs inside one rolled-back transaction, so on_commit
+        # callbacks would otherwise never fire.
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            func()
+        seconds = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    result = {
+        "stage": stage,
+        "seconds": round(seconds, 4),
+        "queries": len(queries),
+        "peak_memory_mb": round(peak, 2) if peak is not None else None,
+        "yahoo_calls": {kind: market.calls[kind] - calls_before[kind] for kind in market.calls},
+    }
+    print(f"  {stage:<22} {seconds:9.3f}s {len(queries):7d} queries"
+          + (f" {peak:9.1f} MB" if peak is not None else ""))
+    return result
+
+def reset_caches():
+    cache.clear()
+    PRICE_CACHE.clear()
+    POSITION_BOOK_CACHE.clear()
+
+def bypass_result_caches():
+    # A new portfolio trades version misses the exposure result cache but
+    # leaves position books and prices warm.
+    cache.set("trades_version_all", get_portfolio_trades_version() + 1, timeout=None)
+
+def write_inputs(workdir, size, seed):
+    accounts = max(1, size // ROWS_PER_ACCOUNT)
+    files = {"ibkr_positions": [], "ibkr_trades": [], "schwab": os.path.join(workdir, "schwab.csv")}
+    for account in range(accounts):
+        rows = size // accounts + (1 if account < size % accounts else 0)
+        positions = os.path.join(workdir, f"positions_{account}.csv")
+        trades = os.path.join(workdir, f"trades_{account}.csv")
+        write_ibkr_positions_csv(positions, rows, seed=seed + account)
+        write_ibkr_trades_csv(trades, rows, seed=seed + account)
+        files["ibkr_positions"].append(positions)
+        files["ibkr_trades"].append(trades)
+    write_schwab_positions_csv(files["schwab"], size, seed=seed)
+    return files
+
+def run_size(analytics, size, latency, seed, trace_memory):
+    print(f"{size} rows")
+    stages = []
+    with tempfile.TemporaryDirectory() as workdir, override_settings(PRICE_HISTORY_DIR=os.path.join(workdir, "history")):
+        files = write_inputs(workdir, size, seed)
+        reset_caches()
+        with fake_market(latency=latency) as market:
+            def step(stage, func):
+                stages.append(measure(stage, func, market, trace_memory))
+
+            step("parse_ibkr_positions", lambda: [parse_ibkr_trades(path) for path in files["ibkr_positions"]])
+            step("parse_schwab_positions", lambda: parse_schwab_trades(files["schwab"]))
+            step("parse_ibkr_trades", lambda: [parse_raw_ibkr(path) for path in files["ibkr_trades"]])
+            try:
+                with transaction.atomic():
+                    step("import_positions", lambda: [
+                        import_positions_csv(path, account_id, "ibkr")
+                        for account_id, path in enumerate(files["ibkr_positions"], start=1)
+                    ])
+                    step("import_trade_history", lambda: [
+                        import_history_csv(path, account_id)
+                        for account_id, path in enumerate(files["ibkr_trades"], start=1)
+                    ])
+                    ATHSubmission.objects.bulk_create([
+                        ATHSubmission(account_id=account_id, portfolioATHValue=1000000,
+                                      portfolioATHDate=date(2024, 1 + account_id % 12, 1 + account_id % 28),
+                                      currentNAVValue=950000)
+                        for account_id in range(1, len(files["ibkr_positions"]) + 1)
+                    ])
+                    step("exposures_cold", lambda: analytics.calculate_portfolio_exposures(5, 5, 5))
+                    step("exposures_warm", lambda: analytics.calculate_portfolio_exposures(5, 5, 5))
+                    bypass_result_caches()
+                    step("exposures_uncached", lambda: analytics.calculate_portfolio_exposures(5, 5, 5))
+                    step("premiums", analytics.calculate_portfolio_premiums)
+                    step("aths_cold", analytics.calculate_all_portfolio_aths)
+                    step("aths_warm", analytics.calculate_all_portfolio_aths)
+                    raise _Rollback()
+            except _Rollback:
+                pass
+        reset_caches()
+    return stages
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\nCompared with {previous_path} ({previous.get('git_commit')})")
+    for size, stages in current["results"].items():
+        before = {stage["stage"]: stage for stage in previous["results"].get(size, [])}
+        for stage in stages:
+            old = before.get(stage["stage"])
+            if not old or not old["seconds"]:
+                continue
+            print(f"  {size:>7} {stage['stage']:<22} {old['seconds']:9.3f}s -> {stage['seconds']:9.3f}s"
+                  f" ({stage['seconds'] / old['seconds']:.2f}x), queries {old['queries']} -> {stage['queries']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of simulated latency per Yahoo call.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (it slows the timed code).")
+    parser.add_argument("--output", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="Earlier results file to compare against.")
+    parser.add_argument("--analytics-module", default=ANALYTICS_MODULE)
+    args = parser.parse_args()
+    analytics = importlib.import_module(args.analytics_module)
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "latency": args.latency,
+        "seed": args.seed,
+        "results": {str(size): run_size(analytics, size, args.latency, args.seed, not args.no_memory) for size in args.sizes},
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {path}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
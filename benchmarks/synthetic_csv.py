@@ -0,0 +1,87 @@
+import csv
+import random
+from datetime import date, timedelta
+
+EQUITY_SYMBOLS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "SPY", "QQQ", "SSO", "QLD", "IWM"]
+FUTURES_SYMBOLS = ["ES", "MES", "NQ", "MNQ", "YM", "MYM", "RTY"]
+TRADE_CODES = ["O", "C", "C;EP", "A;C", "A;O", "O;P"]
+
+def _money(rng, low, high):
+    return f"{rng.uniform(low, high):.2f}"
+
+def _expiry(rng, start=date(2025, 1, 3)):
+    return start + timedelta(weeks=rng.randint(0, 104))
+
+def synthetic_stock_name(rng, ibkr=True):
+    # Mix of equities, futures and options in the formats the parsers and
+    # option_symbol_utils recognise: "SPY 20DEC24 450 P" for IBKR,
+    # "SPY 12/20/2024 450.00 P" for Schwab.
+    kind = rng.random()
+    if kind < 0.45:
+        return rng.choice(EQUITY_SYMBOLS)
+    if kind < 0.55:
+        return rng.choice(FUTURES_SYMBOLS) + rng.choice("HMUZ")
+    underlying = rng.choice(EQUITY_SYMBOLS + FUTURES_SYMBOLS)
+    expiry = _expiry(rng)
+    strike = rng.randint(20, 600) * 5
+    letter = rng.choice("CP")
+    if ibkr:
+        return f"{underlying} {expiry.strftime('%d%b%y').upper()} {strike} {letter}"
+    return f"{underlying} {expiry.strftime('%m/%d/%Y')} {strike}.00 {letter}"
+
+def write_ibkr_positions_csv(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Statement", "Header", "Field Name", "Field Value"])
+        writer.writerow([
+            "Open Positions", "Header", "DataDiscriminator", "Asset Category", "Currency", "Symbol", "Quantity",
+            "Mult", "Cost Price", "Cost Basis", "Close Price", "Value", "Unrealized P/L", "Unrealized P/L %",
+        ])
+        for _ in range(rows):
+            quantity = rng.randint(-50, 200) or 1
+            price = _money(rng, 1, 900)
+            writer.writerow([
+                "Open Positions", "Data", "Summary", "Stocks", "USD", synthetic_stock_name(rng), quantity, 1,
+                _money(rng, 1, 900), _money(rng, -50000, 50000), price, _money(rng, -50000, 50000),
+                _money(rng, -5000, 5000), _money(rng, -5000, 5000),
+            ])
+
+def write_ibkr_trades_csv(path, rows, seed=0, start=date(2023, 1, 2), days=730):
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Statement", "Header", "Field Name", "Field Value"])
+        writer.writerow([
+            "Trades", "Header", "DataDiscriminator", "Asset Category", "Currency", "Symbol", "Date/Time",
+            "Quantity", "T. Price", "C. Price", "Proceeds", "Comm/Fee", "Basis", "Realized P/L", "MTM P/L", "Code",
+        ])
+        for _ in range(rows):
+            traded = start + timedelta(days=rng.randrange(days))
+            writer.writerow([
+                "Trades", "Data", "Order", "Equity and Index Options", "USD", synthetic_stock_name(rng),
+                f"{traded.isoformat()}, 10:{rng.randint(10, 59)}:00", rng.randint(-20, 20) or 1,
+                _money(rng, 0.05, 50), _money(rng, 0.05, 50), _money(rng, -20000, 20000), _money(rng, -10, 0),
+                _money(rng, -20000, 20000), _money(rng, -5000, 5000), _money(rng, -5000, 5000),
+                rng.choice(TRADE_CODES),
+            ])
+
+def write_schwab_positions_csv(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        f.write('"Positions for account Individual ...123 as of 04:00 PM ET, 2025/01/02"\n')
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow([
+            "Symbol", "Description", "Quantity", "Price", "Price Change %", "Price Change $", "Market Value",
+            "Day Change %", "Day Change $", "Cost Basis", "Gain $", "Gain %", "Security Type",
+        ])
+        for _ in range(rows):
+            writer.writerow([
+                synthetic_stock_name(rng, ibkr=False), "SYNTHETIC", rng.randint(-50, 200) or 1,
+                f"${_money(rng, 1, 900)}", "0.5%", "$1.00", f"${_money(rng, -50000, 50000)}", "0.1%", "$1.00",
+                f"${_money(rng, -50000, 50000)}", f"${_money(rng, -5000, 5000)}", "1.0%", "Equity",
+            ])
+        writer.writerow([
+            "Cash & Cash Investments", "--", "--", "--", "--", "--", f"${_money(rng, 0, 90000)}",
+            "--", "--", "--", "--", "--", "Cash and Money Market",
+        ])
@@ -0,0 +1,73 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Iterable, Iterator, List
+from django.db import models
+import queue
+import threading
+
+IMPORT_CHUNK_SIZE = 5000
+IMPORT_QUEUE_SIZE = 2
+
+_ITEM = "item"
+_DONE = "done"
+_ERROR = "error"
+
+def quantize_decimal_fields(instance: models.Model) -> models.Model:
+    # Statements carry more decimal places than the columns (4-place IBKR
+    # prices and commissions); round to each field's scale as the database
+    # would on insert, so full_clean doesn't reject rows create() accepted.
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, models.DecimalField):
+            value = getattr(instance, field.attname)
+            if value is not None:
+                exponent = Decimal(1).scaleb(-field.decimal_places)
+                setattr(instance, field.attname, Decimal(str(value)).quantize(exponent, rounding=ROUND_HALF_UP))
+    return instance
+
+def iter_chunks(records: Iterable[Any], chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[List[Any]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_in_background(iterable: Iterable[Any], max_pending: int = IMPORT_QUEUE_SIZE) -> Iterator[Any]:
+    # Runs the producer (CSV parsing and row validation) on a worker thread so
+    # it overlaps with the caller's DB writes. The bounded queue keeps at most
+    # max_pending chunks in memory at once.
+    pending = queue.Queue(maxsize=max_pending)
+    stopped = threading.Event()
+
+    def put(message):
+        while not stopped.is_set():
+            try:
+                pending.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((_ITEM, item)):
+                    return
+            put((_DONE, None))
+        except BaseException as e:
+            put((_ERROR, e))
+
+    worker = threading.Thread(target=produce, name="csv-import-producer", daemon=True)
+    worker.start()
+    try:
+        while True:
+            kind, value = pending.get()
+            if kind == _DONE:
+                break
+            if kind == _ERROR:
+                raise value
+            yield value
+    finally:
+        stopped.set()
+        worker.join()
@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.utils import timezone
+import uuid
+
+DASHBOARD_SNAPSHOT_TIMEOUT = 3600
+
+# Last snapshot this process has unpickled, per name: serving it again only
+# costs a read of the latest pointer.
+_loaded = {}
+
+def _version_key(name):
+    return f"dashboard_snapshot_{name}_version"
+
+def _latest_key(name):
+    return f"dashboard_snapshot_{name}_latest"
+
+def _snapshot_key(name, snapshot_id):
+    return f"dashboard_snapshot_{name}_{snapshot_id}"
+
+def _next_version(name):
+    cache.add(_version_key(name), 0, timeout=None)
+    try:
+        return cache.incr(_version_key(name))
+    except ValueError:
+        cache.set(_version_key(name), 1, timeout=None)
+        return 1
+
+def store_snapshot(name, data, params=None, data_version=None, timeout=DASHBOARD_SNAPSHOT_TIMEOUT):
+    # Each refresh is written under its own id before the latest pointer
+    # moves to it, so readers never see a half-written snapshot. The id is
+    # unique even when the version counter restarts after a cache flush.
+    # Snapshots expire if the scheduler stops, and callers fall back to
+    # computing.
+    version = _next_version(name)
+    snapshot = {
+        "name": name,
+        "id": uuid.uuid4().hex,
+        "version": version,
+        "params": params or {},
+        "data_version": data_version,
+        "computed_at": timezone.now(),
+        "data": data,
+    }
+    cache.set(_snapshot_key(name, snapshot["id"]), snapshot, timeout=timeout)
+    cache.set(_latest_key(name), snapshot["id"], timeout=timeout)
+    _loaded[name] = snapshot
+    return version
+
+def get_snapshot(name, snapshot_id):
+    snapshot = _loaded.get(name)
+    if snapshot is not None and snapshot["id"] == snapshot_id:
+        return snapshot
+    return cache.get(_snapshot_key(name, snapshot_id))
+
+def latest_snapshot(name):
+    snapshot_id = cache.get(_latest_key(name))
+    if snapshot_id is None:
+        _loaded.pop(name, None)
+        return None
+    snapshot = get_snapshot(name, snapshot_id)
+    if snapshot is None:
+        _loaded.pop(name, None)
+    else:
+        _loaded[name] = snapshot
+    return snapshot
+
+def get_ath_submissions_version():
+    return cache.get("ath_submissions_version", 0)
+
+def bump_ath_submissions_version():
+    try:
+        cache.incr("ath_submissions_version")
+    except ValueError:
+        cache.set("ath_submissions_version", 1, timeout=None)
@@ -0,0 +1,239 @@
+from decimal import Decimal
+from api.models import Trade
+from api.services.trade_analysis_utils import (
+    build_account_exposure_data, cache_position_prices, calculate_what_if_down_equity, get_price_cached, group_by_account,
+    handle_call_in_up_move, handle_call_option, handle_neither_instrument, handle_put_in_down_move,
+    handle_put_option, handle_regular_instrument_in_what_if, is_short_term, prefetch_portfolio_prices,
+)
+from api.utils.position_book import get_position_book, get_trades_version
+from api.utils.stock_utils import fetch_latest_stock_prices, get_ticker_symbols, price_prefetch_chunk_size
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.0')
+
+# One slot per running total in calculate_exposure, calculate_what_if_exposure
+# (down and up) and calculate_downward_exposure_with_expiration. A position's
+# contribution is its share of each; an account's totals are their sums.
+DELTA_COMPONENTS = (
+    "equity", "options", "futures", "daily_positions",
+    "down_exposure", "down_options", "down_equity", "down_net_loss",
+    "up_exposure", "up_options", "up_equity", "up_net_loss",
+    "short_term_contracts", "short_term_exposure", "short_term_options", "short_term_net_loss",
+    "long_term_contracts", "long_term_exposure", "long_term_options", "long_term_net_loss",
+)
+_SLOT = {name: i for i, name in enumerate(DELTA_COMPONENTS)}
+_EMPTY = tuple(0 if name.endswith("_contracts") else ZERO for name in DELTA_COMPONENTS)
+
+def _what_if_changes(percent_change, is_increase):
+    change = (Decimal(100) + percent_change) / Decimal(100) if is_increase else (Decimal(100) - percent_change) / Decimal(100)
+    double_change = (Decimal(100) + (2 * percent_change if is_increase else -2 * percent_change)) / Decimal(100)
+    return change, double_change
+
+class _AccountState:
+    __slots__ = ("book", "prices", "contributions", "totals", "current_account_value", "what_if_down_equity")
+
+class ExposureDeltaEngine:
+    # Keeps every position's contribution to its account's exposure totals,
+    # indexed by resolved ticker. A price update recomputes only the positions
+    # on that ticker and shifts their accounts' totals by the difference, so
+    # account_exposure() matches calculate_account_exposure without rerunning it.
+    def __init__(self, percentageUp, percentageDown, expirationThreshold):
+        self.percentageUp = percentageUp
+        self.percentageDown = percentageDown
+        self.expirationThreshold = expirationThreshold
+        self.down_changes = _what_if_changes(percentageDown, False)
+        self.up_changes = _what_if_changes(percentageUp, True)
+        # calculate_downward_exposure_with_expiration builds its own Decimal changes.
+        self.expiration_changes = (
+            (Decimal(100) - Decimal(percentageDown)) / Decimal(100),
+            (Decimal(100) + (Decimal(-2) * Decimal(percentageDown))) / Decimal(100),
+        )
+        self.accounts = {}
+        self.positions_by_ticker = {}
+        self._lock = threading.RLock()
+
+    def _contribution(self, book, i, stock_price):
+        values = list(_EMPTY)
+        final_price = book.strikes[i]
+        letter = book.letters[i]
+        quantity = book.quantities[i]
+
+        if letter == 'P' and final_price is not None:
+            (values[_SLOT["equity"]], values[_SLOT["options"]], values[_SLOT["futures"]]) = handle_put_option(
+                final_price, book.put_multipliers[i], quantity, stock_price, ZERO, ZERO, ZERO
+            )
+        elif letter == 'C' and final_price is not None:
+            if final_price < stock_price:
+                values[_SLOT["equity"]] = handle_call_option(
+                    final_price, book.put_multipliers[i], quantity, stock_price, ZERO
+                )
+        else:
+            values[_SLOT["equity"]], values[_SLOT["daily_positions"]] = handle_neither_instrument(
+                book.prices[i], book.equity_futures_multipliers[i], quantity, stock_price, ZERO, ZERO
+            )
+
+        for prefix, is_increase, (change, double_change) in (
+            ("down", False, self.down_changes), ("up", True, self.up_changes),
+        ):
+            adjusted_change = double_change if book.is_double_leverage[i] else change
+            adjusted_stock_price = stock_price * adjusted_change
+            slots = [_SLOT[f"{prefix}_{name}"] for name in ("exposure", "options", "net_loss")]
+            if not is_increase and letter == "P" and final_price is not None:
+                if final_price > adjusted_stock_price:
+                    moved = handle_put_in_down_move(
+                        final_price, book.put_multipliers[i], book.net_loss_multipliers[i], quantity,
+                        adjusted_stock_price, ZERO, ZERO, ZERO
+                    )
+                    for slot, value in zip(slots, moved):
+                        values[slot] = value
+            elif is_increase and letter == "C" and final_price is not None:
+                if final_price < adjusted_stock_price:
+                    moved = handle_call_in_up_move(
+                        final_price, book.call_multipliers[i], book.net_loss_multipliers[i], quantity,
+                        adjusted_stock_price, ZERO, ZERO, ZERO
+                    )
+                    for slot, value in zip(slots, moved):
+                        values[slot] = value
+            elif letter not in ["C", "P"]:
+                values[_SLOT[f"{prefix}_equity"]] = handle_regular_instrument_in_what_if(
+                    letter, quantity, book.prices[i], adjusted_change, book.equity_multipliers[i], ZERO
+                )
+
+        if letter == "P" and book.expirations[i] and final_price is not None:
+            change, double_change = self.expiration_changes
+            adjusted_stock_price = stock_price * (double_change if book.is_double_leverage[i] else change)
+            if final_price > adjusted_stock_price:
+                term = "short_term" if is_short_term(book.expirations[i], threshold_days=self.expirationThreshold) else "long_term"
+                values[_SLOT[f"{term}_contracts"]] = 1
+                moved = handle_put_in_down_move(
+                    final_price, book.put_multipliers[i], book.net_loss_multipliers[i], quantity,
+                    adjusted_stock_price, ZERO, ZERO, ZERO
+                )
+                for name, value in zip(("exposure", "options", "net_loss"), moved):
+                    values[_SLOT[f"{term}_{name}"]] = value
+
+        return tuple(values)
+
+    def _price(self, ticker):
+        return get_price_cached(ticker) if ticker else ZERO
+
+    def add_account(self, account_id, trades=None):
+        book = get_position_book(account_id, trades)
+        state = _AccountState()
+        state.book = book
+        state.prices = [self._price(ticker) for ticker in book.tickers]
+        state.contributions = [self._contribution(book, i, state.prices[i]) for i in book]
+        state.totals = [sum(column, start) for column, start in zip(zip(*state.contributions), _EMPTY)] or list(_EMPTY)
+        current_account_value = ZERO
+        for i in book:
+            current_account_value += book.market_values[i]
+        state.current_account_value = current_account_value
+        state.what_if_down_equity = calculate_what_if_down_equity(book, self.percentageDown)
+
+        with self._lock:
+            self.remove_account(account_id)
+            self.accounts[account_id] = state
+            for i, ticker in enumerate(book.tickers):
+                if ticker:
+                    self.positions_by_ticker.setdefault(ticker, {}).setdefault(account_id, []).append(i)
+        return state
+
+    def remove_account(self, account_id):
+        with self._lock:
+            state = self.accounts.pop(account_id, None)
+            if state is None:
+                return
+            for ticker in set(state.book.tickers):
+                positions = self.positions_by_ticker.get(ticker)
+                if positions is not None:
+                    positions.pop(account_id, None)
+                    if not positions:
+                        del self.positions_by_ticker[ticker]
+
+    def update_prices(self, prices):
+        # prices: {ticker: Decimal}. Returns the accounts whose totals moved.
+        changed = set()
+        with self._lock:
+            for ticker, price in prices.items():
+                for account_id, indices in self.positions_by_ticker.get(ticker, {}).items():
+                    state = self.accounts[account_id]
+                    for i in indices:
+                        if state.prices[i] == price:
+                            continue
+                        old = state.contributions[i]
+                        new = self._contribution(state.book, i, price)
+                        state.totals = [total - before + after for total, before, after in zip(state.totals, old, new)]
+                        state.contributions[i] = new
+                        state.prices[i] = price
+                        changed.add(account_id)
+        return changed
+
+    def refresh_prices(self, chunk_size=price_prefetch_chunk_size):
+        # Downloads every tracked ticker in bulk and applies only the ones
+        # that moved. The quotes also go into PRICE_CACHE, so an account
+        # rebuilt by add_account prices at the same quotes as the rest.
+        with self._lock:
+            tickers = list(self.positions_by_ticker)
+        symbols = get_ticker_symbols(tickers)
+        quotes, failed = fetch_latest_stock_prices(
+            [symbol for symbol in symbols.values() if symbol], chunk_size=chunk_size
+        )
+        if failed:
+            logger.warning("Exposure price refresh failed for %d symbols", len(failed))
+        prices = {ticker: quotes[symbol] for ticker, symbol in symbols.items() if symbol in quotes}
+        cache_position_prices(prices)
+        return self.update_prices(prices)
+
+    def account_exposure(self, account_id):
+        with self._lock:
+            state = self.accounts.get(account_id)
+            if state is None or state.book.version != get_trades_version(account_id):
+                state = self.add_account(account_id)
+            totals = dict(zip(DELTA_COMPONENTS, state.totals))
+            current_account_value = state.current_account_value
+            what_if_down_equity = state.what_if_down_equity
+
+        total_equity_value = totals["equity"]
+        result = {
+            "total_equity_value": total_equity_value,
+            "total_exposure_value": total_equity_value + totals["futures"] + totals["options"],
+            "daily_positions_value": round(totals["daily_positions"], 2),
+            "current_account_value": current_account_value,
+        }
+        down_result, up_result = (
+            {
+                "total_what_if_exposure": (
+                    totals[f"{prefix}_exposure"] + totals[f"{prefix}_equity"]
+                    + totals[f"{prefix}_options"] + totals[f"{prefix}_net_loss"]
+                ),
+                "net_loss": totals[f"{prefix}_net_loss"],
+            }
+            for prefix in ("down", "up")
+        )
+        expiration_result = {
+            term: {
+                f"{term}_contracts": totals[f"{term}_contracts"],
+                f"{term}_exposure": (
+                    totals[f"{term}_exposure"] + totals[f"{term}_options"] + totals[f"{term}_net_loss"]
+                ),
+            }
+            for term in ("short_term", "long_term")
+        }
+        return build_account_exposure_data(
+            account_id, result, down_result, up_result, what_if_down_equity, expiration_result
+        )
+
+    def exposures(self):
+        with self._lock:
+            account_ids = list(self.accounts)
+        return [self.account_exposure(account_id) for account_id in account_ids]
+
+def build_exposure_delta_engine(percentageUp, percentageDown, expirationThreshold):
+    prefetch_portfolio_prices()
+    engine = ExposureDeltaEngine(percentageUp, percentageDown, expirationThreshold)
+    for account_id, trades in group_by_account(Trade.objects.order_by('account_id', 'id')).items():
+        engine.add_account(account_id, trades)
+    return engine
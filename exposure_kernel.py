@@ -0,0 +1,113 @@
+from api.utils.position_book import as_position_book, get_position_arrays
+from api.utils.scenario_engine import (
+    down_equity_contributions, get_position_prices, scenario_change_matrix, what_if_contributions,
+)
+from decimal import Decimal
+from datetime import datetime
+import numpy as np
+
+# The float64 kernel mirrors the Decimal exposure functions in
+# trade_analysis_utils. Results are converted back to Decimal on return and
+# agree with the Decimal path to within max(ABS, REL * |value|).
+EXPOSURE_KERNEL_ABS_TOLERANCE = Decimal('0.01')
+EXPOSURE_KERNEL_REL_TOLERANCE = Decimal('1e-9')
+
+ONE_DAY = np.timedelta64(1, "D")
+
+def to_decimal(value):
+    value = float(value)
+    return None if np.isnan(value) else Decimal(repr(value))
+
+def _single_move(percent_change, is_increase):
+    percent_change = float(percent_change)
+    return np.array([percent_change if is_increase else -percent_change]), np.array([bool(is_increase)])
+
+def calculate_exposure_fast(trades, price_lookup):
+    book = as_position_book(trades)
+    arrays = get_position_arrays(book)
+    stock_prices = get_position_prices(book, price_lookup)
+    strikes = arrays["strikes"]
+    quantities = arrays["quantities"]
+
+    put_mult = arrays["put_multipliers"]
+    has_put_mult = ~np.isnan(put_mult)
+    option_mult = np.where(has_put_mult, put_mult, -100.0)
+    put_value = strikes * option_mult * quantities
+    put_itm = arrays["is_put"] & (strikes > stock_prices)
+    itm_calls = arrays["is_call"] & (strikes < stock_prices)
+    regular = ~arrays["is_option"]
+
+    equity_mult = arrays["equity_futures_multipliers"]
+    equity_mult = np.where(np.isnan(equity_mult), 1.0, equity_mult)
+
+    total_equity_value = (
+        put_value[put_itm].sum()
+        - put_value[itm_calls].sum()
+        + (quantities * arrays["prices"] * equity_mult)[regular].sum()
+    )
+    total_options_value = put_value[arrays["is_put"] & ~put_itm & ~has_put_mult].sum()
+    total_futures_contracts_values = put_value[arrays["is_put"] & ~put_itm & has_put_mult].sum()
+    daily_positions_value = (quantities * stock_prices * equity_mult)[regular].sum()
+
+    total_equity_value = to_decimal(total_equity_value)
+    return {
+        "total_equity_value": total_equity_value,
+        "total_exposure_value": total_equity_value + to_decimal(total_futures_contracts_values) + to_decimal(total_options_value),
+        "daily_positions_value": round(to_decimal(daily_positions_value), 2),
+        "current_account_value": to_decimal(arrays["market_values"].sum()),
+    }
+
+def calculate_what_if_exposure_fast(trades, percent_change, is_increase, price_lookup):
+    book = as_position_book(trades)
+    arrays = get_position_arrays(book)
+    moves, increases = _single_move(percent_change, is_increase)
+    contributions = what_if_contributions(
+        arrays, get_position_prices(book, price_lookup), scenario_change_matrix(arrays, moves), increases
+    )
+    net_loss = contributions["net_loss"].sum()
+    total_what_if_exposure = (
+        contributions["what_if_exposure"].sum()
+        + contributions["what_if_equity_value"].sum()
+        + contributions["what_if_options_value"].sum()
+        + net_loss
+    )
+    return {
+        "total_what_if_exposure": to_decimal(total_what_if_exposure),
+        "net_loss": to_decimal(net_loss),
+    }
+
+def calculate_what_if_down_equity_fast(trades, percentageDown):
+    book = as_position_book(trades)
+    arrays = get_position_arrays(book)
+    moves, _ = _single_move(percentageDown, False)
+    return to_decimal(down_equity_contributions(arrays, scenario_change_matrix(arrays, moves)).sum())
+
+def calculate_downward_exposure_with_expiration_fast(trades, percentageDown, expirationThreshold, price_lookup):
+    book = as_position_book(trades)
+    arrays = get_position_arrays(book)
+    stock_prices = get_position_prices(book, price_lookup)
+    moves, increases = _single_move(percentageDown, False)
+    change = scenario_change_matrix(arrays, moves)
+    contributions = what_if_contributions(arrays, stock_prices, change, increases)
+    exposure = (
+        contributions["what_if_exposure"] + contributions["what_if_options_value"] + contributions["net_loss"]
+    )[:, 0]
+
+    expirations = arrays["expirations"]
+    has_expiration = ~np.isnat(expirations)
+    # Same floor-to-whole-days rule as is_short_term's timedelta.days.
+    days_left = np.floor((expirations - np.datetime64(datetime.now(), "us")) / ONE_DAY)
+    itm_puts = arrays["is_put"] & has_expiration & (arrays["strikes"] > stock_prices * change[:, 0])
+    short_term = itm_puts & (days_left < expirationThreshold)
+    long_term = itm_puts & ~short_term
+
+    return {
+        "short_term": {
+            "short_term_contracts": int(short_term.sum()),
+            "short_term_exposure": to_decimal(exposure[short_term].sum()),
+        },
+        "long_term": {
+            "long_term_contracts": int(long_term.sum()),
+            "long_term_exposure": to_decimal(exposure[long_term].sum()),
+        }
+    }
@@ -0,0 +1,175 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, copy_context
+from django.conf import settings
+from django.http import JsonResponse
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# The collector for the current request (or management command) lives in a
+# context variable. With no collector bound, every hook below is a single
+# ContextVar.get() and an early return.
+_collector = ContextVar("performance_metrics", default=None)
+_NOOP_STAGE = nullcontext()
+
+class MetricsCollector:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.accounts = {}
+        self.counters = {}
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds, account_id=None):
+        with self._lock:
+            calls, total = self.stages.get(name, (0, 0.0))
+            self.stages[name] = (calls + 1, total + seconds)
+            if account_id is not None:
+                account = self.accounts.setdefault(account_id, {})
+                account[name] = account.get(name, 0.0) + seconds
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def cache_lookup(self, cache_name, hits, misses):
+        with self._lock:
+            old_hits, old_misses = self.caches.get(cache_name, (0, 0))
+            self.caches[cache_name] = (old_hits + hits, old_misses + misses)
+
+    def merge(self, other):
+        for name, (calls, seconds) in other.stages.items():
+            with self._lock:
+                old_calls, old_seconds = self.stages.get(name, (0, 0.0))
+                self.stages[name] = (old_calls + calls, old_seconds + seconds)
+        for account_id, stages in other.accounts.items():
+            with self._lock:
+                account = self.accounts.setdefault(account_id, {})
+                for name, seconds in stages.items():
+                    account[name] = account.get(name, 0.0) + seconds
+        for name, amount in other.counters.items():
+            self.incr(name, amount)
+        for name, (hits, misses) in other.caches.items():
+            self.cache_lookup(name, hits, misses)
+
+    def summary(self):
+        with self._lock:
+            return {
+                "elapsed_seconds": round(time.perf_counter() - self.started, 6),
+                "stages": {
+                    name: {"calls": calls, "seconds": round(seconds, 6)}
+                    for name, (calls, seconds) in self.stages.items()
+                },
+                "accounts": {
+                    account_id: {name: round(seconds, 6) for name, seconds in stages.items()}
+                    for account_id, stages in self.accounts.items()
+                },
+                "counters": dict(self.counters),
+                "caches": {
+                    name: {
+                        "hits": hits,
+                        "misses": misses,
+                        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+                    }
+                    for name, (hits, misses) in self.caches.items()
+                },
+            }
+
+PROCESS_METRICS = MetricsCollector()
+
+class _Stage:
+    __slots__ = ("collector", "name", "account_id", "started")
+
+    def __init__(self, collector, name, account_id):
+        self.collector = collector
+        self.name = name
+        self.account_id = account_id
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.collector.add_stage(self.name, time.perf_counter() - self.started, self.account_id)
+        return False
+
+def instrumentation_enabled():
+    return getattr(settings, "PERFORMANCE_INSTRUMENTATION", False)
+
+def stage(name, account_id=None):
+    collector = _collector.get()
+    if collector is None:
+        return _NOOP_STAGE
+    return _Stage(collector, name, account_id)
+
+def count(name, amount=1):
+    collector = _collector.get()
+    if collector is not None:
+        collector.incr(name, amount)
+
+def cache_lookup(cache_name, hit=None, hits=0, misses=0):
+    collector = _collector.get()
+    if collector is None:
+        return
+    if hit is not None:
+        hits, misses = (1, 0) if hit else (0, 1)
+    collector.cache_lookup(cache_name, hits, misses)
+
+def count_external_call(func):
+    # yfinance / yahooquery calls, keyed by the library the callable comes from.
+    collector = _collector.get()
+    if collector is not None:
+        library = (getattr(func, "__module__", None) or "unknown").split(".")[0]
+        collector.incr(f"{library}_calls")
+
+def propagate(func):
+    # Thread pool workers don't inherit context variables; run func in a copy
+    # of the caller's context so the collector (and any other per-run state,
+    # such as the price snapshot) applies to their work too.
+    context = copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+@contextmanager
+def collect():
+    collector = MetricsCollector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+        PROCESS_METRICS.merge(collector)
+
+def server_timing(summary):
+    return ", ".join(
+        f"{name};dur={stats['seconds'] * 1000:.1f}" for name, stats in summary["stages"].items()
+    )
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not instrumentation_enabled():
+            return self.get_response(request)
+
+        with collect() as collector:
+            response = self.get_response(request)
+        summary = collector.summary()
+        if summary["stages"]:
+            response["Server-Timing"] = server_timing(summary)
+        logger.info("%s %s metrics: %s", request.method, request.path, json.dumps(summary, default=str))
+        return response
+
+def metrics_view(request):
+    # Process-wide internals (per-account timings, cache ratios): staff only.
+    user = getattr(request, "user", None)
+    if user is None or not user.is_staff:
+        return JsonResponse({"detail": "Staff access required."}, status=403)
+    return JsonResponse(PROCESS_METRICS.summary())
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from api.models import Trade, Trade_History
+from api.utils.option_fields import BACKFILL_BATCH_SIZE, backfill_option_fields
+from api.utils.position_book import invalidate_position_book
+
+class Command(BaseCommand):
+    help = "Parse stock_name / symbol into the materialized option columns on trades and trade history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+        parser.add_argument('--all', action='store_true', help="Re-parse rows that were already backfilled.")
+
+    def handle(self, *args, **options):
+        for model in (Trade, Trade_History):
+            updated = backfill_option_fields(model, batch_size=options['batch_size'], reparse=options['all'])
+            self.stdout.write(f"{model.__name__}: updated {updated} rows")
+
+        for account_id in Trade.objects.values_list('account_id', flat=True).distinct():
+            invalidate_position_book(account_id)
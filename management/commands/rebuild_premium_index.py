@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from api.models import PremiumIndex
+from api.utils.premium_index import rebuild_premium_index
+
+class Command(BaseCommand):
+    help = "Rebuild the per-account, per-day running premium totals from trade history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account-id', type=int, help="Only rebuild this account.")
+
+    def handle(self, *args, **options):
+        rebuild_premium_index(options['account_id'])
+        index = PremiumIndex.objects.all()
+        if options['account_id'] is not None:
+            index = index.filter(account_id=options['account_id'])
+        self.stdout.write(f"Premium index rebuilt: {index.count()} rows")
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.services.trade_analysis_utils import DASHBOARD_SNAPSHOTS, refresh_dashboard_snapshots
+from api.utils.instrumentation import collect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = (
+        "Refresh prices and precompute the default exposure, premium and ATH result sets "
+        "as versioned dashboard snapshots. Runs once, or every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Seconds between refreshes, measured start to start. 0 runs once.")
+        parser.add_argument('--only', nargs='+', choices=sorted(DASHBOARD_SNAPSHOTS),
+                            help="Only refresh these snapshots.")
+
+    def refresh(self, names):
+        with collect() as metrics:
+            versions = refresh_dashboard_snapshots(names)
+        stages = metrics.summary()["stages"]
+        self.stdout.write(", ".join(
+            f"{name} v{version} ({stages.get(f'snapshot_{name}', {}).get('seconds', 0):.1f}s)"
+            for name, version in versions.items()
+        ))
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        if interval < 0:
+            raise CommandError("--interval must be zero or positive")
+        if not interval:
+            self.refresh(options['only'])
+            return
+
+        next_run = time.monotonic()
+        while True:
+            try:
+                self.refresh(options['only'])
+            except Exception:
+                logger.exception("Dashboard snapshot refresh failed")
+            # Keep a fixed cadence; a refresh that overruns its slot skips
+            # the missed ones rather than running back to back.
+            next_run = max(next_run + interval, time.monotonic())
+            time.sleep(max(0, next_run - time.monotonic()))
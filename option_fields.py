@@ -0,0 +1,38 @@
+from api.models import Trade, Trade_History
+from api.utils.option_symbol_utils import normalize_trade_code, parse_option_fields
+
+OPTION_FIELDS = ('underlying', 'strike', 'option_type', 'expiration_date', 'contract_multiplier')
+BACKFILL_BATCH_SIZE = 2000
+
+def option_field_values(instance):
+    if isinstance(instance, Trade_History):
+        values = parse_option_fields(instance.symbol)
+        values['normalized_code'] = normalize_trade_code(instance.code)
+    else:
+        values = parse_option_fields(instance.stock_name)
+    values['option_fields_parsed'] = True
+    return values
+
+def apply_option_fields(instance):
+    for field, value in option_field_values(instance).items():
+        setattr(instance, field, value)
+    return instance
+
+def backfill_option_fields(model, batch_size=BACKFILL_BATCH_SIZE, reparse=False):
+    queryset = model.objects.all() if reparse else model.objects.filter(option_fields_parsed=False)
+    fields = list(OPTION_FIELDS) + ['option_fields_parsed']
+    if model is Trade_History:
+        fields.append('normalized_code')
+
+    updated = 0
+    last_id = 0
+    while True:
+        # Walk by primary key so rows updated in this pass don't shift the
+        # remaining ones between batches.
+        batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not batch:
+            break
+        model.objects.bulk_update([apply_option_fields(row) for row in batch], fields, batch_size=batch_size)
+        updated += len(batch)
+        last_id = batch[-1].id
+    return updated
@@ -0,0 +1,167 @@
+from api.utils.stock_utils import FUTURES_TICKER_MAPPING, get_ticker_symbol
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import calendar
+import pandas as pd
+import re
+
+NUMBER_AND_LETTER_PATTERN = re.compile(
+    r'(\d{2}[A-Z]{3}\d{2}|\d{2}/\d{2}/\d{4}|\d{2}\d{2}\d{4})\s+(\d+\.*\d*)\s*([CP])'
+)
+STOCK_SYMBOL_PATTERN = re.compile(r"([A-Z&\s]+)")
+# Tried in order, like extract_expiration_date: Schwab's 12/20/2024, then IBKR's 20DEC24.
+EXPIRATION_DATE_FORMATS = (
+    (r'\b(\d{2}/\d{2}/\d{4})\b', "%m/%d/%Y"),
+    (r'\b(\d{2}[A-Z]{3}\d{2})\b', "%d%b%y"),
+)
+OPTION_SYMBOL_COLUMNS = ['underlying', 'strike', 'option_type', 'expiration_date']
+
+PUT_FUTURES_MULTIPLIERS = {'MES': -5, 'YM': -5, 'ES': -50, 'RTY': -50, 'MNQ': -2, 'NQ': -20, 'MYM': -0.5, 'SSO': -200, 'QLD': -200}
+CALL_FUTURES_MULTIPLIERS = {'MES': 5, 'ES': 50, 'RTY': 50, 'MNQ': 2, 'NQ': 20, 'MYM': 0.5, 'SSO': 200, 'QLD': 200}
+EQUITY_FUTURES_MULTIPLIERS = {'MES': 5, 'ES': 50, 'RTY': 50, 'MNQ': 2, 'NQ': 20, 'MYM': 0.5, 'YM': 5, 'SSO': 2, 'QLD': 2}
+EQUITY_MULTIPLIERS = {'MES': 5, 'ES': 50, 'RTY': 50, 'MNQ': 2, 'NQ': 20, 'MYM': 0.5, 'YM': 5, 'SSO': 2, 'QLD': 2}
+DOWN_EQUITY_MULTIPLIERS = {'MES': 5, 'ES': 50, 'RTY': 50, 'MNQ': 2, 'NQ': 20, 'MYM': 0.5, 'YM': 5}
+NET_LOSS_MULTIPLIERS = {'MES': 5, 'ES': 50, 'RTY': 50, 'MNQ': 2,'NQ': 20, 'MYM': 0.5, 'YM': 5}
+
+def extract_number_and_letter(option_string: str):
+    match = NUMBER_AND_LETTER_PATTERN.search(option_string)
+    if match:
+        return match.group(2), match.group(3)
+    return None, None
+
+def extract_stock_symbol(option_string: str):
+    match = STOCK_SYMBOL_PATTERN.match(option_string)
+    return match.group(1).strip() if match else None
+
+def extract_expiration_date(stock_name: str):
+    match = re.search(r'\b(\d{2}/\d{2}/\d{4})\b', stock_name)
+    if match:
+        date_str = match.group(1)
+        try:
+            return datetime.strptime(date_str, "%m/%d/%Y")
+        except ValueError:
+            pass
+    match = re.search(r'\b(\d{2}[A-Z]{3}\d{2})\b', stock_name)
+    if match:
+        date_str = match.group(1)
+        try:
+            return datetime.strptime(date_str, "%d%b%y")
+        except ValueError:
+            pass
+
+    return None
+
+def normalize_stock_symbol(symbol: str) -> str | None:
+    symbol_clean = symbol.strip().lstrip('$').upper()
+    return FUTURES_TICKER_MAPPING.get(symbol_clean, symbol_clean)
+
+def get_multiplier(multiplier_dict: dict, stock_symbol: str):
+    if stock_symbol in multiplier_dict:
+        return multiplier_dict[stock_symbol]
+    return next((multiplier for sym, multiplier in multiplier_dict.items() if sym in stock_symbol), None)
+
+def third_friday(year: int, month: int) -> datetime:
+    month_cal = calendar.monthcalendar(year, month)
+    if month_cal[0][calendar.FRIDAY]:
+        day = month_cal[2][calendar.FRIDAY]
+    else:
+        day = month_cal[3][calendar.FRIDAY]
+    return datetime(year, month, day)
+
+def get_future_contract_ticker(raw_symbol: str, expiration_date: datetime) -> str:
+    futures_prefixes = {"ES", "MES", "MYM", "YM", "NQ", "MNQ", "RTY"}
+    symbol = raw_symbol.strip().lstrip('$').upper()
+    
+    if not any(symbol.startswith(prefix) for prefix in futures_prefixes):
+        return get_ticker_symbol(symbol)
+    
+    if expiration_date.month not in (3, 6, 9, 12):
+        return get_ticker_symbol(symbol)
+    
+    year = expiration_date.year
+    if expiration_date.month == 3:
+        cutoff = third_friday(year, 3)
+        suffix = "M" if expiration_date > cutoff else "H"
+    elif expiration_date.month == 6:
+        cutoff = third_friday(year, 6)
+        suffix = "U" if expiration_date > cutoff else "M"
+    elif expiration_date.month == 9:
+        cutoff = third_friday(year, 9)
+        suffix = "Z" if expiration_date > cutoff else "U"
+    elif expiration_date.month == 12:
+        suffix = "Z"
+    else:
+        return get_ticker_symbol(symbol)
+    
+    key = f"{symbol}{suffix}"
+    return FUTURES_TICKER_MAPPING.get(key, f"{key}25.CME")
+
+def normalize_trade_code(code):
+    return code.upper() if isinstance(code, str) else None
+
+def parse_option_fields(name):
+    # Everything the analytics read out of a stock_name / symbol, parsed once
+    # so it can be stored on the row.
+    if not isinstance(name, str):
+        return {
+            'underlying': None, 'strike': None, 'option_type': None,
+            'expiration_date': None, 'contract_multiplier': None,
+        }
+    final_price, letter = extract_number_and_letter(name)
+    underlying = extract_stock_symbol(name)
+    expiration_date = extract_expiration_date(name) if underlying else None
+    return {
+        'underlying': underlying or None,
+        'strike': Decimal(final_price) if final_price else None,
+        'option_type': letter,
+        'expiration_date': expiration_date.date() if expiration_date else None,
+        'contract_multiplier': (
+            Decimal(NET_LOSS_MULTIPLIERS.get(underlying or "", 100)) if letter else None
+        ),
+    }
+
+def _parse_strike(strike):
+    # The pattern admits malformed strikes such as "100.."; those rows keep
+    # their letter and underlying, with no strike.
+    if not isinstance(strike, str):
+        return None
+    try:
+        return Decimal(strike)
+    except InvalidOperation:
+        return None
+
+def _parse_distinct_option_symbols(names):
+    options = names.str.extract(NUMBER_AND_LETTER_PATTERN)
+    underlying = names.str.extract(f"^(?:{STOCK_SYMBOL_PATTERN.pattern})", expand=False).str.strip()
+
+    expiration_date = None
+    for pattern, date_format in EXPIRATION_DATE_FORMATS:
+        dates = pd.to_datetime(names.str.extract(pattern, expand=False), format=date_format, errors="coerce")
+        expiration_date = dates if expiration_date is None else expiration_date.fillna(dates)
+
+    return pd.DataFrame({
+        'underlying': underlying.where(underlying.str.len() > 0),
+        'strike': options[1].map(_parse_strike),
+        'option_type': options[2],
+        'expiration_date': expiration_date,
+    }, columns=OPTION_SYMBOL_COLUMNS)
+
+def parse_option_symbols(names):
+    # Series counterpart of extract_stock_symbol / extract_number_and_letter /
+    # extract_expiration_date: one row per name, aligned to its index. Each
+    # distinct name is parsed once, so repeated symbols cost a lookup.
+    names = pd.Series(names, dtype=object)
+    codes, distinct = pd.factorize(names)
+    parsed = _parse_distinct_option_symbols(pd.Series(distinct, dtype=object))
+    result = parsed.reindex(codes)
+    result.index = names.index
+    return result
+
+def resolve_trade_ticker(stock_name: str):
+    raw_symbol = extract_stock_symbol(stock_name)
+    if not raw_symbol:
+        return None
+    expiration_date = extract_expiration_date(stock_name)
+    if expiration_date:
+        return get_future_contract_ticker(raw_symbol, expiration_date)
+    return get_ticker_symbol(raw_symbol)
@@ -0,0 +1,164 @@
+from django.core.cache import cache
+from datetime import datetime, time
+from decimal import Decimal
+from api.models import Trade
+from api.utils.option_symbol_utils import (
+    CALL_FUTURES_MULTIPLIERS, DOWN_EQUITY_MULTIPLIERS, EQUITY_FUTURES_MULTIPLIERS, EQUITY_MULTIPLIERS,
+    NET_LOSS_MULTIPLIERS, PUT_FUTURES_MULTIPLIERS, extract_expiration_date, extract_number_and_letter,
+    extract_stock_symbol, get_future_contract_ticker, get_multiplier,
+)
+from api.utils.stock_utils import get_ticker_symbol, get_ticker_symbols
+import numpy as np
+import threading
+
+DOUBLE_LEVERAGE_TICKERS = {"SSO", "QLD"}
+
+POSITION_BOOK_CACHE = {}
+_position_book_lock = threading.Lock()
+
+def _to_decimal(value):
+    return Decimal(value) if value is not None else None
+
+def _decimal_multiplier(multiplier_dict, stock_symbol):
+    mult = get_multiplier(multiplier_dict, stock_symbol)
+    return Decimal(mult) if mult is not None else None
+
+class PositionBook:
+    # One tuple per column, one entry per position: exposure passes index rows
+    # across columns instead of re-parsing stock_name for every pass.
+    __slots__ = (
+        "account_id", "version", "stock_names", "underlyings", "tickers", "letters", "strikes",
+        "expirations", "quantities", "prices", "market_values", "is_cash", "is_double_leverage",
+        "put_multipliers", "call_multipliers", "equity_futures_multipliers", "equity_multipliers",
+        "down_equity_multipliers", "net_loss_multipliers", "_arrays",
+    )
+
+    def __init__(self, account_id=None, version=None, **columns):
+        self.account_id = account_id
+        self.version = version
+        for name in self.__slots__[2:-1]:
+            setattr(self, name, tuple(columns.get(name, ())))
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.stock_names)
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+def _trade_option_fields(t):
+    # Rows saved since the option columns were added carry them already; older
+    # rows are parsed here until backfill_option_fields has run.
+    if getattr(t, "option_fields_parsed", False):
+        expiration_date = datetime.combine(t.expiration_date, time.min) if t.expiration_date else None
+        return t.strike, t.option_type, t.underlying, expiration_date
+    final_price, letter = extract_number_and_letter(t.stock_name)
+    raw_symbol = extract_stock_symbol(t.stock_name)
+    expiration_date = extract_expiration_date(t.stock_name) if raw_symbol else None
+    return Decimal(final_price) if final_price else None, letter, raw_symbol, expiration_date
+
+def build_position_book(trades, account_id=None, version=None):
+    columns = {name: [] for name in PositionBook.__slots__[2:-1]}
+    trades = list(trades)
+    parsed = [_trade_option_fields(t) for t in trades]
+    # Resolve every symbol in one round trip; the per-row lookups below then
+    # hit the warmed cache.
+    get_ticker_symbols(raw_symbol for _, _, raw_symbol, _ in parsed if raw_symbol)
+
+    for t, (strike, letter, raw_symbol, expiration_date) in zip(trades, parsed):
+        if raw_symbol:
+            ticker = (
+                get_future_contract_ticker(raw_symbol, expiration_date)
+                if expiration_date else get_ticker_symbol(raw_symbol)
+            )
+        else:
+            ticker = None
+        underlying = raw_symbol if raw_symbol else ""
+
+        columns["stock_names"].append(t.stock_name)
+        columns["underlyings"].append(underlying)
+        columns["tickers"].append(ticker)
+        columns["letters"].append(letter)
+        columns["strikes"].append(strike)
+        columns["expirations"].append(expiration_date)
+        columns["quantities"].append(_to_decimal(t.quantity))
+        columns["prices"].append(_to_decimal(t.price))
+        columns["market_values"].append(_to_decimal(t.market_value))
+        columns["is_cash"].append("cash" in t.stock_name.lower())
+        columns["is_double_leverage"].append(ticker in DOUBLE_LEVERAGE_TICKERS)
+        columns["put_multipliers"].append(_decimal_multiplier(PUT_FUTURES_MULTIPLIERS, underlying))
+        columns["call_multipliers"].append(_decimal_multiplier(CALL_FUTURES_MULTIPLIERS, underlying))
+        columns["equity_futures_multipliers"].append(_decimal_multiplier(EQUITY_FUTURES_MULTIPLIERS, underlying))
+        columns["equity_multipliers"].append(_decimal_multiplier(EQUITY_MULTIPLIERS, underlying))
+        columns["down_equity_multipliers"].append(
+            _decimal_multiplier(DOWN_EQUITY_MULTIPLIERS, ticker) if ticker else None
+        )
+        columns["net_loss_multipliers"].append(Decimal(NET_LOSS_MULTIPLIERS.get(underlying, 100)))
+
+    return PositionBook(account_id=account_id, version=version, **columns)
+
+def _float_column(values, missing=np.nan):
+    return np.array([float(v) if v is not None else missing for v in values], dtype=np.float64)
+
+def get_position_arrays(book):
+    if book._arrays is None:
+        letters = np.array([letter or "" for letter in book.letters])
+        book._arrays = {
+            "is_put": letters == "P",
+            "is_call": letters == "C",
+            "is_option": np.isin(letters, ["C", "P"]),
+            "is_cash": np.array(book.is_cash, dtype=bool),
+            "is_double_leverage": np.array(book.is_double_leverage, dtype=bool),
+            "expirations": np.array(
+                [e if e is not None else np.datetime64("NaT") for e in book.expirations], dtype="datetime64[us]"
+            ),
+            "strikes": _float_column(book.strikes),
+            "quantities": _float_column(book.quantities),
+            "prices": _float_column(book.prices),
+            "market_values": _float_column(book.market_values),
+            "put_multipliers": _float_column(book.put_multipliers),
+            "call_multipliers": _float_column(book.call_multipliers),
+            "equity_futures_multipliers": _float_column(book.equity_futures_multipliers),
+            "equity_multipliers": _float_column(book.equity_multipliers),
+            "down_equity_multipliers": _float_column(book.down_equity_multipliers),
+            "net_loss_multipliers": _float_column(book.net_loss_multipliers),
+        }
+    return book._arrays
+
+def as_position_book(trades):
+    if isinstance(trades, PositionBook):
+        return trades
+    return build_position_book(trades)
+
+def get_trades_version(account_id):
+    return cache.get(f"trades_version_{account_id}", 0)
+
+def get_portfolio_trades_version():
+    # Moves whenever any account's trades do.
+    return cache.get("trades_version_all", 0)
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+def invalidate_position_book(account_id):
+    _bump_version(f"trades_version_{account_id}")
+    _bump_version("trades_version_all")
+    with _position_book_lock:
+        POSITION_BOOK_CACHE.pop(account_id, None)
+
+def get_position_book(account_id, trades=None):
+    version = get_trades_version(account_id)
+    with _position_book_lock:
+        book = POSITION_BOOK_CACHE.get(account_id)
+    if book is not None and book.version == version:
+        return book
+
+    if trades is None:
+        trades = Trade.objects.filter(account_id=account_id)
+    book = build_position_book(trades, account_id=account_id, version=version)
+    with _position_book_lock:
+        POSITION_BOOK_CACHE[account_id] = book
+    return book
@@ -0,0 +1,31 @@
+from django.db import models
+
+class PremiumIndex(models.Model):
+    # Running totals per account: each row holds the premium counts and P&L
+    # of every trade history row dated on or before `date`.
+    id = models.AutoField(primary_key=True)
+    account_id = models.IntegerField()
+    date = models.DateField()
+    total_contracts_sold = models.IntegerField(default=0)
+    expired_calls = models.IntegerField(default=0)
+    expired_puts = models.IntegerField(default=0)
+    calls_bought_back = models.IntegerField(default=0)
+    puts_bought_back = models.IntegerField(default=0)
+    assigned_closed_count = models.IntegerField(default=0)
+    assigned_opened_count = models.IntegerField(default=0)
+    expired_call_premiums = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    expired_put_premiums = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    pnl_calls_bought_back = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    pnl_puts_bought_back = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    assigned_closed_realized_pnl = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    assigned_opened_mtm_pnl = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.account_id} through {self.date}"
+
+    class Meta:
+        db_table = 'premium_index'
+        unique_together = ('account_id', 'date')
+        indexes = [
+            models.Index(fields=['account_id', 'date']),
+        ]
@@ -0,0 +1,221 @@
+from decimal import Decimal
+from django.db import connection, connections
+from django.db.models import Count, F, Max, Min, Q, Sum
+from api.models import Trade_History
+from api.utils.option_symbol_utils import parse_option_symbols
+from api.utils.premium_shards import (
+    NO_ACCOUNT, NO_DAY, OPTION_LETTER_CODES, SHARD_ACCOUNT, SHARD_CODE, SHARD_DAY, SHARD_LETTER, SHARD_MTM,
+    SHARD_REALIZED, SHARD_ROWS, account_ranges, shard_totals,
+)
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import django
+import numpy as np
+import os
+import pandas as pd
+
+CENT = Decimal('0.01')
+PREMIUM_HISTORY_FIELDS = ('account_id', 'symbol', 'code', 'date', 'realized_profit_loss', 'mtm_profit_loss')
+
+# (output key, option letter filter, upper-cased code). Letter "option" means
+# C or P, "other" means neither, matching process_standard_options and
+# process_assigned_trades.
+PREMIUM_COUNTS = (
+    ("total_contracts_sold", "option", "O"),
+    ("expired_calls", "C", "C;EP"),
+    ("expired_puts", "P", "C;EP"),
+    ("calls_bought_back", "C", "C"),
+    ("puts_bought_back", "P", "C"),
+    ("assigned_closed_count", "other", "A;C"),
+    ("assigned_opened_count", "other", "A;O"),
+)
+# (output key, count it sums over, P&L column)
+PREMIUM_SUMS = (
+    ("expired_call_premiums", "expired_calls", "realized_profit_loss"),
+    ("expired_put_premiums", "expired_puts", "realized_profit_loss"),
+    ("pnl_calls_bought_back", "calls_bought_back", "realized_profit_loss"),
+    ("pnl_puts_bought_back", "puts_bought_back", "realized_profit_loss"),
+    ("assigned_closed_realized_pnl", "assigned_closed_count", "realized_profit_loss"),
+    ("assigned_opened_mtm_pnl", "assigned_opened_count", "mtm_profit_loss"),
+)
+
+def load_trade_history_frame(queryset=None):
+    if queryset is None:
+        queryset = Trade_History.objects.all()
+    return pd.DataFrame.from_records(
+        queryset.values(*PREMIUM_HISTORY_FIELDS).iterator(), columns=PREMIUM_HISTORY_FIELDS
+    )
+
+def _to_cents(values):
+    # DecimalField(decimal_places=2): whole cents sum exactly in int64.
+    amounts = pd.to_numeric(values, errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+    return np.round(amounts * 100).astype(np.int64)
+
+def _from_cents(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+def _letter_mask(letters, letter):
+    is_option = letters.isin(["C", "P"]).to_numpy()
+    if letter == "option":
+        return is_option
+    if letter == "other":
+        return ~is_option
+    return (letters == letter).to_numpy()
+
+PREMIUM_KEYS = tuple(key for key, _, _ in PREMIUM_COUNTS) + tuple(key for key, _, _ in PREMIUM_SUMS)
+
+def premium_components(df):
+    # One row per trade: 0/1 for each count it falls in and its P&L in cents
+    # for each sum, alongside account_id and date.
+    valid = df["symbol"].notna() & df["code"].notna()
+    letters = parse_option_symbols(df["symbol"].where(valid))["option_type"]
+    codes = df["code"].where(valid).str.upper()
+
+    columns = {}
+    for key, letter, code in PREMIUM_COUNTS:
+        columns[key] = (valid & (codes == code)).to_numpy() & _letter_mask(letters, letter)
+    cents = {column: _to_cents(df[column]) for column in ("realized_profit_loss", "mtm_profit_loss")}
+    for key, count_key, column in PREMIUM_SUMS:
+        columns[key] = np.where(columns[count_key], cents[column], 0)
+    columns = {key: np.asarray(values, dtype=np.int64) for key, values in columns.items()}
+
+    frame = pd.DataFrame(columns)
+    frame["account_id"] = pd.array(df["account_id"], dtype="Int64")
+    frame["date"] = pd.to_datetime(df["date"])
+    return frame
+
+def premium_values(row):
+    premium = {key: int(row[key]) for key, _, _ in PREMIUM_COUNTS}
+    premium.update({key: _from_cents(row[key]) for key, _, _ in PREMIUM_SUMS})
+    return premium
+
+def premium_totals(df):
+    # One row per account (NULL account last, as in order_by('account_id')),
+    # with every premium count and P&L from a single groupby.
+    grouped = premium_components(df).groupby("account_id", dropna=False, sort=True)
+    totals = grouped[list(PREMIUM_KEYS)].sum()
+    dates = grouped["date"].agg(["min", "max"])
+
+    results = []
+    for (account_id, row), (first_date, last_date) in zip(totals.iterrows(), dates.itertuples(index=False)):
+        results.append((
+            None if pd.isna(account_id) else int(account_id),
+            premium_values(row),
+            None if pd.isna(first_date) else first_date.date(),
+            None if pd.isna(last_date) else last_date.date(),
+        ))
+    return results
+
+def _premium_filter(letter, code):
+    condition = Q(symbol__isnull=False, normalized_code=code)
+    if letter == "option":
+        return condition & Q(option_type__in=["C", "P"])
+    if letter == "other":
+        return condition & Q(option_type__isnull=True)
+    return condition & Q(option_type=letter)
+
+def premium_totals_sql(queryset=None):
+    # Same result as premium_totals, aggregated by the database from the
+    # materialized option_type / normalized_code columns.
+    if queryset is None:
+        queryset = Trade_History.objects.all()
+    filters = {key: _premium_filter(letter, code) for key, letter, code in PREMIUM_COUNTS}
+    aggregates = {key: Count('id', filter=filters[key]) for key in filters}
+    for key, count_key, column in PREMIUM_SUMS:
+        aggregates[key] = Sum(column, filter=filters[count_key])
+    rows = (
+        queryset.values('account_id')
+        .annotate(first_date=Min('date'), last_date=Max('date'), **aggregates)
+        .order_by(F('account_id').asc(nulls_last=True))
+    )
+
+    results = []
+    for row in rows:
+        premium = {key: row[key] for key, _, _ in PREMIUM_COUNTS}
+        premium.update({
+            key: (row[key] or Decimal('0')).quantize(CENT) for key, _, _ in PREMIUM_SUMS
+        })
+        results.append((row['account_id'], premium, row['first_date'], row['last_date']))
+    return results
+
+PREMIUM_CODES = tuple(dict.fromkeys(code for _, _, code in PREMIUM_COUNTS))
+PREMIUM_SHARDS_PER_PROCESS = 4
+_SHARD_COLUMNS = {"realized_profit_loss": SHARD_REALIZED, "mtm_profit_loss": SHARD_MTM}
+_COUNT_SPEC = tuple((letter, PREMIUM_CODES.index(code)) for _, letter, code in PREMIUM_COUNTS)
+_SUM_SPEC = tuple(
+    ([key for key, _, _ in PREMIUM_COUNTS].index(count_key), _SHARD_COLUMNS[column])
+    for _, count_key, column in PREMIUM_SUMS
+)
+
+def premium_columns(df):
+    # The trade history as one int64 matrix (rows per premium_shards), sorted
+    # by account: symbols and codes are reduced to small integer codes so the
+    # totals are integer masking and segment sums.
+    valid = df["symbol"].notna() & df["code"].notna()
+    letters = parse_option_symbols(df["symbol"].where(valid))["option_type"]
+    codes = df["code"].where(valid).str.upper()
+
+    columns = np.empty((SHARD_ROWS, len(df)), dtype=np.int64)
+    columns[SHARD_ACCOUNT] = pd.array(df["account_id"], dtype="Int64").to_numpy(dtype=np.int64, na_value=NO_ACCOUNT)
+    columns[SHARD_LETTER] = letters.map(OPTION_LETTER_CODES).fillna(0).to_numpy(dtype=np.int64)
+    columns[SHARD_CODE] = codes.map({code: i for i, code in enumerate(PREMIUM_CODES)}).fillna(-1).to_numpy(dtype=np.int64)
+    for column, row in _SHARD_COLUMNS.items():
+        columns[row] = _to_cents(df[column])
+    # NaT is the smallest int64, which is NO_DAY.
+    columns[SHARD_DAY] = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[D]").view(np.int64)
+    return columns[:, np.argsort(columns[SHARD_ACCOUNT], kind="stable")]
+
+def _day(value):
+    if value in (NO_DAY, np.iinfo(np.int64).max):
+        return None
+    return date.fromordinal(date(1970, 1, 1).toordinal() + int(value))
+
+def _shard_results(accounts, counts, sums, first_days, last_days):
+    for j, account_id in enumerate(accounts):
+        premium = {key: int(counts[k, j]) for k, (key, _, _) in enumerate(PREMIUM_COUNTS)}
+        premium.update({key: _from_cents(sums[k, j]) for k, (key, _, _) in enumerate(PREMIUM_SUMS)})
+        yield (
+            None if account_id == NO_ACCOUNT else int(account_id),
+            premium, _day(first_days[j]), _day(last_days[j]),
+        )
+
+def _frame_totals(df):
+    columns = premium_columns(df)
+    if not columns.shape[1]:
+        return []
+    return list(_shard_results(*shard_totals(columns, 0, columns.shape[1], _COUNT_SPEC, _SUM_SPEC)))
+
+def _account_range_totals(first_account, last_account):
+    # Runs in a pool worker: loads, parses and reduces one account range, so
+    # the parent does none of the per-row work. A None range is the rows
+    # without an account.
+    if first_account is None:
+        queryset = Trade_History.objects.filter(account_id__isnull=True)
+    else:
+        queryset = Trade_History.objects.filter(account_id__gte=first_account, account_id__lte=last_account)
+    return _frame_totals(load_trade_history_frame(queryset))
+
+def premium_totals_parallel(processes=None):
+    # Same result as premium_totals over the whole trade history. Accounts
+    # are cut into contiguous ranges of similar row counts from one grouped
+    # count; each pool worker queries, parses and totals its ranges.
+    processes = processes or os.cpu_count() or 1
+    if processes <= 1 or connection.in_atomic_block:
+        # Workers use their own connections and can't see uncommitted rows.
+        return _frame_totals(load_trade_history_frame())
+
+    account_rows = dict(Trade_History.objects.values_list('account_id').annotate(rows=Count('id')).order_by())
+    has_unassigned = account_rows.pop(None, 0) > 0
+    accounts = sorted(account_rows)
+    ranges = account_ranges(
+        accounts, [account_rows[account_id] for account_id in accounts], processes * PREMIUM_SHARDS_PER_PROCESS
+    ) if accounts else []
+    if has_unassigned:
+        ranges.append((None, None))
+    if not ranges:
+        return []
+    # Forked workers must not share the parent's database sockets.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=min(processes, len(ranges)), initializer=django.setup) as executor:
+        shards = list(executor.map(_account_range_totals, *zip(*ranges)))
+    return [result for shard in shards for result in shard]
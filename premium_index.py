@@ -0,0 +1,185 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Min, OuterRef, Subquery
+from decimal import Decimal
+from api.models import PremiumIndex, Trade_History
+from api.utils.premium_engine import (
+    PREMIUM_COUNTS, PREMIUM_HISTORY_FIELDS, PREMIUM_KEYS, PREMIUM_SUMS, load_trade_history_frame,
+    premium_components, premium_values,
+)
+from functools import partial
+import pandas as pd
+
+PREMIUM_INDEX_BATCH_SIZE = 1000
+
+def _empty_premium():
+    premium = {key: 0 for key, _, _ in PREMIUM_COUNTS}
+    premium.update({key: Decimal('0.00') for key, _, _ in PREMIUM_SUMS})
+    return premium
+
+def _row_premium(row):
+    if row is None:
+        return _empty_premium()
+    return {key: getattr(row, key) for key in PREMIUM_KEYS}
+
+def trade_history_frame(trades):
+    return pd.DataFrame.from_records(
+        [{field: getattr(t, field) for field in PREMIUM_HISTORY_FIELDS} for t in trades],
+        columns=PREMIUM_HISTORY_FIELDS,
+    )
+
+def daily_premium_deltas(df):
+    # {account_id: {date: premium}} for the given trades. Rows without an
+    # account or a date have no place in the running totals and are skipped.
+    components = premium_components(df).dropna(subset=["account_id", "date"])
+    daily = components.groupby(["account_id", "date"], sort=True)[list(PREMIUM_KEYS)].sum()
+
+    deltas = {}
+    for (account_id, day), row in daily.iterrows():
+        deltas.setdefault(int(account_id), {})[day.date()] = premium_values(row)
+    return deltas
+
+def apply_premium_deltas(account_id, deltas):
+    # Adds one account's per-day deltas into its running totals. Only rows
+    # from the earliest changed day onward are rewritten.
+    if not deltas:
+        return
+    start = min(deltas)
+    with transaction.atomic():
+        base = (
+            PremiumIndex.objects.filter(account_id=account_id, date__lt=start)
+            .order_by('-date').first()
+        )
+        previous = _row_premium(base)
+        added = _empty_premium()
+        existing = {
+            row.date: row for row in
+            PremiumIndex.objects.select_for_update().filter(account_id=account_id, date__gte=start)
+        }
+
+        updated, created = [], []
+        for day in sorted(set(existing) | set(deltas)):
+            # New total = the old running total as of this day plus every
+            # delta dated on or before it.
+            delta = deltas.get(day)
+            if delta is not None:
+                added = {key: added[key] + delta[key] for key in PREMIUM_KEYS}
+            row = existing.get(day)
+            if row is not None:
+                previous = _row_premium(row)
+            running = {key: previous[key] + added[key] for key in PREMIUM_KEYS}
+            if row is None:
+                created.append(PremiumIndex(account_id=account_id, date=day, **running))
+                continue
+            for key in PREMIUM_KEYS:
+                setattr(row, key, running[key])
+            updated.append(row)
+
+        PremiumIndex.objects.bulk_update(updated, list(PREMIUM_KEYS), batch_size=PREMIUM_INDEX_BATCH_SIZE)
+        PremiumIndex.objects.bulk_create(created, batch_size=PREMIUM_INDEX_BATCH_SIZE)
+
+def update_premium_index(trades):
+    df = trades if isinstance(trades, pd.DataFrame) else trade_history_frame(trades)
+    for account_id, deltas in daily_premium_deltas(df).items():
+        apply_premium_deltas(account_id, deltas)
+
+def rebuild_premium_index(account_id=None):
+    queryset = Trade_History.objects.all()
+    index = PremiumIndex.objects.all()
+    if account_id is not None:
+        queryset = queryset.filter(account_id=account_id)
+        index = index.filter(account_id=account_id)
+    with transaction.atomic():
+        index.delete()
+        update_premium_index(load_trade_history_frame(queryset))
+
+def _history_version_key(account_id):
+    return f"trade_history_version_{account_id}"
+
+def _indexed_version_key(account_id):
+    return f"premium_index_version_{account_id}"
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+def get_trade_history_version():
+    # Moves whenever any account's trade history does.
+    return cache.get("trade_history_version_all", 0)
+
+def bump_trade_history_version():
+    _bump_version("trade_history_version_all")
+
+def invalidate_premium_index(account_id):
+    # Trade_History rows changed outside the importer (serializer, admin):
+    # the account's running totals are rebuilt once the change commits.
+    bump_trade_history_version()
+    if account_id is None:
+        return
+    _bump_version(_history_version_key(account_id))
+    transaction.on_commit(partial(refresh_premium_index, account_id))
+
+def refresh_premium_index(account_id):
+    # One rebuild covers every change made before it started, so the
+    # callbacks queued by a bulk delete after the first are no-ops.
+    version = cache.get(_history_version_key(account_id), 0)
+    if cache.get(_indexed_version_key(account_id)) == version:
+        return
+    rebuild_premium_index(account_id)
+    cache.set(_indexed_version_key(account_id), version, timeout=None)
+
+def _latest_rows(index, **date_filter):
+    # Each account's latest row matching date_filter, in one query via a
+    # correlated lookup on the (account_id, date) unique index.
+    latest = PremiumIndex.objects.filter(account_id=OuterRef('account_id'), **date_filter).order_by('-date')
+    return index.filter(date=Subquery(latest.values('date')[:1]))
+
+def premium_ranges(start_date=None, end_date=None, account_ids=None):
+    # Premium totals for trades dated in [start_date, end_date] (either end
+    # open when None), for every indexed account or just account_ids: the
+    # running total at end_date minus the one just before start_date.
+    # Returns {account_id: (premium, first_date, last_date)} in account
+    # order from a fixed number of queries however many accounts there are;
+    # accounts with nothing in range get zero totals and no dates.
+    index = PremiumIndex.objects.all()
+    if account_ids is None:
+        account_ids = index.values_list('account_id', flat=True).distinct().order_by('account_id')
+    else:
+        index = index.filter(account_id__in=account_ids)
+    range_filter = {}
+    if start_date is not None:
+        range_filter['date__gte'] = start_date
+    if end_date is not None:
+        range_filter['date__lte'] = end_date
+
+    first_dates = (
+        PremiumIndex.objects.filter(account_id=OuterRef('account_id'), **range_filter).order_by('date')
+    )
+    end_rows = (
+        _latest_rows(index, **range_filter)
+        .annotate(first_date=Subquery(first_dates.values('date')[:1]))
+    )
+    start_rows = {}
+    if start_date is not None:
+        start_rows = {row.account_id: row for row in _latest_rows(index, date__lt=start_date)}
+
+    ranges = {account_id: (_empty_premium(), None, None) for account_id in sorted(account_ids)}
+    for end_row in end_rows:
+        end_premium = _row_premium(end_row)
+        start_premium = _row_premium(start_rows.get(end_row.account_id))
+        premium = {key: end_premium[key] - start_premium[key] for key in PREMIUM_KEYS}
+        ranges[end_row.account_id] = (premium, end_row.first_date, end_row.date)
+    return ranges
+
+def premium_range(account_id, start_date=None, end_date=None):
+    return premium_ranges(start_date, end_date, [account_id])[account_id]
+
+def indexed_date_bounds():
+    return {
+        row['account_id']: (row['first_date'], row['last_date'])
+        for row in PremiumIndex.objects.values('account_id').annotate(
+            first_date=Min('date'), last_date=Max('date')
+        )
+    }
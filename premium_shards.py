@@ -0,0 +1,50 @@
+import numpy as np
+
+# Rows of the int64 trade matrix, one column per trade sorted by account.
+SHARD_ACCOUNT, SHARD_LETTER, SHARD_CODE, SHARD_REALIZED, SHARD_MTM, SHARD_DAY = range(6)
+SHARD_ROWS = 6
+
+NO_ACCOUNT = np.iinfo(np.int64).max  # sorts NULL accounts last
+NO_DAY = np.iinfo(np.int64).min
+OPTION_LETTER_CODES = {"C": 1, "P": 2}
+
+def account_ranges(accounts, rows, shards):
+    # (first, last) account pairs cutting the sorted accounts into up to
+    # `shards` contiguous ranges of near-equal row counts; no account is
+    # split across ranges.
+    accounts, rows = np.asarray(accounts, dtype=np.int64), np.asarray(rows, dtype=np.int64)
+    starts = np.cumsum(rows) - rows
+    groups = starts * shards // max(int(rows.sum()), 1)
+    firsts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    lasts = np.r_[firsts[1:] - 1, len(accounts) - 1]
+    return list(zip(accounts[firsts].tolist(), accounts[lasts].tolist()))
+
+def shard_totals(columns, start, stop, count_spec, sum_spec):
+    # count_spec: (letter filter, code index) per count; sum_spec: (count
+    # position, P&L row) per sum. Returns per-account arrays for the slice.
+    accounts = columns[SHARD_ACCOUNT, start:stop]
+    letters = columns[SHARD_LETTER, start:stop]
+    codes = columns[SHARD_CODE, start:stop]
+    days = columns[SHARD_DAY, start:stop]
+    segments = np.flatnonzero(np.r_[True, accounts[1:] != accounts[:-1]])
+
+    masks = []
+    counts = np.empty((len(count_spec), len(segments)), dtype=np.int64)
+    for k, (letter, code) in enumerate(count_spec):
+        mask = codes == code
+        if letter == "option":
+            mask &= letters > 0
+        elif letter == "other":
+            mask &= letters == 0
+        else:
+            mask &= letters == OPTION_LETTER_CODES[letter]
+        masks.append(mask)
+        counts[k] = np.add.reduceat(mask.astype(np.int64), segments)
+
+    sums = np.empty((len(sum_spec), len(segments)), dtype=np.int64)
+    for k, (count_position, row) in enumerate(sum_spec):
+        sums[k] = np.add.reduceat(np.where(masks[count_position], columns[row, start:stop], 0), segments)
+
+    first_days = np.minimum.reduceat(np.where(days == NO_DAY, np.iinfo(np.int64).max, days), segments)
+    last_days = np.maximum.reduceat(days, segments)
+    return accounts[segments].copy(), counts, sums, first_days, last_days
@@ -0,0 +1,119 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+import time
+
+PRICE_CACHE_MAX_ENTRIES = 10000
+PRICE_CACHE_DEFAULT_TTL = 3600 * 2
+
+_MISSING = object()
+
+class TTLCache:
+    # In-process LRU cache with a per-entry TTL. Entries hold ready-to-use
+    # values (Decimal prices), so a hit costs one dict lookup under the lock.
+    def __init__(self, maxsize=PRICE_CACHE_MAX_ENTRIES, ttl=PRICE_CACHE_DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key, time.monotonic()) is not _MISSING
+
+    def _lookup(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at <= now:
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _store(self, key, value, ttl, now):
+        self._data[key] = (value, now + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl, time.monotonic())
+
+    def set_many(self, values, ttl=None):
+        with self._lock:
+            now = time.monotonic()
+            for key, value in values.items():
+                self._store(key, value, ttl, now)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key, loader, ttl=None):
+        # Only the first caller to miss a key runs loader(); concurrent callers
+        # for the same key wait for its result instead of loading it again.
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._loading[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else None,
+            }
+
+PRICE_CACHE = TTLCache()
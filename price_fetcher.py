@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from concurrent.futures import Future, ThreadPoolExecutor
+from api.utils.instrumentation import count_external_call, propagate
+import math
+import random
+import threading
+import time
+
+try:
+    from yfinance.exceptions import YFRateLimitError
+except ImportError:  # yfinance releases before the rate-limit error existed
+    YFRateLimitError = None
+
+PRICE_FETCH_MAX_WORKERS = 16
+PRICE_FETCH_RATE_LIMIT = 5.0
+PRICE_FETCH_MAX_RETRIES = 3
+PRICE_FETCH_BACKOFF_BASE = 0.5
+PRICE_FETCH_BACKOFF_MAX = 8.0
+PRICE_FETCH_LOCK_TIMEOUT = 30
+PRICE_FETCH_POLL_INTERVAL = 0.1
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+_fetch_executor = None
+_fetch_executor_lock = threading.Lock()
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+class RateLimiter:
+    # At most `rate` requests per second across every worker process: each
+    # window is a counter in the shared cache, so the limit holds however
+    # many Django workers are running (with a per-process cache backend it
+    # degrades to a per-worker limit). Rates below 1/s use windows long
+    # enough to admit one request (0.5/s -> one per 2 s); the allowance per
+    # window rounds down, so the limit is never exceeded. A caller over the
+    # limit sleeps until the next window.
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.window = 1 if self.rate >= 1 else math.ceil(1 / self.rate) if self.rate > 0 else 1
+        self.limit = max(int(self.rate * self.window), 1)
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.time()
+            window = int(now // self.window)
+            key = f"price_fetch_rate_{self.window}_{window}"
+            cache.add(key, 0, timeout=self.window + 1)
+            try:
+                used = cache.incr(key)
+            except ValueError:
+                # Expired between add and incr; take the next pass.
+                continue
+            if used <= self.limit:
+                return
+            time.sleep((window + 1) * self.window - now)
+
+def get_rate_limiter():
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(_setting("PRICE_FETCH_RATE_LIMIT", PRICE_FETCH_RATE_LIMIT))
+        return _rate_limiter
+
+def is_retryable(error):
+    # Only throttling and network failures are worth another attempt; bad
+    # symbols and parse errors fail the same way every time.
+    if YFRateLimitError is not None and isinstance(error, YFRateLimitError):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # requests' and curl_cffi's connection errors derive from OSError.
+    return isinstance(error, OSError)
+
+def call_with_backoff(func, *args, **kwargs):
+    retries = _setting("PRICE_FETCH_MAX_RETRIES", PRICE_FETCH_MAX_RETRIES)
+    base = _setting("PRICE_FETCH_BACKOFF_BASE", PRICE_FETCH_BACKOFF_BASE)
+    cap = _setting("PRICE_FETCH_BACKOFF_MAX", PRICE_FETCH_BACKOFF_MAX)
+    for attempt in range(retries + 1):
+        get_rate_limiter().acquire()
+        count_external_call(func)
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            time.sleep(min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+def _load_across_processes(key, loader, cached):
+    # Another worker process may already be fetching the same key: wait for it
+    # to publish the result instead of sending a duplicate request. If it
+    # finishes without a result (or takes too long), fetch it ourselves.
+    lock_key = f"fetch_lock_{key}"
+    lock_timeout = _setting("PRICE_FETCH_LOCK_TIMEOUT", PRICE_FETCH_LOCK_TIMEOUT)
+    if cached is not None and not cache.add(lock_key, 1, timeout=lock_timeout):
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(PRICE_FETCH_POLL_INTERVAL)
+            value = cached()
+            if value is not None:
+                return value
+            if cache.get(lock_key) is None:
+                break
+        return loader()
+
+    try:
+        return loader()
+    finally:
+        if cached is not None:
+            cache.delete(lock_key)
+
+def coalesce(key, loader, cached=None):
+    # Concurrent callers for the same key share a single loader call. `cached`
+    # reads the shared cache the loader populates; passing it also
+    # deduplicates across processes.
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _in_flight[key] = future
+    if not owner:
+        return future.result()
+
+    try:
+        result = _load_across_processes(key, loader, cached)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+def get_fetch_executor():
+    # One pool per process: fetch_concurrently calls from concurrent requests
+    # and from map_accounts' account threads all share these workers, so the
+    # number of fetch threads stays at PRICE_FETCH_MAX_WORKERS however the
+    # calls nest.
+    global _fetch_executor
+    with _fetch_executor_lock:
+        if _fetch_executor is None:
+            _fetch_executor = ThreadPoolExecutor(
+                max_workers=_setting("PRICE_FETCH_MAX_WORKERS", PRICE_FETCH_MAX_WORKERS),
+                thread_name_prefix="price-fetch",
+            )
+        return _fetch_executor
+
+def _closing_connections(func):
+    # Pool threads outlive requests, so nothing else closes the DB
+    # connections their lookups (TickerSymbol, history, ATH records) open;
+    # release them after each call rather than holding one per thread until
+    # it goes stale.
+    def run(key):
+        try:
+            return func(key)
+        finally:
+            connections.close_all()
+    return run
+
+def fetch_concurrently(func, keys):
+    keys = list(dict.fromkeys(keys))
+    max_workers = _setting("PRICE_FETCH_MAX_WORKERS", PRICE_FETCH_MAX_WORKERS)
+    # A fetch already running on the pool works through its keys inline
+    # rather than queueing behind itself.
+    nested = threading.current_thread().name.startswith("price-fetch")
+    if not max_workers or max_workers <= 1 or len(keys) <= 1 or nested:
+        return {key: func(key) for key in keys}
+    return dict(zip(keys, get_fetch_executor().map(propagate(_closing_connections(func)), keys)))
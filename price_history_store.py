@@ -0,0 +1,198 @@
+from django.conf import settings
+from django.core.cache import cache
+from decimal import Decimal
+from datetime import date, datetime, timedelta
+from api.models import TickerAllTimeHigh
+from api.utils.price_fetcher import call_with_backoff
+from urllib.parse import quote
+import numpy as np
+import yfinance as yf
+import os
+import tempfile
+import threading
+
+history_refresh_interval = 3600 * 6
+ALL_TIME_HIGH_QUANTUM = Decimal("0.000001")
+# Tickers whose "all-time high" is the high of their last few sessions only.
+# fetch_all_time_high always read ^XND over period="5d" rather than "max",
+# and XND holders' ATH figures are calibrated to that.
+RECENT_HIGH_SESSIONS = {"^XND": 5}
+
+HISTORY_DTYPE = np.dtype([
+    ("date", "datetime64[D]"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+])
+
+_loaded_histories = {}
+_ticker_locks = {}
+_ticker_locks_guard = threading.Lock()
+
+def get_history_dir():
+    return getattr(settings, "PRICE_HISTORY_DIR", os.path.join(tempfile.gettempdir(), "price_history"))
+
+def _history_path(ticker):
+    return os.path.join(get_history_dir(), f"{quote(ticker, safe='')}.npy")
+
+def _ticker_lock(ticker):
+    with _ticker_locks_guard:
+        return _ticker_locks.setdefault(ticker, threading.Lock())
+
+def _to_datetime64(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    return np.datetime64(value, "D")
+
+def load_history(ticker):
+    path = _history_path(ticker)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return np.empty(0, dtype=HISTORY_DTYPE)
+
+    cached = _loaded_histories.get(ticker)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    history = np.load(path, mmap_mode="r")
+    _loaded_histories[ticker] = (mtime, history)
+    return history
+
+def _save_history(ticker, history):
+    os.makedirs(get_history_dir(), exist_ok=True)
+    path = _history_path(ticker)
+    fd, tmp_path = tempfile.mkstemp(dir=get_history_dir(), suffix=".npy")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.ascontiguousarray(history, dtype=HISTORY_DTYPE))
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    _loaded_histories.pop(ticker, None)
+
+def _download_history(ticker, start=None):
+    stock = yf.Ticker(ticker)
+    if start is None:
+        data = call_with_backoff(stock.history, period="max", auto_adjust=False, actions=True)
+    else:
+        data = call_with_backoff(stock.history, start=start.strftime("%Y-%m-%d"), auto_adjust=False, actions=True)
+
+    history = np.empty(len(data), dtype=HISTORY_DTYPE)
+    if data.empty:
+        return history, False
+
+    index = data.index.tz_localize(None) if data.index.tz is not None else data.index
+    history["date"] = index.normalize().values.astype("datetime64[D]")
+    for column in ("open", "high", "low", "close"):
+        history[column] = data[column.capitalize()].to_numpy(dtype=np.float64)
+    has_split = "Stock Splits" in data.columns and bool((data["Stock Splits"].fillna(0) != 0).any())
+    return history[~np.isnan(history["close"])], has_split
+
+def refresh_history(ticker):
+    with _ticker_lock(ticker):
+        history = load_history(ticker)
+        if not len(history):
+            history, _ = _download_history(ticker)
+        else:
+            # Re-read the last stored bar too, in case it was saved intraday.
+            last_date = history["date"][-1].astype(date)
+            new_bars, has_split = _download_history(ticker, start=last_date)
+            if has_split:
+                # Stored bars are split-adjusted as of download time, so a new
+                # split invalidates them; start over from the full history.
+                history, _ = _download_history(ticker)
+            elif len(new_bars):
+                kept = history[history["date"] < new_bars["date"][0]]
+                history = np.concatenate([kept, new_bars])
+
+        if len(history):
+            _save_history(ticker, history)
+        cache.set(f"history_checked_{ticker}", True, timeout=history_refresh_interval)
+        return load_history(ticker) if len(history) else history
+
+def get_history(ticker, through=None):
+    history = load_history(ticker)
+    if len(history) and (through is None or history["date"][-1] >= _to_datetime64(through)):
+        return history
+    # Also covers tickers Yahoo has no bars for (delisted, unresolvable):
+    # their empty result is remembered until the next refresh interval.
+    if cache.get(f"history_checked_{ticker}"):
+        return history
+    return refresh_history(ticker)
+
+def get_price_on_date(ticker, on_date):
+    target = _to_datetime64(on_date)
+    history = get_history(ticker, through=target)
+    idx = np.searchsorted(history["date"], target)
+    if idx < len(history) and history["date"][idx] == target:
+        return float(history["close"][idx])
+    return None
+
+def get_price_range(ticker, start, end):
+    start, end = _to_datetime64(start), _to_datetime64(end)
+    history = get_history(ticker, through=end)
+    lo = np.searchsorted(history["date"], start, side="left")
+    hi = np.searchsorted(history["date"], end, side="right")
+    return history[lo:hi]
+
+def get_all_time_high(ticker):
+    history = get_history(ticker, through=date.today() - timedelta(days=1))
+    if not len(history):
+        return None
+    if ticker in RECENT_HIGH_SESSIONS:
+        history = history[-RECENT_HIGH_SESSIONS[ticker]:]
+    idx = int(np.nanargmax(history["high"]))
+    return float(history["high"][idx]), history["date"][idx].astype(date)
+
+def _high_decimal(value):
+    return Decimal(str(float(value))).quantize(ALL_TIME_HIGH_QUANTUM)
+
+def _high_matches(history, on_date, value):
+    target = _to_datetime64(on_date)
+    idx = np.searchsorted(history["date"], target)
+    if idx >= len(history) or history["date"][idx] != target:
+        return False
+    return _high_decimal(history["high"][idx]) == value
+
+def refresh_all_time_high(ticker):
+    history = get_history(ticker, through=date.today() - timedelta(days=1))
+    if not len(history):
+        return None
+    if ticker in RECENT_HIGH_SESSIONS:
+        # A moving window: nothing to keep incrementally in TickerAllTimeHigh.
+        recent = history[-RECENT_HIGH_SESSIONS[ticker]:]
+        idx = int(np.nanargmax(recent["high"]))
+        return _high_decimal(recent["high"][idx]), recent["date"][idx].astype(date)
+
+    last_bar_date = history["date"][-1].astype(date)
+    record = TickerAllTimeHigh.objects.filter(ticker=ticker).first()
+    if (
+        record is not None and record.last_bar_date is not None and record.all_time_high is not None
+        and _high_matches(history, record.all_time_high_date, record.all_time_high)
+    ):
+        if record.last_bar_date >= last_bar_date:
+            return record.all_time_high, record.all_time_high_date
+        new_bars = history[np.searchsorted(history["date"], _to_datetime64(record.last_bar_date)):]
+        idx = int(np.nanargmax(new_bars["high"]))
+        new_high = _high_decimal(new_bars["high"][idx])
+        if new_high > record.all_time_high:
+            record.all_time_high = new_high
+            record.all_time_high_date = new_bars["date"][idx].astype(date)
+        record.last_bar_date = last_bar_date
+        record.save(update_fields=["all_time_high", "all_time_high_date", "last_bar_date", "updated_at"])
+        return record.all_time_high, record.all_time_high_date
+
+    # No record yet, or the stored bars were rebuilt (e.g. after a split) and
+    # no longer agree with it: rescan the whole history once.
+    idx = int(np.nanargmax(history["high"]))
+    record, _ = TickerAllTimeHigh.objects.update_or_create(
+        ticker=ticker,
+        defaults={
+            "all_time_high": _high_decimal(history["high"][idx]),
+            "all_time_high_date": history["date"][idx].astype(date),
+            "last_bar_date": last_bar_date,
+        },
+    )
+    return record.all_time_high, record.all_time_high_date
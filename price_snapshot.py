@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.utils import timezone
+from types import MappingProxyType
+import hashlib
+
+# The snapshot an analytics run prices against. Bound for the whole run
+# (worker threads get it through instrumentation.propagate), so every figure
+# in one report sees the same price for a ticker even if the live cache
+# entry expires mid-run.
+_active_snapshot = ContextVar("price_snapshot", default=None)
+
+class PriceSnapshot:
+    # Immutable {ticker: Decimal}. The id is derived from the prices
+    # themselves, so two runs over unchanged quotes share it (and any results
+    # cached under it), in this process or another.
+    __slots__ = ("id", "prices", "created_at")
+
+    def __init__(self, prices):
+        prices = dict(sorted(prices.items()))
+        self.prices = MappingProxyType(prices)
+        self.id = hashlib.sha1(repr(list(prices.items())).encode()).hexdigest()[:16]
+        self.created_at = timezone.now()
+
+    def __contains__(self, ticker):
+        return ticker in self.prices
+
+    def __getitem__(self, ticker):
+        return self.prices[ticker]
+
+    def __len__(self):
+        return len(self.prices)
+
+def active_price_snapshot():
+    return _active_snapshot.get()
+
+@contextmanager
+def use_price_snapshot(snapshot):
+    token = _active_snapshot.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _active_snapshot.reset(token)
@@ -0,0 +1,184 @@
+from datetime import date
+from api.utils.position_book import as_position_book, get_position_arrays
+from api.utils.price_history_store import get_price_range
+from api.utils.scenario_engine import get_position_prices
+import calendar
+import numpy as np
+import re
+
+# Futures contracts (ESZ25.CME, MESH, options on ES ...) have no history that
+# reaches back to past windows; replay them on the continuous front month.
+# Micro contracts track their full-size index.
+CONTINUOUS_FUTURES = {
+    "MES": "ES=F", "ES": "ES=F", "MNQ": "NQ=F", "NQ": "NQ=F",
+    "MYM": "YM=F", "YM": "YM=F", "RTY": "RTY=F",
+}
+FUTURES_ROOT_PATTERN = re.compile(r"^(MES|ES|MNQ|NQ|MYM|YM|RTY)[HMUZ]?$")
+
+def replay_window(window):
+    # "2008" -> the calendar year, "2020-03" -> that month, or an explicit
+    # (start, end) pair of dates / ISO strings.
+    if isinstance(window, str):
+        parts = [int(part) for part in window.split("-")]
+        if len(parts) == 1:
+            return date(parts[0], 1, 1), date(parts[0], 12, 31)
+        if len(parts) == 2:
+            year, month = parts
+            return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+        raise ValueError(f"Unsupported replay window: {window}")
+    start, end = window
+    start = date.fromisoformat(start) if isinstance(start, str) else start
+    end = date.fromisoformat(end) if isinstance(end, str) else end
+    return start, end
+
+def replay_ticker(ticker, underlying):
+    root = FUTURES_ROOT_PATTERN.match((underlying or "").strip().lstrip("$").upper())
+    if root:
+        return CONTINUOUS_FUTURES[root.group(1)]
+    return ticker
+
+def replay_return_matrix(tickers, start, end, history_lookup=get_price_range):
+    # dates x tickers closes relative to each ticker's first close in the
+    # window. Days a ticker didn't trade carry its previous close; a ticker
+    # with no bars in the window stays flat and is reported as missing.
+    histories = {ticker: history_lookup(ticker, start, end) for ticker in tickers}
+    bars = [history["date"] for history in histories.values() if len(history)]
+    dates = np.unique(np.concatenate(bars)) if bars else np.empty(0, dtype="datetime64[D]")
+
+    ratios = np.ones((len(dates), len(tickers)), dtype=np.float64)
+    missing = []
+    for k, ticker in enumerate(tickers):
+        history = histories[ticker]
+        if not len(history):
+            missing.append(ticker)
+            continue
+        idx = np.maximum(np.searchsorted(history["date"], dates, side="right") - 1, 0)
+        closes = np.asarray(history["close"], dtype=np.float64)[idx]
+        ratios[:, k] = closes / closes[0]
+    return dates, ratios, missing
+
+def _history_slices(histories):
+    # A history_lookup over histories already loaded for the widest range.
+    def lookup(ticker, start, end):
+        history = histories[ticker]
+        dates = history["date"]
+        lo = np.searchsorted(dates, np.datetime64(start, "D"), side="left")
+        hi = np.searchsorted(dates, np.datetime64(end, "D"), side="right")
+        return history[lo:hi]
+    return lookup
+
+def _pad_windows(matrices):
+    # windows x days x columns, each window padded by repeating its last day
+    # so the portfolio simply holds after the window ends.
+    days = max(max(len(matrix) for matrix in matrices), 1)
+    padded = np.ones((len(matrices), days, matrices[0].shape[1]), dtype=np.float64)
+    for w, matrix in enumerate(matrices):
+        if len(matrix):
+            padded[w, :len(matrix)] = matrix
+            padded[w, len(matrix):] = matrix[-1]
+    return padded
+
+def replay_book(book, ratios, price_lookup):
+    # ratios: windows x days x positions. Every position's price path is its
+    # current price scaled by its replay ticker's move, and each day is valued
+    # with the calculate_exposure rules; the whole batch is one broadcast.
+    book = as_position_book(book)
+    arrays = get_position_arrays(book)
+    current_prices = get_position_prices(book, price_lookup)
+    prices = current_prices[None, None, :] * ratios
+
+    strikes = arrays["strikes"]
+    quantities = np.nan_to_num(arrays["quantities"])
+    is_put = arrays["is_put"] & ~np.isnan(strikes)
+    is_call = arrays["is_call"] & ~np.isnan(strikes)
+    regular = ~(is_put | is_call)
+    strikes = np.nan_to_num(strikes)
+
+    equity_mult = arrays["equity_futures_multipliers"]
+    equity_mult = np.where(np.isnan(equity_mult), 1.0, equity_mult)
+    put_mult = arrays["put_multipliers"]
+    has_put_mult = ~np.isnan(put_mult)
+    put_value = strikes * np.where(has_put_mult, put_mult, -100.0) * quantities
+
+    # Account value moves with the regular positions' prices and the options'
+    # intrinsic value, per contract multiplier as in the net-loss rule.
+    intrinsic = np.where(is_put, np.maximum(strikes - prices, 0.0), 0.0)
+    intrinsic += np.where(is_call, np.maximum(prices - strikes, 0.0), 0.0)
+    start_intrinsic = np.where(is_put, np.maximum(strikes - current_prices, 0.0), 0.0)
+    start_intrinsic += np.where(is_call, np.maximum(current_prices - strikes, 0.0), 0.0)
+    option_pnl = quantities * arrays["net_loss_multipliers"] * (intrinsic - start_intrinsic)
+    position_pnl = np.where(regular, quantities * equity_mult * (prices - current_prices), 0.0)
+    current_account_value = np.nansum(arrays["market_values"])
+    portfolio_value = current_account_value + (position_pnl + option_pnl).sum(axis=-1)
+
+    put_itm = is_put & (strikes > prices)
+    itm_calls = is_call & (strikes < prices)
+    regular_equity = np.where(regular, quantities * np.nan_to_num(arrays["prices"]) * equity_mult, 0.0).sum()
+    total_equity_value = (
+        np.where(put_itm, put_value, 0.0).sum(axis=-1)
+        - np.where(itm_calls, put_value, 0.0).sum(axis=-1)
+        + regular_equity
+    )
+    out_of_money_puts = is_put & ~put_itm
+    total_exposure_value = (
+        total_equity_value
+        + np.where(out_of_money_puts & has_put_mult, put_value, 0.0).sum(axis=-1)
+        + np.where(out_of_money_puts & ~has_put_mult, put_value, 0.0).sum(axis=-1)
+    )
+
+    peak = np.maximum.accumulate(portfolio_value, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.where(peak > 0, portfolio_value / peak - 1.0, np.nan)
+        leverage = np.where(portfolio_value != 0, total_equity_value / portfolio_value, np.nan)
+
+    return {
+        "portfolio_value": portfolio_value,
+        "drawdown": drawdown,
+        "max_drawdown": np.where(np.isnan(drawdown), 0.0, drawdown).min(axis=-1),
+        "total_equity_value": total_equity_value,
+        "total_exposure_value": total_exposure_value,
+        "leverage": leverage,
+    }
+
+def replay_windows(books, windows, price_lookup, history_lookup=get_price_range):
+    # Replays every book over every window. History is loaded once per
+    # replay ticker, spanning all windows, however many accounts hold it.
+    books = [as_position_book(book) for book in books]
+    if not books or not windows:
+        return [[] for _ in books], []
+    columns = {}
+    position_columns = []
+    for book in books:
+        position_columns.append(np.array([
+            columns.setdefault(replay_ticker(ticker, underlying), len(columns)) if ticker else -1
+            for ticker, underlying in zip(book.tickers, book.underlyings)
+        ], dtype=np.int64))
+    tickers = list(columns)
+
+    bounds = [replay_window(window) for window in windows]
+    first, last = min(start for start, _ in bounds), max(end for _, end in bounds)
+    sliced = _history_slices({ticker: history_lookup(ticker, first, last) for ticker in tickers})
+
+    spans, matrices, missing = [], [], set()
+    for window, (start, end) in zip(windows, bounds):
+        dates, ratios, window_missing = replay_return_matrix(tickers, start, end, sliced)
+        spans.append((window, start, end, dates))
+        matrices.append(np.hstack([ratios, np.ones((len(ratios), 1))]))  # last column: unpriced positions
+        missing.update(window_missing)
+    padded = _pad_windows(matrices)
+
+    results = []
+    for book, cols in zip(books, position_columns):
+        replayed = replay_book(book, padded[:, :, cols], price_lookup)
+        results.append([
+            {
+                "window": window,
+                "start": start,
+                "end": end,
+                "dates": dates,
+                **{key: values[w] if np.ndim(values[w]) == 0 else values[w][:len(dates)]
+                   for key, values in replayed.items()},
+            }
+            for w, (window, start, end, dates) in enumerate(spans)
+        ])
+    return results, sorted(missing)
@@ -0,0 +1,95 @@
+from api.utils.position_book import as_position_book, get_position_arrays
+import numpy as np
+
+def stress_ladder(start=-30, stop=30, step=1):
+    return np.arange(start, stop + step, step, dtype=np.float64)
+
+def get_position_prices(book, price_lookup):
+    prices_by_ticker = {}
+    prices = np.zeros(len(book), dtype=np.float64)
+    for i, ticker in enumerate(book.tickers):
+        if not ticker:
+            continue
+        if ticker not in prices_by_ticker:
+            prices_by_ticker[ticker] = float(price_lookup(ticker))
+        prices[i] = prices_by_ticker[ticker]
+    return prices
+
+def scenario_change_matrix(arrays, moves):
+    moves = np.asarray(moves, dtype=np.float64)
+    change = 1.0 + moves / 100.0
+    double_change = 1.0 + 2.0 * moves / 100.0
+    return np.where(arrays["is_double_leverage"][:, None], double_change[None, :], change[None, :])
+
+def what_if_contributions(arrays, stock_prices, change, is_increase):
+    # Positions x scenarios contributions to the what-if exposure buckets. Puts
+    # only count on down moves and calls on up moves, as in
+    # calculate_what_if_exposure; a 0% move is evaluated as a down move.
+    strikes = arrays["strikes"][:, None]
+    quantities = arrays["quantities"][:, None]
+    adjusted_prices = stock_prices[:, None] * change
+    is_increase = np.asarray(is_increase, dtype=bool)[None, :]
+
+    itm_puts = arrays["is_put"][:, None] & ~is_increase & (strikes > adjusted_prices)
+    itm_calls = arrays["is_call"][:, None] & is_increase & (strikes < adjusted_prices)
+
+    put_mult = arrays["put_multipliers"][:, None]
+    call_mult = arrays["call_multipliers"][:, None]
+    has_put_mult = ~np.isnan(put_mult)
+    has_call_mult = ~np.isnan(call_mult)
+    net_loss_mult = arrays["net_loss_multipliers"][:, None]
+
+    exposure = np.where(itm_puts & has_put_mult, strikes * put_mult * quantities, 0.0)
+    exposure += np.where(itm_calls & has_call_mult, strikes * call_mult * quantities, 0.0)
+    options_value = np.where(itm_puts & ~has_put_mult, strikes * -100.0 * quantities, 0.0)
+    options_value += np.where(itm_calls & ~has_call_mult, strikes * 100.0 * quantities, 0.0)
+    net_loss = np.where(itm_puts, (strikes - adjusted_prices) * net_loss_mult * quantities, 0.0)
+    net_loss += np.where(itm_calls, (adjusted_prices - strikes) * net_loss_mult * quantities, 0.0)
+
+    equity_mult = arrays["equity_multipliers"][:, None]
+    equity_value = quantities * arrays["prices"][:, None] * np.where(np.isnan(equity_mult), 1.0, equity_mult) * change
+    equity_value = np.where(arrays["is_option"][:, None], 0.0, equity_value)
+
+    return {
+        "what_if_exposure": exposure,
+        "what_if_options_value": options_value,
+        "what_if_equity_value": equity_value,
+        "net_loss": net_loss,
+    }
+
+def down_equity_contributions(arrays, change):
+    change = np.where(arrays["is_cash"][:, None] & ~arrays["is_double_leverage"][:, None], 1.0, change)
+    down_mult = arrays["down_equity_multipliers"][:, None]
+    regular = np.where(
+        np.isnan(down_mult),
+        arrays["market_values"][:, None] * change,
+        arrays["quantities"][:, None] * arrays["prices"][:, None] * change * down_mult,
+    )
+    return np.where(arrays["is_option"][:, None], arrays["market_values"][:, None], regular)
+
+def evaluate_scenarios(trades, moves, price_lookup):
+    book = as_position_book(trades)
+    moves = np.asarray(moves, dtype=np.float64)
+    arrays = get_position_arrays(book)
+    stock_prices = get_position_prices(book, price_lookup)
+    change = scenario_change_matrix(arrays, moves)
+
+    contributions = what_if_contributions(arrays, stock_prices, change, moves > 0)
+    net_loss = contributions["net_loss"].sum(axis=0)
+    total_what_if_exposure = (
+        contributions["what_if_exposure"].sum(axis=0)
+        + contributions["what_if_equity_value"].sum(axis=0)
+        + contributions["what_if_options_value"].sum(axis=0)
+        + net_loss
+    )
+    what_if_equity = down_equity_contributions(arrays, change).sum(axis=0) + net_loss
+    with np.errstate(divide="ignore", invalid="ignore"):
+        what_if_leverage = np.where(what_if_equity != 0, total_what_if_exposure / what_if_equity, np.nan)
+
+    return {
+        "moves": moves,
+        "total_what_if_exposure": total_what_if_exposure,
+        "net_loss": net_loss,
+        "what_if_equity": what_if_equity,
+        "what_if_leverage": what_if_leverage,
+    }
@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from api.models import ATHSubmission, Trade, Trade_History
+from api.utils.dashboard_snapshots import bump_ath_submissions_version
+from api.utils.option_fields import apply_option_fields
+from api.utils.position_book import invalidate_position_book
+from api.utils.premium_index import invalidate_premium_index
+
+# Connected from ApiConfig.ready(), so every process parses option fields and
+# invalidates caches on model changes whichever utility modules it happens to
+# have imported.
+
+@receiver(post_save, sender=Trade)
+@receiver(post_delete, sender=Trade)
+def _invalidate_on_trade_change(sender, instance, **kwargs):
+    invalidate_position_book(instance.account_id)
+
+@receiver(pre_save, sender=Trade)
+@receiver(pre_save, sender=Trade_History)
+def _parse_option_fields_on_save(sender, instance, **kwargs):
+    # bulk_create skips signals; the CSV importers call apply_option_fields
+    # themselves.
+    apply_option_fields(instance)
+
+@receiver(pre_save, sender=Trade_History)
+def _remember_previous_account(sender, instance, **kwargs):
+    # A row moved to another account leaves the old one's totals stale too.
+    if instance.pk is not None:
+        instance._previous_account_id = (
+            Trade_History.objects.filter(pk=instance.pk).values_list('account_id', flat=True).first()
+        )
+
+@receiver(post_save, sender=Trade_History)
+@receiver(post_delete, sender=Trade_History)
+def _invalidate_on_trade_history_change(sender, instance, **kwargs):
+    invalidate_premium_index(instance.account_id)
+    previous_account_id = getattr(instance, "_previous_account_id", None)
+    if previous_account_id != instance.account_id:
+        invalidate_premium_index(previous_account_id)
+
+@receiver(post_save, sender=ATHSubmission)
+@receiver(post_delete, sender=ATHSubmission)
+def _invalidate_on_ath_submission_change(sender, instance, **kwargs):
+    bump_ath_submissions_version()
@@ -1,17 +1,79 @@
 from django.core.cache import cache
+from django.utils import timezone
 from decimal import Decimal
 import yfinance as yf
 import yahooquery as yq
 from datetime import datetime, timedelta
+from api.models import TickerSymbol
+from api.utils.price_history_store import get_price_on_date, refresh_all_time_high
+from api.utils.price_fetcher import call_with_backoff, coalesce
+from api.utils.price_cache import PRICE_CACHE
+from api.utils.instrumentation import cache_lookup
+from functools import partial
 
 price_cache_expiry = 3600 * 2 
-all_time_high_cache_expiry = 3600 * 24 * 7
+all_time_high_cache_expiry = 3600 * 24
 price_by_date_cache_expiry = 86400 * 2
+price_prefetch_chunk_size = 100
+ticker_symbol_cache_expiry = 86400 * 30
+ticker_symbol_negative_cache_expiry = 86400
+
+MISSING_TICKER = ""
 
 INDEX_TICKERS = {"XND": "^XND", "MYM": "MYM=F", "YM": "YM=F", "ES": "ES=F", "SPX": "^SPX", "XSP": "^XSP", "DJX": "^DJX"}
 
 IGNORE_LIST = {"ESHIX", "ESMAX", "MSKE.TA", "ESM.TO", "NQMLF", "ESUD.L"}
 
+FUTURES_TICKER_MAPPING = {
+    "ESH": "ESH25.CME", "ESM": "ESM25.CME", "ESU": "ESU25.CME", "ESZ": "ESZ25.CME", "MESH": "MESH25.CME", "MESM": "MESM25.CME", "MESU": "MESU25.CME", "MESZ": "MESZ25.CME",   
+    "NQH": "NQH25.CME", "NQM": "NQM25.CME", "NQU": "NQU25.CME", "NQZ": "NQZ25.CME", "MNQH": "MNQH25.CME", "MNQM": "MNQM25.CME", "MNQU": "MNQU25.CME", "MNQZ": "MNQZ25.CME",   
+    "YMH": "YMH25.CME", "YMM": "YMM25.CME",   "YMU": "YMU25.CME",   "YMZ": "YMZ25.CME", "MYMH": "MYMH25.CBT", "MYMM": "MYMM25.CBT", "MYMU": "MYMU25.CBT", "MYMZ": "MYMZ25.CBT",   
+    "RTYH": "RTYH25.CME", "RTYM": "RTYM25.CME", "RTYU": "RTYU25.CME", "RTYZ": "RTYZ25.CME",   
+}
+
+_ticker_symbols_seeded = False
+
+def _ticker_expiry(ticker, now=None):
+    now = now or timezone.now()
+    timeout = ticker_symbol_cache_expiry if ticker else ticker_symbol_negative_cache_expiry
+    return now + timedelta(seconds=timeout)
+
+def _cache_ticker_symbol(company_name, ticker, expires_at):
+    timeout = None
+    if expires_at is not None:
+        timeout = max(int((expires_at - timezone.now()).total_seconds()), 1)
+    cache.set(f"ticker_{company_name}", ticker or MISSING_TICKER, timeout=timeout)
+
+def _search_ticker_symbol(company_name):
+    search = call_with_backoff(yq.search, company_name)
+    quotes = search.get('quotes')
+    if quotes:
+        return quotes[0]['symbol']
+    return None
+
+def seed_ticker_symbols():
+    global _ticker_symbols_seeded
+    seeds = {}
+    for mapping in (INDEX_TICKERS, FUTURES_TICKER_MAPPING):
+        for company_name, ticker in mapping.items():
+            seeds[company_name] = ticker
+            seeds.setdefault(ticker, ticker)
+
+    TickerSymbol.objects.bulk_create(
+        [TickerSymbol(company_name=name, ticker=ticker, expires_at=None) for name, ticker in seeds.items()],
+        update_conflicts=True,
+        unique_fields=['company_name'],
+        update_fields=['ticker', 'expires_at'],
+    )
+    for company_name, ticker in seeds.items():
+        _cache_ticker_symbol(company_name, ticker, None)
+    _ticker_symbols_seeded = True
+    return len(seeds)
+
+def _ensure_ticker_symbols_seeded():
+    if not _ticker_symbols_seeded:
+        seed_ticker_symbols()
+
 def get_ticker_symbol(company_name):
     if company_name in IGNORE_LIST: 
         return None
@@ -20,16 +82,113 @@ def get_ticker_symbol(company_name):
         return INDEX_TICKERS[company_name]
 
     ticker = cache.get(f"ticker_{company_name}")
-    if ticker:
-        return ticker
+    cache_lookup("ticker", hit=ticker is not None)
+    if ticker is not None:
+        return ticker or None
 
-    search = yq.search(company_name)
-    quotes = search.get('quotes')
-    if quotes:
-        ticker = quotes[0]['symbol']
-        cache.set(f"ticker_{company_name}", ticker, timeout=price_cache_expiry)
-        return ticker
-    return None
+    _ensure_ticker_symbols_seeded()
+    now = timezone.now()
+    row = TickerSymbol.objects.filter(company_name=company_name).first()
+    if row is not None and (row.expires_at is None or row.expires_at > now):
+        _cache_ticker_symbol(company_name, row.ticker, row.expires_at)
+        return row.ticker
+
+    ticker = _search_ticker_symbol(company_name)
+    expires_at = _ticker_expiry(ticker, now)
+    TickerSymbol.objects.update_or_create(
+        company_name=company_name, defaults={'ticker': ticker, 'expires_at': expires_at}
+    )
+    _cache_ticker_symbol(company_name, ticker, expires_at)
+    return ticker
+
+def get_ticker_symbols(company_names):
+    _ensure_ticker_symbols_seeded()
+
+    resolved = {}
+    pending = []
+    for company_name in dict.fromkeys(company_names):
+        if company_name in IGNORE_LIST:
+            resolved[company_name] = None
+        elif company_name in INDEX_TICKERS:
+            resolved[company_name] = INDEX_TICKERS[company_name]
+        else:
+            pending.append(company_name)
+
+    cached = cache.get_many([f"ticker_{name}" for name in pending])
+    missing = []
+    for company_name in pending:
+        ticker = cached.get(f"ticker_{company_name}")
+        if ticker is None:
+            missing.append(company_name)
+        else:
+            resolved[company_name] = ticker or None
+    cache_lookup("ticker", hits=len(pending) - len(missing), misses=len(missing))
+
+    now = timezone.now()
+    for row in TickerSymbol.objects.filter(company_name__in=missing):
+        if row.expires_at is None or row.expires_at > now:
+            resolved[row.company_name] = row.ticker
+            _cache_ticker_symbol(row.company_name, row.ticker, row.expires_at)
+
+    searched = []
+    for company_name in missing:
+        if company_name in resolved:
+            continue
+        try:
+            ticker = _search_ticker_symbol(company_name)
+        except Exception as e:
+            print(f"Error resolving ticker for {company_name}: {e}")
+            resolved[company_name] = None
+            continue
+        resolved[company_name] = ticker
+        searched.append(TickerSymbol(company_name=company_name, ticker=ticker, expires_at=_ticker_expiry(ticker, now)))
+
+    if searched:
+        TickerSymbol.objects.bulk_create(
+            searched,
+            update_conflicts=True,
+            unique_fields=['company_name'],
+            update_fields=['ticker', 'expires_at'],
+        )
+        for row in searched:
+            _cache_ticker_symbol(row.company_name, row.ticker, row.expires_at)
+
+    return resolved
+
+def _cached_decimal(key):
+    value = cache.get(key)
+    return Decimal(value) if value else None
+
+def _cached_price(key, timeout):
+    # In-process cache first; fall back to the shared Django cache and keep
+    # the converted Decimal locally so later hits skip the round trip.
+    price = PRICE_CACHE.get(key)
+    if price is not None:
+        return price
+    price = _cached_decimal(key)
+    if price is not None:
+        PRICE_CACHE.set(key, price, ttl=timeout)
+    return price
+
+def _set_cached_price(key, price, timeout):
+    cache.set(key, str(price), timeout=timeout)
+    PRICE_CACHE.set(key, price, ttl=timeout)
+
+def _download_latest_price(ticker):
+    stock = yf.Ticker(ticker)
+    data = call_with_backoff(stock.history, period="1d")
+
+    if data.empty:
+        print(f"No 1d data for {ticker}. Trying 5-day history...")
+        data = call_with_backoff(stock.history, period="5d")
+        if data.empty:
+            print(f"No 5-day data for {ticker}. Returning 0.0.")
+            return Decimal('0.0')
+
+    latest_price = data['Close'].iloc[-1]
+    price = Decimal(str(latest_price))
+    _set_cached_price(f"price_{ticker}", price, price_cache_expiry)
+    return price
 
 def fetch_latest_stock_price(company_name):
     try:
@@ -37,24 +196,13 @@ def fetch_latest_stock_price(company_name):
         if not ticker:
             return Decimal('0.0') 
 
-        cached_price = cache.get(f"price_{ticker}")
-        if cached_price:
-            return Decimal(cached_price)
+        key = f"price_{ticker}"
+        cached_price = _cached_price(key, price_cache_expiry)
+        cache_lookup("price", hit=cached_price is not None)
+        if cached_price is not None:
+            return cached_price
 
-        stock = yf.Ticker(ticker)
-        data = stock.history(period="1d")
-        
-        if data.empty:
-            print(f"No 1d data for {ticker}. Trying 5-day history...")
-            data = stock.history(period="5d")
-            if data.empty:
-                print(f"No 5-day data for {ticker}. Returning 0.0.")
-                return Decimal('0.0')
-        
-        latest_price = data['Close'].iloc[-1]  
-        price = Decimal(str(latest_price))
-        cache.set(f"price_{ticker}", str(price), timeout=price_cache_expiry)
-        return price
+        return coalesce(key, partial(_download_latest_price, ticker), cached=partial(_cached_decimal, key))
 
     except ValueError as ve:
         print(f"ValueError fetching data for {company_name}: {ve}")
@@ -63,27 +211,27 @@ def fetch_latest_stock_price(company_name):
         print(f"Error fetching data for {company_name}: {e}")
         return Decimal('0.0')
 
+def _load_all_time_high(ticker):
+    all_time_high = refresh_all_time_high(ticker)
+    if all_time_high is None:
+        return Decimal('0.0')
+    price = all_time_high[0]
+    _set_cached_price(f"all_time_high_{ticker}", price, all_time_high_cache_expiry)
+    return price
+
 def fetch_all_time_high(company_name):
     try:
         ticker = get_ticker_symbol(company_name)
         if not ticker:
             return Decimal('0.0')  
 
-        cached_all_time_high = cache.get(f"all_time_high_{ticker}")
-        if cached_all_time_high:
-            return Decimal(cached_all_time_high)
+        key = f"all_time_high_{ticker}"
+        cached_all_time_high = _cached_price(key, all_time_high_cache_expiry)
+        cache_lookup("all_time_high", hit=cached_all_time_high is not None)
+        if cached_all_time_high is not None:
+            return cached_all_time_high
 
-        period = 'max' if ticker != '^XND' else '5d'
-
-        stock = yf.Ticker(ticker)
-        data = stock.history(period=period)  
-        if not data.empty:
-            all_time_high = data['High'].max()  
-            price = Decimal(str(all_time_high))
-            cache.set(f"all_time_high_{ticker}", str(price), timeout=all_time_high_cache_expiry)
-            return price
-        else:
-            return Decimal('0.0') 
+        return coalesce(key, partial(_load_all_time_high, ticker), cached=partial(_cached_decimal, key))
 
     except ValueError as ve:
         print(f"ValueError fetching all-time high for {company_name}: {ve}")
@@ -92,6 +240,18 @@ def fetch_all_time_high(company_name):
         print(f"Error fetching all-time high for {company_name}: {e}")
         return Decimal('0.0')
 
+def _load_price_by_date(ticker, date_str, cache_key):
+    date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+    close_price = get_price_on_date(ticker, date_obj)
+
+    if close_price is None:
+        print(f"No data returned for {ticker} on {date_str}")
+        return Decimal('0.0')
+
+    price = Decimal(str(close_price))
+    _set_cached_price(cache_key, price, price_by_date_cache_expiry)
+    return price
+
 def fetch_stock_price_by_date(company_name, date_str):
     try:
         ticker = get_ticker_symbol(company_name)
@@ -99,30 +259,70 @@ def fetch_stock_price_by_date(company_name, date_str):
             return Decimal('0.0')
         
         cache_key = f"price_by_date_{ticker}_{date_str}"
-        cached_price = cache.get(cache_key)
+        cached_price = _cached_price(cache_key, price_by_date_cache_expiry)
+        cache_lookup("price_by_date", hit=cached_price is not None)
         if cached_price is not None:
-            return Decimal(cached_price)
-        
-        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-        start_date = date_str
-        end_date = (date_obj + timedelta(days=1)).strftime("%Y-%m-%d")
-        
-        stock = yf.Ticker(ticker)
-        data = stock.history(start=start_date, end=end_date, auto_adjust=False)
+            return cached_price
         
-        if data.empty:
-            print(f"No data returned for {ticker} on {date_str}")
-            return Decimal('0.0')
-        
-        if 'Close' in data.columns:
-            close_price = data['Close'].iloc[0]
-        else:
-            close_price = data.iloc[0]
-        
-        price = Decimal(str(close_price))
-        cache.set(cache_key, str(price), timeout=price_by_date_cache_expiry)
-        return price
+        return coalesce(
+            cache_key, partial(_load_price_by_date, ticker, date_str, cache_key),
+            cached=partial(_cached_decimal, cache_key),
+        )
     
     except Exception as e:
         print(f"Error fetching stock price for {company_name} on {date_str}: {e}")
         return Decimal('0.0')
+
+
+def fetch_latest_stock_prices(tickers, chunk_size=price_prefetch_chunk_size):
+    prices = {}
+    failed = []
+    pending = []
+    unseen = []
+    for ticker in dict.fromkeys(tickers):
+        cached_price = PRICE_CACHE.get(f"price_{ticker}")
+        if cached_price is not None:
+            prices[ticker] = cached_price
+        else:
+            unseen.append(ticker)
+
+    shared = cache.get_many([f"price_{ticker}" for ticker in unseen])
+    for ticker in unseen:
+        cached_price = shared.get(f"price_{ticker}")
+        if cached_price:
+            prices[ticker] = Decimal(cached_price)
+            PRICE_CACHE.set(f"price_{ticker}", prices[ticker], ttl=price_cache_expiry)
+        else:
+            pending.append(ticker)
+    cache_lookup("price", hits=len(prices), misses=len(pending))
+
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        try:
+            data = call_with_backoff(yf.download, chunk, period="5d", group_by="ticker", auto_adjust=True,
+                                     progress=False, threads=True)
+        except Exception as e:
+            print(f"Error downloading prices for {len(chunk)} tickers: {e}")
+            failed.extend(chunk)
+            continue
+
+        for ticker in chunk:
+            try:
+                if data.columns.nlevels > 1:
+                    if ticker not in data.columns.get_level_values(0):
+                        failed.append(ticker)
+                        continue
+                    closes = data[ticker]['Close'].dropna()
+                else:
+                    closes = data['Close'].dropna()
+                if closes.empty:
+                    failed.append(ticker)
+                    continue
+                price = Decimal(str(closes.iloc[-1]))
+                _set_cached_price(f"price_{ticker}", price, price_cache_expiry)
+                prices[ticker] = price
+            except Exception as e:
+                print(f"Error reading downloaded price for {ticker}: {e}")
+                failed.append(ticker)
+
+    return prices, failed
@@ -0,0 +1,134 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.test import SimpleTestCase
+from api.models import Trade
+from api.services.trade_analysis_utils import (
+    NUMERIC_BACKEND_DECIMAL, NUMERIC_BACKEND_FLOAT, calculate_account_exposure,
+)
+from api.utils.exposure_kernel import EXPOSURE_KERNEL_ABS_TOLERANCE, EXPOSURE_KERNEL_REL_TOLERANCE
+from api.utils.position_book import POSITION_BOOK_CACHE
+
+# Quotes by symbol root; futures contracts (ESZ25.CME ...) price at their root.
+PRICES = {
+    "AAPL": Decimal("190.00"), "MSFT": Decimal("410.00"), "SSO": Decimal("80.00"), "QLD": Decimal("95.00"),
+    "MES": Decimal("5000.00"), "ES": Decimal("5000.00"), "MNQ": Decimal("18000.00"), "NQ": Decimal("18000.00"),
+    "MYM": Decimal("39000.00"), "YM": Decimal("39000.00"),
+}
+EXPIRATION_THRESHOLD = 5
+
+def fake_price(ticker):
+    symbol = ticker.lstrip("^$").upper()
+    for root in sorted(PRICES, key=len, reverse=True):
+        if symbol.startswith(root):
+            return PRICES[root]
+    return Decimal("0.0")
+
+def fake_ticker(name):
+    return None if "CASH" in name.upper() else name
+
+def expiring_in(days):
+    return (date.today() + timedelta(days=days)).strftime("%d%b%y").upper()
+
+def trade(stock_name, quantity, price="0", market_value="0"):
+    return Trade(stock_name=stock_name, quantity=quantity, price=Decimal(price), market_value=Decimal(market_value))
+
+def flatten(exposure, prefix=""):
+    for key, value in exposure.items():
+        if isinstance(value, dict):
+            yield from flatten(value, prefix=f"{prefix}{key}.")
+        elif key != "account_id":
+            yield f"{prefix}{key}", value
+
+class ExposureKernelTests(SimpleTestCase):
+    # The float64 kernel must reproduce the Decimal exposure path field by
+    # field, to within max(ABS, REL * |value|).
+
+    def setUp(self):
+        POSITION_BOOK_CACHE.clear()
+        for target, replacement in (
+            ("api.utils.position_book.get_ticker_symbols", lambda names: {n: fake_ticker(n) for n in names}),
+            ("api.utils.position_book.get_ticker_symbol", fake_ticker),
+            ("api.utils.option_symbol_utils.get_ticker_symbol", fake_ticker),
+            ("api.services.trade_analysis_utils.get_price_cached", fake_price),
+        ):
+            patcher = mock.patch(target, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def assert_backends_agree(self, account_id, trades, percentageUp=5, percentageDown=5):
+        expected = dict(flatten(calculate_account_exposure(
+            account_id, trades, percentageUp, percentageDown, EXPIRATION_THRESHOLD, NUMERIC_BACKEND_DECIMAL
+        )))
+        actual = dict(flatten(calculate_account_exposure(
+            account_id, trades, percentageUp, percentageDown, EXPIRATION_THRESHOLD, NUMERIC_BACKEND_FLOAT
+        )))
+        self.assertEqual(set(expected), set(actual))
+        for field, expected_value in expected.items():
+            actual_value = actual[field]
+            with self.subTest(field=field):
+                if expected_value is None or actual_value is None:
+                    self.assertIs(actual_value, expected_value)
+                    continue
+                tolerance = max(EXPOSURE_KERNEL_ABS_TOLERANCE, abs(expected_value) * EXPOSURE_KERNEL_REL_TOLERANCE)
+                self.assertLessEqual(abs(Decimal(actual_value) - Decimal(expected_value)), tolerance)
+        return expected
+
+    def test_equity_options_either_side_of_the_money(self):
+        self.assert_backends_agree(1, [
+            trade("AAPL", 300, "150.25", "57000"),
+            trade(f"AAPL {expiring_in(30)} 200 P", -2, "4.10", "-820"),
+            trade(f"AAPL {expiring_in(30)} 185 P", -3, "2.05", "-615"),
+            trade(f"AAPL {expiring_in(30)} 180 C", -1, "11.40", "-1140"),
+            trade(f"AAPL {expiring_in(30)} 250 C", -4, "0.35", "-140"),
+            trade(f"MSFT {expiring_in(45)} 400.00 P", 2, "7.80", "1560"),
+        ])
+
+    def test_double_leverage_etfs(self):
+        self.assert_backends_agree(2, [
+            trade("SSO", 120, "72.10", "9600"),
+            trade("QLD", -40, "90.00", "-3800"),
+            trade(f"SSO {expiring_in(20)} 82 P", -5, "3.00", "-1500"),
+            trade(f"QLD {expiring_in(20)} 85 P", -2, "1.10", "-220"),
+            trade(f"QLD {expiring_in(20)} 90 C", -1, "6.00", "-600"),
+        ])
+
+    def test_index_futures_and_their_options(self):
+        self.assert_backends_agree(3, [
+            trade("MES", 2, "4950.00", "50000"),
+            trade("NQ", -1, "18100.00", "-362000"),
+            trade("MYM", 3, "38900.00", "58500"),
+            trade(f"ES {expiring_in(60)} 5200 P", -1, "210.00", "-10500"),
+            trade(f"MES {expiring_in(60)} 4800 P", -2, "40.00", "-400"),
+            trade(f"NQ {expiring_in(40)} 17000 C", -1, "1100.00", "-22000"),
+            trade(f"MNQ {expiring_in(40)} 19000 C", -3, "90.00", "-540"),
+            trade(f"ES 12/19/{date.today().year + 1} 4700.00 P", -1, "95.00", "-4750"),
+        ])
+
+    def test_cash_rows(self):
+        self.assert_backends_agree(4, [
+            trade("Cash & Cash Investments", 0, "0", "250000"),
+            trade("AAPL", 10, "180.00", "1900"),
+            trade(f"AAPL {expiring_in(30)} 170 P", -1, "1.00", "-100"),
+        ])
+
+    def test_expirations_either_side_of_the_threshold(self):
+        expected = self.assert_backends_agree(5, [
+            trade(f"AAPL {expiring_in(1)} 195 P", -1, "5.00", "-500"),
+            trade(f"AAPL {expiring_in(3)} 200 P", -2, "10.00", "-2000"),
+            trade(f"AAPL {expiring_in(EXPIRATION_THRESHOLD + 2)} 195 P", -1, "6.00", "-600"),
+            trade(f"AAPL {expiring_in(90)} 210 P", -3, "21.00", "-6300"),
+            trade(f"ES {expiring_in(2)} 5100 P", -1, "100.00", "-5000"),
+            trade(f"ES {expiring_in(40)} 5150 P", -1, "160.00", "-8000"),
+        ])
+        self.assertGreater(expected["short_term_puts_itm"], 0)
+        self.assertGreater(expected["long_term_puts_itm"], 0)
+
+    def test_larger_moves(self):
+        self.assert_backends_agree(6, [
+            trade("AAPL", 100, "150.00", "19000"),
+            trade("SSO", 50, "70.00", "4000"),
+            trade(f"AAPL {expiring_in(30)} 170 P", -2, "1.00", "-200"),
+            trade(f"ES {expiring_in(60)} 4500 P", -1, "30.00", "-1500"),
+            trade(f"NQ {expiring_in(40)} 20000 C", -1, "50.00", "-1000"),
+        ], percentageUp=15, percentageDown=25)
@@ -0,0 +1,18 @@
+from django.db import models
+
+class TickerAllTimeHigh(models.Model):
+    id = models.AutoField(primary_key=True)
+    ticker = models.CharField(max_length=50, unique=True)
+    all_time_high = models.DecimalField(max_digits=20, decimal_places=6, blank=True, null=True)
+    all_time_high_date = models.DateField(blank=True, null=True)
+    last_bar_date = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.ticker} - ATH: {self.all_time_high} on {self.all_time_high_date}"
+
+    class Meta:
+        db_table = 'ticker_all_time_highs'
+        indexes = [
+            models.Index(fields=['ticker', 'last_bar_date']),
+        ]
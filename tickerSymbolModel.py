@@ -0,0 +1,17 @@
+from django.db import models
+
+class TickerSymbol(models.Model):
+    id = models.AutoField(primary_key=True)
+    company_name = models.CharField(max_length=100, unique=True)
+    ticker = models.CharField(max_length=50, blank=True, null=True)
+    expires_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.company_name} -> {self.ticker}"
+
+    class Meta:
+        db_table = 'ticker_symbols'
+        indexes = [
+            models.Index(fields=['company_name', 'expires_at']),
+        ]
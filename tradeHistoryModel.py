@@ -16,6 +16,13 @@ class Trade_History(models.Model):
     mtm_profit_loss = models.DecimalField(blank=True, null=True, max_digits=10, decimal_places=2)
     code = models.CharField(max_length=100, blank=True, null=True)
     account_id = models.IntegerField(blank = True, null = True)
+    underlying = models.CharField(max_length=100, blank=True, null=True)
+    strike = models.DecimalField(blank=True, null=True, max_digits=14, decimal_places=4)
+    option_type = models.CharField(max_length=1, blank=True, null=True)
+    expiration_date = models.DateField(blank=True, null=True)
+    normalized_code = models.CharField(max_length=100, blank=True, null=True)
+    contract_multiplier = models.DecimalField(blank=True, null=True, max_digits=10, decimal_places=2)
+    option_fields_parsed = models.BooleanField(default=False)
     
     def __str__(self):
         return self.symbol
@@ -23,5 +30,8 @@ class Trade_History(models.Model):
     class Meta:
         db_table = 'trade_history'
         indexes = [
-            models.Index(fields=['id', 'symbol', 'date', 'quantity', 't_price', 'c_price', 'proceeds', 'commissions', 'basis', 'realized_profit_loss', 'mtm_profit_loss', 'code', 'account_id'])
+            models.Index(fields=['id', 'symbol', 'date', 'quantity', 't_price', 'c_price', 'proceeds', 'commissions', 'basis', 'realized_profit_loss', 'mtm_profit_loss', 'code', 'account_id']),
+            models.Index(fields=['account_id', 'option_type', 'normalized_code']),
+            models.Index(fields=['underlying']),
+            models.Index(fields=['option_fields_parsed']),
         ]
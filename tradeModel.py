@@ -10,6 +10,12 @@ class Trade(models.Model):
     cost_basis = models.DecimalField(blank = True, null = True, max_digits=10, decimal_places=2)
     gain_loss = models.DecimalField(blank = True, null = True, max_digits=10, decimal_places=2)
     account_id = models.IntegerField(blank = True, null = True)
+    underlying = models.CharField(max_length=100, blank=True, null=True)
+    strike = models.DecimalField(blank=True, null=True, max_digits=14, decimal_places=4)
+    option_type = models.CharField(max_length=1, blank=True, null=True)
+    expiration_date = models.DateField(blank=True, null=True)
+    contract_multiplier = models.DecimalField(blank=True, null=True, max_digits=10, decimal_places=2)
+    option_fields_parsed = models.BooleanField(default=False)
 
     def __str__(self):
         return self.stock_name
@@ -17,6 +23,9 @@ class Trade(models.Model):
     class Meta:
         db_table = 'trades'
         indexes = [
-            models.Index(fields=['id', 'stock_name', 'quantity', 'price', 'market_value', 'cost_basis', 'account_id'])
+            models.Index(fields=['id', 'stock_name', 'quantity', 'price', 'market_value', 'cost_basis', 'account_id']),
+            models.Index(fields=['account_id', 'option_type', 'expiration_date']),
+            models.Index(fields=['underlying']),
+            models.Index(fields=['option_fields_parsed']),
         ]
 
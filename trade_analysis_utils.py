@@ -2,10 +2,37 @@ from rest_framework import status
 from .adminBaseService import AdminBaseService
 from api.utils.messages.userMessages import *
 from decimal import Decimal
-from api.utils.stock_utils import fetch_latest_stock_price, fetch_stock_price_by_date, get_ticker_symbol, price_cache_expiry
+from api.utils.stock_utils import fetch_latest_stock_price, fetch_latest_stock_prices, fetch_stock_price_by_date, get_ticker_symbol, get_ticker_symbols, price_cache_expiry, price_prefetch_chunk_size
+from api.utils.option_symbol_utils import (
+    NUMBER_AND_LETTER_PATTERN, STOCK_SYMBOL_PATTERN, FUTURES_TICKER_MAPPING, PUT_FUTURES_MULTIPLIERS,
+    EQUITY_FUTURES_MULTIPLIERS, EQUITY_MULTIPLIERS, NET_LOSS_MULTIPLIERS, extract_number_and_letter,
+    extract_stock_symbol, extract_expiration_date, normalize_stock_symbol, get_multiplier, third_friday,
+    get_future_contract_ticker, resolve_trade_ticker, parse_option_symbols,
+)
+from api.utils.position_book import as_position_book, get_portfolio_trades_version, get_position_book
+from api.utils.price_fetcher import fetch_concurrently
+from api.utils.price_cache import PRICE_CACHE
+from api.utils.instrumentation import cache_lookup, count, propagate, stage
+from api.utils.price_snapshot import PriceSnapshot, active_price_snapshot, use_price_snapshot
+from api.utils.dashboard_snapshots import get_ath_submissions_version, latest_snapshot, store_snapshot
+from api.utils.scenario_engine import evaluate_scenarios, stress_ladder
+from api.utils.replay_engine import replay_windows
+from api.utils.premium_engine import load_trade_history_frame, premium_totals, premium_totals_parallel, premium_totals_sql
+from api.utils.premium_index import get_trade_history_version, indexed_date_bounds, premium_range, premium_ranges
+from api.utils.ath_engine import (
+    ATH_TRADE_FIELDS, ath_positions, ath_price_pairs, ath_submission_frame, ath_trade_frame, portfolio_ath_values,
+)
+from api.utils.exposure_kernel import (
+    EXPOSURE_KERNEL_ABS_TOLERANCE, EXPOSURE_KERNEL_REL_TOLERANCE, calculate_exposure_fast,
+    calculate_what_if_exposure_fast, calculate_what_if_down_equity_fast,
+    calculate_downward_exposure_with_expiration_fast,
+)
 from api.utils.messages.commonMessages import *
 from api.models import Trade, Trade_History, ATHSubmission
-from django.db.models import F, Sum, Min, Max
+from django.db.models import F, Q, Count, Sum, Min, Max
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.core.cache import cache
 from api.utils.getUserByToken import get_user_by_token
 from django.db.models.functions import Length
 from api.serializers.user import *
@@ -23,124 +50,131 @@ import json
 import pandas as pd
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 
-NUMBER_AND_LETTER_PATTERN = re.compile(
-    r'(\d{2}[A-Z]{3}\d{2}|\d{2}/\d{2}/\d{4}|\d{2}\d{2}\d{4})\s+(\d+\.*\d*)\s*([CP])'
-)
-STOCK_SYMBOL_PATTERN = re.compile(r"([A-Z&\s]+)")
-
-def extract_number_and_letter(option_string: str):
-    match = NUMBER_AND_LETTER_PATTERN.search(option_string)
-    if match:
-        return match.group(2), match.group(3)
-    return None, None
-
-def extract_stock_symbol(option_string: str):
-    match = STOCK_SYMBOL_PATTERN.match(option_string)
-    return match.group(1).strip() if match else None
-
-def extract_expiration_date(stock_name: str):
-    match = re.search(r'\b(\d{2}/\d{2}/\d{4})\b', stock_name)
-    if match:
-        date_str = match.group(1)
-        try:
-            return datetime.strptime(date_str, "%m/%d/%Y")
-        except ValueError:
-            pass
-    match = re.search(r'\b(\d{2}[A-Z]{3}\d{2})\b', stock_name)
-    if match:
-        date_str = match.group(1)
-        try:
-            return datetime.strptime(date_str, "%d%b%y")
-        except ValueError:
-            pass
-
-    return None
+logger = logging.getLogger(__name__)
 
 def is_short_term(expiration_date, threshold_days=5):
     now = datetime.now()
     diff = (expiration_date - now).days
     return diff < threshold_days
 
-def normalize_stock_symbol(symbol: str) -> str | None:
-    symbol_clean = symbol.strip().lstrip('$').upper()
-    return FUTURES_TICKER_MAPPING.get(symbol_clean, symbol_clean)
+SCENARIO_ABS_TOLERANCE = Decimal('0.01')
+SCENARIO_REL_TOLERANCE = Decimal('1e-9')
 
-def get_multiplier(multiplier_dict: dict, stock_symbol: str):
-    if stock_symbol in multiplier_dict:
-        return multiplier_dict[stock_symbol]
-    return next((multiplier for sym, multiplier in multiplier_dict.items() if sym in stock_symbol), None)
+ACCOUNT_MAX_WORKERS = 8
 
-FUTURES_TICKER_MAPPING = {
-    "ESH": "ESH25.CME", "ESM": "ESM25.CME", "ESU": "ESU25.CME", "ESZ": "ESZ25.CME", "MESH": "MESH25.CME", "MESM": "MESM25.CME", "MESU": "MESU25.CME", "MESZ": "MESZ25.CME",   
-    "NQH": "NQH25.CME", "NQM": "NQM25.CME", "NQU": "NQU25.CME", "NQZ": "NQZ25.CME", "MNQH": "MNQH25.CME", "MNQM": "MNQM25.CME", "MNQU": "MNQU25.CME", "MNQZ": "MNQZ25.CME",   
-    "YMH": "YMH25.CME", "YMM": "YMM25.CME",   "YMU": "YMU25.CME",   "YMZ": "YMZ25.CME", "MYMH": "MYMH25.CBT", "MYMM": "MYMM25.CBT", "MYMU": "MYMU25.CBT", "MYMZ": "MYMZ25.CBT",   
-    "RTYH": "RTYH25.CME", "RTYM": "RTYM25.CME", "RTYU": "RTYU25.CME", "RTYZ": "RTYZ25.CME",   
-}
+NUMERIC_BACKEND_DECIMAL = "decimal"
+NUMERIC_BACKEND_FLOAT = "float"
 
-def third_friday(year: int, month: int) -> datetime:
-    month_cal = calendar.monthcalendar(year, month)
-    if month_cal[0][calendar.FRIDAY]:
-        day = month_cal[2][calendar.FRIDAY]
-    else:
-        day = month_cal[3][calendar.FRIDAY]
-    return datetime(year, month, day)
+EXPOSURE_RESULT_CACHE_TIMEOUT = 3600 * 2
 
-def get_future_contract_ticker(raw_symbol: str, expiration_date: datetime) -> str:
-    futures_prefixes = {"ES", "MES", "MYM", "YM", "NQ", "MNQ", "RTY"}
-    symbol = raw_symbol.strip().lstrip('$').upper()
-    
-    if not any(symbol.startswith(prefix) for prefix in futures_prefixes):
-        return get_ticker_symbol(symbol)
-    
-    if expiration_date.month not in (3, 6, 9, 12):
-        return get_ticker_symbol(symbol)
-    
-    year = expiration_date.year
-    if expiration_date.month == 3:
-        cutoff = third_friday(year, 3)
-        suffix = "M" if expiration_date > cutoff else "H"
-    elif expiration_date.month == 6:
-        cutoff = third_friday(year, 6)
-        suffix = "U" if expiration_date > cutoff else "M"
-    elif expiration_date.month == 9:
-        cutoff = third_friday(year, 9)
-        suffix = "Z" if expiration_date > cutoff else "U"
-    elif expiration_date.month == 12:
-        suffix = "Z"
-    else:
-        return get_ticker_symbol(symbol)
-    
-    key = f"{symbol}{suffix}"
-    return FUTURES_TICKER_MAPPING.get(key, f"{key}25.CME")
+# Orderings an exposure page can use without pricing anything: each is a
+# per-account aggregate over Trade.
+EXPOSURE_SORT_KEYS = ('account_id', 'positions', 'market_value', 'cost_basis', 'gain_loss')
 
-PUT_FUTURES_MULTIPLIERS = {'MES': -5, 'YM': -5, 'ES': -50, 'RTY': -50, 'MNQ': -2, 'NQ': -20, 'MYM': -0.5, 'SSO': -200, 'QLD': -200}
-EQUITY_FUTURES_MULTIPLIERS = {'MES': 5, 'ES': 50, 'RTY': 50, 'MNQ': 2, 'NQ': 20, 'MYM': 0.5, 'YM': 5, 'SSO': 2, 'QLD': 2}
-EQUITY_MULTIPLIERS = {'MES': 5, 'ES': 50, 'RTY': 50, 'MNQ': 2, 'NQ': 20, 'MYM': 0.5, 'YM': 5, 'SSO': 2, 'QLD': 2}
-NET_LOSS_MULTIPLIERS = {'MES': 5, 'ES': 50, 'RTY': 50, 'MNQ': 2,'NQ': 20, 'MYM': 0.5, 'YM': 5}
+# The dashboard's opening parameters; these are what the snapshots hold.
+DEFAULT_PERCENTAGE_UP = 5
+DEFAULT_PERCENTAGE_DOWN = 5
+DEFAULT_EXPIRATION_THRESHOLD = 5
 
-CACHE_TIMEOUT = timedelta(seconds=price_cache_expiry)
-GLOBAL_PRICE_CACHE = {}
+def _position_price_key(ticker):
+    return f"position_price_{ticker}"
 
 def get_price_cached(ticker: str) -> Decimal:
-    now = datetime.now()
-    if ticker in GLOBAL_PRICE_CACHE:
-        cached_price, expiry_time = GLOBAL_PRICE_CACHE[ticker]
-        if now < expiry_time:
-            return cached_price
-        del GLOBAL_PRICE_CACHE[ticker]
-    price = Decimal(fetch_latest_stock_price(ticker))
-    expiry_time = now + CACHE_TIMEOUT
-    GLOBAL_PRICE_CACHE[ticker] = (price, expiry_time)
-    return price
-
-def handle_put_option(final_price, stock_symbol, quantity, stock_price, total_equity_value, total_options_value, total_futures_contracts_values):
+    snapshot = active_price_snapshot()
+    if snapshot is not None and ticker in snapshot:
+        return snapshot[ticker]
+    return PRICE_CACHE.get_or_load(
+        _position_price_key(ticker), partial(fetch_latest_stock_price, ticker), ttl=price_cache_expiry
+    )
+
+def cache_position_prices(prices):
+    # prices: {ticker: Decimal}, as get_price_cached would have loaded them.
+    PRICE_CACHE.set_many(
+        {_position_price_key(ticker): price for ticker, price in prices.items()}, ttl=price_cache_expiry
+    )
+
+def prefetch_portfolio_prices(chunk_size=price_prefetch_chunk_size, trades=None):
+    with stage("resolve"):
+        stock_names = (
+            (Trade.objects if trades is None else trades).exclude(stock_name__isnull=True)
+            .values_list('stock_name', flat=True)
+            .distinct()
+        )
+        stock_names = list(stock_names)
+        get_ticker_symbols(symbol for name in stock_names if (symbol := extract_stock_symbol(name)))
+        tickers = {ticker for name in stock_names if (ticker := resolve_trade_ticker(name))}
+
+        pending = [ticker for ticker in tickers if _position_price_key(ticker) not in PRICE_CACHE]
+        # get_price_cached prices a ticker through fetch_latest_stock_price, which
+        # re-resolves it, so download under the same symbol the per-trade path uses.
+        symbols = get_ticker_symbols(pending)
+    with stage("fetch"):
+        prices, _ = fetch_latest_stock_prices(
+            [symbol for symbol in symbols.values() if symbol], chunk_size=chunk_size
+        )
+
+    # Failed tickers stay uncached so get_price_cached retries them one at a
+    # time through fetch_latest_stock_price's own fallbacks.
+    failed = []
+    for ticker, symbol in symbols.items():
+        if symbol in prices:
+            PRICE_CACHE.set(_position_price_key(ticker), prices[symbol], ttl=price_cache_expiry)
+        else:
+            failed.append(ticker)
+
+    if failed:
+        logger.warning("Price prefetch failed for %d tickers: %s", len(failed), sorted(failed))
+    logger.info("Prefetched prices for %d of %d tickers", len(pending) - len(failed), len(tickers))
+    return {
+        "total_tickers": len(tickers),
+        "fetched_tickers": len(pending) - len(failed),
+        "failed_tickers": sorted(failed),
+        "tickers": sorted(tickers),
+    }
+
+def freeze_price_snapshot(trades=None):
+    # Brings the live cache up to date, then copies every portfolio ticker's
+    # price out of it. Nothing that happens to the cache afterwards changes
+    # what a run bound to the snapshot sees.
+    tickers = prefetch_portfolio_prices(trades=trades)["tickers"]
+    return PriceSnapshot({ticker: get_price_cached(ticker) for ticker in tickers})
+
+def _exposure_params(percentageUp, percentageDown, expirationThreshold):
+    return {
+        "percentageUp": Decimal(str(percentageUp)),
+        "percentageDown": Decimal(str(percentageDown)),
+        "expirationThreshold": Decimal(str(expirationThreshold)),
+    }
+
+def _exposure_params_key(trades_version, percentageUp, percentageDown, expirationThreshold, numeric_backend):
+    params = _exposure_params(percentageUp, percentageDown, expirationThreshold)
+    return (
+        f"{trades_version}_{numeric_backend}_"
+        f"{params['percentageUp']}_{params['percentageDown']}_{params['expirationThreshold']}"
+    )
+
+def exposure_result_key(snapshot_id, trades_version, percentageUp, percentageDown, expirationThreshold,
+                        numeric_backend=NUMERIC_BACKEND_DECIMAL):
+    params_key = _exposure_params_key(trades_version, percentageUp, percentageDown, expirationThreshold, numeric_backend)
+    return f"portfolio_exposures_{snapshot_id}_{params_key}"
+
+def latest_exposure_snapshot_key(trades_version, percentageUp, percentageDown, expirationThreshold,
+                                 numeric_backend=NUMERIC_BACKEND_DECIMAL):
+    # Points at the snapshot the last run with these inputs priced against,
+    # for as long as its prices are fresh.
+    params_key = _exposure_params_key(trades_version, percentageUp, percentageDown, expirationThreshold, numeric_backend)
+    return f"portfolio_exposures_latest_{params_key}"
+
+def handle_put_option(final_price, mult, quantity, stock_price, total_equity_value, total_options_value, total_futures_contracts_values):
     final_price_dec = Decimal(final_price)
-    if (mult := get_multiplier(PUT_FUTURES_MULTIPLIERS, stock_symbol)) is not None:
+    if mult is not None:
         if final_price_dec > stock_price:
-            total_equity_value += final_price_dec * Decimal(mult) * quantity
+            total_equity_value += final_price_dec * mult * quantity
         else:
-            total_futures_contracts_values += final_price_dec * Decimal(mult) * quantity
+            total_futures_contracts_values += final_price_dec * mult * quantity
     else:
         if final_price_dec > stock_price:
             total_equity_value += final_price_dec * Decimal(-100) * quantity
@@ -149,65 +183,57 @@ def handle_put_option(final_price, stock_symbol, quantity, stock_price, total_eq
 
     return total_equity_value, total_options_value, total_futures_contracts_values
 
-def handle_call_option(final_price, stock_symbol, quantity, stock_price, total_equity_value):
+def handle_call_option(final_price, mult, quantity, stock_price, total_equity_value):
     final_price_dec = Decimal(final_price)
-    if (mult := get_multiplier(PUT_FUTURES_MULTIPLIERS, stock_symbol)) is not None:
-        total_equity_value -= final_price_dec * Decimal(mult) * quantity
+    if mult is not None:
+        total_equity_value -= final_price_dec * mult * quantity
     else:
         total_equity_value -= final_price_dec * Decimal(-100) * quantity
     return total_equity_value
 
-def handle_neither_instrument(purchase_price, stock_symbol, quantity, stock_price, total_equity_value, daily_positions_value):
+def handle_neither_instrument(purchase_price, mult, quantity, stock_price, total_equity_value, daily_positions_value):
     purchase_dec = Decimal(purchase_price)
-    if (mult := get_multiplier(EQUITY_FUTURES_MULTIPLIERS, stock_symbol)) is not None:
-        total_equity_value += quantity * purchase_dec * Decimal(mult)
-        daily_positions_value += quantity * stock_price * Decimal(mult)
+    if mult is not None:
+        total_equity_value += quantity * purchase_dec * mult
+        daily_positions_value += quantity * stock_price * mult
     else:
         total_equity_value += quantity * purchase_dec
         daily_positions_value += quantity * stock_price
     return total_equity_value, daily_positions_value
 
 def calculate_exposure(trades):
+    book = as_position_book(trades)
     total_equity_value = Decimal('0.0')
     total_options_value = Decimal('0.0')
     daily_positions_value = Decimal('0.0')
     total_futures_contracts_values = Decimal('0.0')
     current_account_value = Decimal('0.0')
 
-    for t in trades:
-        final_price, letter = extract_number_and_letter(t.stock_name)
-        raw_symbol = extract_stock_symbol(t.stock_name)
-        if raw_symbol:
-            const_expiration = extract_expiration_date(t.stock_name)
-            if const_expiration:
-                ticker = get_future_contract_ticker(raw_symbol, const_expiration)
-            else:
-                ticker = get_ticker_symbol(raw_symbol)
-        else:
-            ticker = None
-
-        underlying = raw_symbol if raw_symbol else ""
-        quantity = Decimal(t.quantity)
-        current_account_value += Decimal(t.market_value)
+    for i in book:
+        final_price = book.strikes[i]
+        letter = book.letters[i]
+        ticker = book.tickers[i]
+        quantity = book.quantities[i]
+        current_account_value += book.market_values[i]
 
         stock_price = get_price_cached(ticker) if ticker else Decimal('0.0')
 
-        if letter == 'P' and final_price:
+        if letter == 'P' and final_price is not None:
             (total_equity_value,
              total_options_value,
              total_futures_contracts_values) = handle_put_option(
-                 final_price, underlying, quantity, stock_price,
+                 final_price, book.put_multipliers[i], quantity, stock_price,
                  total_equity_value, total_options_value, total_futures_contracts_values
              )
-        elif letter == 'C' and final_price:
-            if Decimal(final_price) < stock_price:
+        elif letter == 'C' and final_price is not None:
+            if final_price < stock_price:
                 total_equity_value = handle_call_option(
-                    final_price, underlying, quantity, stock_price,
+                    final_price, book.put_multipliers[i], quantity, stock_price,
                     total_equity_value
                 )
         else:
             total_equity_value, daily_positions_value = handle_neither_instrument(
-                t.price, underlying, quantity, stock_price,
+                book.prices[i], book.equity_futures_multipliers[i], quantity, stock_price,
                 total_equity_value, daily_positions_value
             )
     total_exposure_value = total_equity_value + total_futures_contracts_values + total_options_value
@@ -218,141 +244,117 @@ def calculate_exposure(trades):
         "current_account_value": current_account_value,
     }
 
-def handle_put_in_down_move(final_price: Decimal, stock_symbol: str, quantity: Decimal,
+def handle_put_in_down_move(final_price: Decimal, mult, net_loss_multiplier: Decimal, quantity: Decimal,
                             adjusted_stock_price: Decimal, what_if_exposure: Decimal,
                             what_if_options_value: Decimal, net_loss: Decimal):
-    if (mult := get_multiplier(PUT_FUTURES_MULTIPLIERS, stock_symbol)) is not None:
-        what_if_exposure += final_price * Decimal(mult) * quantity
+    if mult is not None:
+        what_if_exposure += final_price * mult * quantity
     else:
         what_if_options_value += final_price * Decimal(-100) * quantity
-    net_loss_multiplier = NET_LOSS_MULTIPLIERS.get(stock_symbol, 100)
-    net_loss += (final_price - adjusted_stock_price) * Decimal(net_loss_multiplier) * quantity
+    net_loss += (final_price - adjusted_stock_price) * net_loss_multiplier * quantity
     return what_if_exposure, what_if_options_value, net_loss
 
-def handle_call_in_up_move(final_price: Decimal, stock_symbol: str, quantity: Decimal,
+def handle_call_in_up_move(final_price: Decimal, mult, net_loss_multiplier: Decimal, quantity: Decimal,
                            adjusted_stock_price: Decimal, what_if_exposure: Decimal,
                            what_if_options_value: Decimal, net_loss: Decimal):
-    futures_multipliers = {"MES": 5, "ES": 50, "RTY": 50, "MNQ": 2, "NQ": 20, "MYM": 0.5, "SSO": 200, "QLD": 200}
-    if (mult := get_multiplier(futures_multipliers, stock_symbol)) is not None:
-        what_if_exposure += final_price * Decimal(mult) * quantity
+    if mult is not None:
+        what_if_exposure += final_price * mult * quantity
     else:
         what_if_options_value += final_price * Decimal(100) * quantity
 
-    net_loss_multiplier = NET_LOSS_MULTIPLIERS.get(stock_symbol, 100)
-    net_loss += (adjusted_stock_price - final_price) * Decimal(net_loss_multiplier) * quantity
+    net_loss += (adjusted_stock_price - final_price) * net_loss_multiplier * quantity
     return what_if_exposure, what_if_options_value, net_loss
 
 def handle_regular_instrument_in_what_if(letter: str, quantity: Decimal, purchase_price: Decimal,
-                                         adjusted_change: Decimal, stock_symbol: str,
+                                         adjusted_change: Decimal, mult,
                                          what_if_equity_value: Decimal):
-    if (mult := get_multiplier(EQUITY_MULTIPLIERS, stock_symbol)) is not None:
-        what_if_equity_value += quantity * purchase_price * Decimal(mult) * adjusted_change
+    if mult is not None:
+        what_if_equity_value += quantity * purchase_price * mult * adjusted_change
     else:
         what_if_equity_value += quantity * purchase_price * adjusted_change
     return what_if_equity_value
 
 def calculate_what_if_exposure(trades, percent_change, is_increase):
-   change = (Decimal(100) + percent_change) / Decimal(100) if is_increase else (Decimal(100) - percent_change) / Decimal(100)
-   what_if_exposure = Decimal('0.0')
-   what_if_options_value = Decimal('0.0')
-   what_if_equity_value = Decimal('0.0')
-   net_loss = Decimal('0.0')
-
-   for t in trades:
-       final_price, letter = extract_number_and_letter(t.stock_name)
-       raw_symbol = extract_stock_symbol(t.stock_name)
-       if raw_symbol:
-           expiration_date = extract_expiration_date(t.stock_name)
-           if expiration_date:
-               ticker = get_future_contract_ticker(raw_symbol, expiration_date)
-           else:
-               ticker = get_ticker_symbol(raw_symbol)
-       else:
-           ticker = None
-
-       underlying = raw_symbol if raw_symbol else ""
-       quantity = Decimal(t.quantity)
-
-       stock_price = get_price_cached(ticker) if ticker else Decimal('0.0')
-       #if ticker:
-           #print(f"Fetched price for {ticker}: {stock_price}")
-
-       if ticker in ["SSO", "QLD"]:
-           adjusted_change = (Decimal(100) + (2 * percent_change if is_increase else -2 * percent_change)) / Decimal(100)
-       else:
-           adjusted_change = change
-       adjusted_stock_price = stock_price * adjusted_change
-
-       if not is_increase and letter == "P" and final_price:
-           if Decimal(final_price) > adjusted_stock_price:
-               (what_if_exposure, what_if_options_value, net_loss) = handle_put_in_down_move(
-                   Decimal(final_price), underlying, quantity, adjusted_stock_price,
-                   what_if_exposure, what_if_options_value, net_loss
-               )
-       elif is_increase and letter == "C" and final_price:
-           if Decimal(final_price) < adjusted_stock_price:
-               (what_if_exposure, what_if_options_value, net_loss) = handle_call_in_up_move(
-                   Decimal(final_price), underlying, quantity, adjusted_stock_price,
-                   what_if_exposure, what_if_options_value, net_loss
-               )
-       elif letter not in ["C", "P"]:
-           what_if_equity_value = handle_regular_instrument_in_what_if(
-               letter, quantity, Decimal(t.price), adjusted_change, underlying, what_if_equity_value
-           )
-   total_what_if_exposure = what_if_exposure + what_if_equity_value + what_if_options_value + net_loss
-   return {
-       "total_what_if_exposure": total_what_if_exposure,
-       "net_loss": net_loss,
-   }
+    book = as_position_book(trades)
+    change = (Decimal(100) + percent_change) / Decimal(100) if is_increase else (Decimal(100) - percent_change) / Decimal(100)
+    double_change = (Decimal(100) + (2 * percent_change if is_increase else -2 * percent_change)) / Decimal(100)
+    what_if_exposure = Decimal('0.0')
+    what_if_options_value = Decimal('0.0')
+    what_if_equity_value = Decimal('0.0')
+    net_loss = Decimal('0.0')
+
+    for i in book:
+        final_price = book.strikes[i]
+        letter = book.letters[i]
+        ticker = book.tickers[i]
+        quantity = book.quantities[i]
+
+        stock_price = get_price_cached(ticker) if ticker else Decimal('0.0')
+
+        adjusted_change = double_change if book.is_double_leverage[i] else change
+        adjusted_stock_price = stock_price * adjusted_change
+
+        if not is_increase and letter == "P" and final_price is not None:
+            if final_price > adjusted_stock_price:
+                (what_if_exposure, what_if_options_value, net_loss) = handle_put_in_down_move(
+                    final_price, book.put_multipliers[i], book.net_loss_multipliers[i], quantity,
+                    adjusted_stock_price, what_if_exposure, what_if_options_value, net_loss
+                )
+        elif is_increase and letter == "C" and final_price is not None:
+            if final_price < adjusted_stock_price:
+                (what_if_exposure, what_if_options_value, net_loss) = handle_call_in_up_move(
+                    final_price, book.call_multipliers[i], book.net_loss_multipliers[i], quantity,
+                    adjusted_stock_price, what_if_exposure, what_if_options_value, net_loss
+                )
+        elif letter not in ["C", "P"]:
+            what_if_equity_value = handle_regular_instrument_in_what_if(
+                letter, quantity, book.prices[i], adjusted_change, book.equity_multipliers[i], what_if_equity_value
+            )
+    total_what_if_exposure = what_if_exposure + what_if_equity_value + what_if_options_value + net_loss
+    return {
+        "total_what_if_exposure": total_what_if_exposure,
+        "net_loss": net_loss,
+    }
 
 def handle_regular_instrument_in_down_equity(letter: str, quantity: Decimal, price: Decimal,
                                                market_value: Decimal, adjusted_change: Decimal,
-                                               stock_symbol: str) -> Decimal:
-    equity_multipliers = {'MES': 5, 'ES': 50, 'RTY': 50, 'MNQ': 2, 'NQ': 20, 'MYM': 0.5, 'YM': 5}
-    if (mult := get_multiplier(equity_multipliers, stock_symbol)) is not None:
-        return quantity * price * adjusted_change * Decimal(mult)
+                                               mult) -> Decimal:
+    if mult is not None:
+        return quantity * price * adjusted_change * mult
     return market_value * adjusted_change
 
 def handle_option_in_down_equity(market_value: Decimal) -> Decimal:
     return market_value
 
 def calculate_what_if_down_equity(trades, percentageDown):
+    book = as_position_book(trades)
     change = (Decimal(100) - percentageDown) / Decimal(100)
+    double_change = (Decimal(100) - 2 * percentageDown) / Decimal(100)
     what_if_down_equity = Decimal('0.0')
 
-    for t in trades:
-        final_price, letter = extract_number_and_letter(t.stock_name)
-        raw_symbol = extract_stock_symbol(t.stock_name)
-        
-        if raw_symbol:
-            expiration_date = extract_expiration_date(t.stock_name)
-            if expiration_date:
-                resolved_symbol = get_future_contract_ticker(raw_symbol, expiration_date)
-            else:
-                resolved_symbol = get_ticker_symbol(raw_symbol)
-        else:
-            resolved_symbol = None
+    for i in book:
+        letter = book.letters[i]
 
-        quantity = Decimal(t.quantity)
-
-        if resolved_symbol in ["SSO", "QLD"]:
-            adjusted_change = (Decimal(100) - 2 * percentageDown) / Decimal(100)
-        elif "cash" in t.stock_name.lower():
+        if book.is_double_leverage[i]:
+            adjusted_change = double_change
+        elif book.is_cash[i]:
             adjusted_change = Decimal(1)
         else:
             adjusted_change = change
 
         if letter in ["C", "P"]:
-            what_if_down_equity += handle_option_in_down_equity(Decimal(t.market_value))
+            what_if_down_equity += handle_option_in_down_equity(book.market_values[i])
         else:
             portion = handle_regular_instrument_in_down_equity(
-                letter, quantity, Decimal(t.price), Decimal(t.market_value), adjusted_change, resolved_symbol
+                letter, book.quantities[i], book.prices[i], book.market_values[i], adjusted_change,
+                book.down_equity_multipliers[i]
             )
             what_if_down_equity += portion
 
     return what_if_down_equity
 
 def calculate_downward_exposure_with_expiration(trades, percentageDown, expirationThreshold: int):
+    book = as_position_book(trades)
     short_term_contracts = 0
     short_term_exposure = Decimal('0.0')
     short_term_options_value = Decimal('0.0')
@@ -364,50 +366,34 @@ def calculate_downward_exposure_with_expiration(trades, percentageDown, expirati
     long_term_net_loss = Decimal('0.0')
 
     change = (Decimal(100) - Decimal(percentageDown)) / Decimal(100)
+    double_change = (Decimal(100) + (Decimal(-2) * Decimal(percentageDown))) / Decimal(100)
 
-    for t in trades:
-        final_price_str, letter = extract_number_and_letter(t.stock_name)
-        raw_symbol = extract_stock_symbol(t.stock_name)
-        
-        if raw_symbol:
-            expiration_date = extract_expiration_date(t.stock_name)
-            if expiration_date:
-                ticker = get_future_contract_ticker(raw_symbol, expiration_date)
-            else:
-                ticker = get_ticker_symbol(raw_symbol)
-        else:
-            ticker = None
-
-        stock_price = get_price_cached(ticker) if ticker else Decimal('0.0')
-
-        if ticker in ["SSO", "QLD"]:
-            adjusted_change = (Decimal(100) + (Decimal(-2) * Decimal(percentageDown))) / Decimal(100)
-        else:
-            adjusted_change = change
-
-        adjusted_stock_price = stock_price * adjusted_change
-
-        if letter != "P":
+    for i in book:
+        if book.letters[i] != "P":
             continue
-        
-        expiration_date = extract_expiration_date(t.stock_name)
+
+        expiration_date = book.expirations[i]
         if not expiration_date:
             continue
 
-        is_short = is_short_term(expiration_date, threshold_days=expirationThreshold)
-        try:
-            final_price_dec = Decimal(final_price_str)
-        except Exception:
+        final_price_dec = book.strikes[i]
+        if final_price_dec is None:
             continue
 
-        quantity = Decimal(t.quantity)
+        ticker = book.tickers[i]
+        stock_price = get_price_cached(ticker) if ticker else Decimal('0.0')
+        adjusted_change = double_change if book.is_double_leverage[i] else change
+        adjusted_stock_price = stock_price * adjusted_change
+
+        is_short = is_short_term(expiration_date, threshold_days=expirationThreshold)
+        quantity = book.quantities[i]
 
         if final_price_dec > adjusted_stock_price:
             if is_short:
                 short_term_contracts += 1
                 st_exposure, st_options_value, st_net_loss = handle_put_in_down_move(
-                    final_price_dec, raw_symbol, quantity, adjusted_stock_price,
-                    short_term_exposure, short_term_options_value, short_term_net_loss
+                    final_price_dec, book.put_multipliers[i], book.net_loss_multipliers[i], quantity,
+                    adjusted_stock_price, short_term_exposure, short_term_options_value, short_term_net_loss
                 )
                 short_term_exposure = st_exposure
                 short_term_options_value = st_options_value
@@ -415,8 +401,8 @@ def calculate_downward_exposure_with_expiration(trades, percentageDown, expirati
             else:
                 long_term_contracts += 1
                 lt_exposure, lt_options_value, lt_net_loss = handle_put_in_down_move(
-                    final_price_dec, raw_symbol, quantity, adjusted_stock_price,
-                    long_term_exposure, long_term_options_value, long_term_net_loss
+                    final_price_dec, book.put_multipliers[i], book.net_loss_multipliers[i], quantity,
+                    adjusted_stock_price, long_term_exposure, long_term_options_value, long_term_net_loss
                 )
                 long_term_exposure = lt_exposure
                 long_term_options_value = lt_options_value
@@ -433,62 +419,354 @@ def calculate_downward_exposure_with_expiration(trades, percentageDown, expirati
         }
     }
 
-def calculate_portfolio_exposures(percentageUp, percentageDown, expirationThreshold):
-    total_trades = Trade.objects.all()
-    account_ids = total_trades.values_list('account_id', flat=True).distinct()
-    portfolio_exposures = []
+def group_by_account(rows, key=lambda row: row.account_id):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(key(row), []).append(row)
+    return grouped
+
+def map_accounts(func, items, max_workers=ACCOUNT_MAX_WORKERS):
+    items = list(items)
+    if not max_workers or max_workers <= 1 or len(items) <= 1:
+        return [func(*item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(propagate(lambda item: func(*item)), items))
+
+def get_exposure_backend(numeric_backend=NUMERIC_BACKEND_DECIMAL):
+    if numeric_backend == NUMERIC_BACKEND_FLOAT:
+        return (
+            partial(calculate_exposure_fast, price_lookup=get_price_cached),
+            partial(calculate_what_if_exposure_fast, price_lookup=get_price_cached),
+            calculate_what_if_down_equity_fast,
+            partial(calculate_downward_exposure_with_expiration_fast, price_lookup=get_price_cached),
+        )
+    return (
+        calculate_exposure,
+        calculate_what_if_exposure,
+        calculate_what_if_down_equity,
+        calculate_downward_exposure_with_expiration,
+    )
 
-    for account_id in account_ids:
-        trades = total_trades.filter(account_id=account_id)
-        if not trades.exists():
-            continue
+def calculate_account_exposure(account_id, trades, percentageUp, percentageDown, expirationThreshold,
+                               numeric_backend=NUMERIC_BACKEND_DECIMAL):
+    with stage("parse", account_id):
+        trades = get_position_book(account_id, trades)
+    count("positions", len(trades))
+    # Price any tickers the portfolio prefetch missed in parallel, so the
+    # account waits on its slowest quote rather than the sum of them.
+    with stage("fetch", account_id):
+        fetch_concurrently(get_price_cached, [ticker for ticker in trades.tickers if ticker])
+    with stage("compute", account_id):
+        (exposure_fn, what_if_exposure_fn,
+         what_if_down_equity_fn, expiration_exposure_fn) = get_exposure_backend(numeric_backend)
+
+        result = exposure_fn(trades)
+        down_result = what_if_exposure_fn(trades, percentageDown, False)
+        up_result = what_if_exposure_fn(trades, percentageUp, True)
+        what_if_down_equity = what_if_down_equity_fn(trades, percentageDown)
+        downward_put_exposure_result = expiration_exposure_fn(
+            trades, percentageDown, expirationThreshold
+        )
+        return build_account_exposure_data(
+            account_id, result, down_result, up_result, what_if_down_equity, downward_put_exposure_result
+        )
 
-        result = calculate_exposure(trades)
-        total_exposure_value = result["total_exposure_value"]
-        daily_positions_value = result["daily_positions_value"]
-        total_equity_value = result["total_equity_value"]
-        current_account_value = result["current_account_value"]
+def build_account_exposure_data(account_id, result, down_result, up_result, what_if_down_equity,
+                                downward_put_exposure_result):
+    total_exposure_value = result["total_exposure_value"]
+    daily_positions_value = result["daily_positions_value"]
+    total_equity_value = result["total_equity_value"]
+    current_account_value = result["current_account_value"]
+
+    what_if_down_exposure = down_result["total_what_if_exposure"]
+    what_if_down_net_loss = down_result["net_loss"]
+    what_if_up_exposure = up_result["total_what_if_exposure"]
+    what_if_down_equity = what_if_down_equity + what_if_down_net_loss
+
+    short_term_puts_itm = downward_put_exposure_result["short_term"]["short_term_contracts"]
+    short_term_puts_exposure = downward_put_exposure_result["short_term"]["short_term_exposure"]
+    long_term_puts_itm = downward_put_exposure_result["long_term"]["long_term_contracts"]
+    long_term_puts_exposure = downward_put_exposure_result["long_term"]["long_term_exposure"]
+
+    what_if_down_leverage = (
+        what_if_down_exposure / what_if_down_equity if what_if_down_equity != 0 else None
+    )
+    current_leverage = (
+        total_equity_value / current_account_value if current_account_value != 0 else None
+    )
 
-        down_result = calculate_what_if_exposure(trades, percentageDown, False)
-        up_result = calculate_what_if_exposure(trades, percentageUp, True)
+    return {
+        "account_id": account_id,
+        "total_exposure_value": total_exposure_value,
+        "daily_positions_value": daily_positions_value,
+        "total_equity_value": total_equity_value,
+        "current_account_value": current_account_value,
+        "what_if_down_exposure": what_if_down_exposure,
+        "what_if_up_exposure": what_if_up_exposure,
+        "current_leverage": current_leverage,
+        "what_if_down_equity": what_if_down_equity,
+        "what_if_down_leverage": what_if_down_leverage,
+        "short_term_puts_itm": short_term_puts_itm,
+        "short_term_puts_exposure": short_term_puts_exposure,
+        "long_term_puts_itm": long_term_puts_itm,
+        "long_term_puts_exposure": long_term_puts_exposure,
+    }
 
-        what_if_down_exposure = down_result["total_what_if_exposure"]
-        what_if_down_net_loss = down_result["net_loss"]
-        what_if_up_exposure = up_result["total_what_if_exposure"]
-        what_if_down_equity = calculate_what_if_down_equity(trades, percentageDown) + what_if_down_net_loss
+def calculate_portfolio_exposures(percentageUp, percentageDown, expirationThreshold, max_workers=ACCOUNT_MAX_WORKERS,
+                                  numeric_backend=NUMERIC_BACKEND_DECIMAL):
+    # Read the trades version before loading trades: a change that lands
+    # mid-run moves it again, so these results can't be served past it.
+    trades_version = get_portfolio_trades_version()
+    params = (percentageUp, percentageDown, expirationThreshold, numeric_backend)
+    # Freezing a snapshot prefetches every position's price, so while the
+    # last run's prices are still fresh its results are served without one.
+    latest_key = latest_exposure_snapshot_key(trades_version, *params)
+    snapshot_id = cache.get(latest_key)
+    if snapshot_id is not None:
+        results = cache.get(exposure_result_key(snapshot_id, trades_version, *params))
+        if results is not None:
+            cache_lookup("exposure_results", hit=True)
+            return results
+
+    snapshot = freeze_price_snapshot()
+    key = exposure_result_key(snapshot.id, trades_version, *params)
+    results = cache.get(key)
+    cache_lookup("exposure_results", hit=results is not None)
+    if results is None:
+        trades_by_account = group_by_account(Trade.objects.order_by('account_id', 'id'))
+        with use_price_snapshot(snapshot):
+            results = map_accounts(
+                lambda account_id, trades: calculate_account_exposure(
+                    account_id, trades, percentageUp, percentageDown, expirationThreshold, numeric_backend
+                ),
+                trades_by_account.items(),
+                max_workers=max_workers,
+            )
+        cache.set(key, results, timeout=EXPOSURE_RESULT_CACHE_TIMEOUT)
+    cache.set(latest_key, snapshot.id, timeout=price_cache_expiry)
+    return results
 
-        downward_put_exposure_result = calculate_downward_exposure_with_expiration(
-            trades, percentageDown, expirationThreshold
+def exposure_account_summaries(sort="account_id"):
+    if sort.lstrip('-') not in EXPOSURE_SORT_KEYS:
+        raise ValueError(f"Unsupported exposure sort key: {sort}")
+    return (
+        Trade.objects.values('account_id')
+        .annotate(
+            positions=Count('id'),
+            market_value=Sum('market_value'),
+            cost_basis=Sum('cost_basis'),
+            gain_loss=Sum('gain_loss'),
         )
-        short_term_puts_itm = downward_put_exposure_result["short_term"]["short_term_contracts"]
-        short_term_puts_exposure = downward_put_exposure_result["short_term"]["short_term_exposure"]
-        long_term_puts_itm = downward_put_exposure_result["long_term"]["long_term_contracts"]
-        long_term_puts_exposure = downward_put_exposure_result["long_term"]["long_term_exposure"]
+        .order_by(sort, 'account_id')
+    )
 
-        what_if_down_leverage = (
-            what_if_down_exposure / what_if_down_equity if what_if_down_equity != 0 else None
-        )
-        current_leverage = (
-            total_equity_value / current_account_value if current_account_value != 0 else None
+def _account_trades(account_ids):
+    account_filter = Q(account_id__in=[account_id for account_id in account_ids if account_id is not None])
+    if None in account_ids:
+        account_filter |= Q(account_id__isnull=True)
+    return Trade.objects.filter(account_filter)
+
+def iter_account_exposures(account_ids, percentageUp, percentageDown, expirationThreshold,
+                           max_workers=ACCOUNT_MAX_WORKERS, numeric_backend=NUMERIC_BACKEND_DECIMAL):
+    # Prices and computes only the given accounts, yielding each exposure as
+    # soon as it is ready (completion order, not the order given).
+    account_ids = list(account_ids)
+    if not account_ids:
+        return
+    trades = _account_trades(account_ids)
+    snapshot = freeze_price_snapshot(trades)
+    trades_by_account = group_by_account(trades.order_by('account_id', 'id'))
+    with use_price_snapshot(snapshot):
+        compute = propagate(lambda account_id: calculate_account_exposure(
+            account_id, trades_by_account.get(account_id, []), percentageUp, percentageDown, expirationThreshold,
+            numeric_backend,
+        ))
+
+    if not max_workers or max_workers <= 1 or len(account_ids) <= 1:
+        for account_id in account_ids:
+            yield compute(account_id)
+        return
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(account_ids)))
+    try:
+        for future in as_completed([executor.submit(compute, account_id) for account_id in account_ids]):
+            yield future.result()
+    finally:
+        # A client that stops reading a stream shouldn't keep the rest running.
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def calculate_paginated_portfolio_exposures(request, percentageUp, percentageDown, expirationThreshold,
+                                            sort="account_id", max_workers=ACCOUNT_MAX_WORKERS,
+                                            numeric_backend=NUMERIC_BACKEND_DECIMAL):
+    paginator = CustomPagination()
+    page = paginator.paginate_queryset(exposure_account_summaries(sort), request)
+    exposures = {
+        exposure["account_id"]: exposure
+        for exposure in iter_account_exposures(
+            [row['account_id'] for row in page], percentageUp, percentageDown, expirationThreshold,
+            max_workers=max_workers, numeric_backend=numeric_backend,
         )
-
-        portfolio_exposures.append({
-            "account_id": account_id,
-            "total_exposure_value": total_exposure_value,
-            "daily_positions_value": daily_positions_value,
-            "total_equity_value": total_equity_value,
-            "current_account_value": current_account_value,
-            "what_if_down_exposure": what_if_down_exposure,
-            "what_if_up_exposure": what_if_up_exposure,
-            "current_leverage": current_leverage,
-            "what_if_down_equity": what_if_down_equity,
-            "what_if_down_leverage": what_if_down_leverage,
-            "short_term_puts_itm": short_term_puts_itm,
-            "short_term_puts_exposure": short_term_puts_exposure,
-            "long_term_puts_itm": long_term_puts_itm,
-            "long_term_puts_exposure": long_term_puts_exposure,
+    }
+    return paginator.get_paginated_response([{**row, **exposures[row['account_id']]} for row in page])
+
+def _ndjson(row):
+    return json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+def stream_portfolio_exposures(request, percentageUp, percentageDown, expirationThreshold, sort="account_id",
+                               max_workers=ACCOUNT_MAX_WORKERS, numeric_backend=NUMERIC_BACKEND_DECIMAL):
+    # Newline-delimited JSON: a header line with the page's accounts in sort
+    # order, then one line per account as it finishes, tagged with its index
+    # in that order.
+    paginator = CustomPagination()
+    page = paginator.paginate_queryset(exposure_account_summaries(sort), request)
+    summaries = {row['account_id']: (index, row) for index, row in enumerate(page)}
+
+    def rows():
+        yield _ndjson({
+            "count": paginator.page.paginator.count,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "sort": sort,
+            "accounts": [row['account_id'] for row in page],
         })
-    return portfolio_exposures
+        for exposure in iter_account_exposures(
+            list(summaries), percentageUp, percentageDown, expirationThreshold,
+            max_workers=max_workers, numeric_backend=numeric_backend,
+        ):
+            index, row = summaries[exposure["account_id"]]
+            yield _ndjson({"index": index, **row, **exposure})
+
+    return StreamingHttpResponse(rows(), content_type="application/x-ndjson")
+
+def _exposure_values(exposure, prefix=""):
+    for key, value in exposure.items():
+        if isinstance(value, dict):
+            yield from _exposure_values(value, prefix=f"{prefix}{key}.")
+        elif key != "account_id":
+            yield f"{prefix}{key}", value
+
+def reconcile_exposure_backends(account_id, trades, percentageUp, percentageDown, expirationThreshold):
+    book = get_position_book(account_id, trades)
+    expected = dict(_exposure_values(calculate_account_exposure(
+        account_id, book, percentageUp, percentageDown, expirationThreshold, NUMERIC_BACKEND_DECIMAL
+    )))
+    actual = dict(_exposure_values(calculate_account_exposure(
+        account_id, book, percentageUp, percentageDown, expirationThreshold, NUMERIC_BACKEND_FLOAT
+    )))
+    mismatches = []
+
+    for key, expected_value in expected.items():
+        actual_value = actual[key]
+        if expected_value is None or actual_value is None:
+            matches = expected_value is actual_value
+        else:
+            tolerance = max(EXPOSURE_KERNEL_ABS_TOLERANCE, abs(expected_value) * EXPOSURE_KERNEL_REL_TOLERANCE)
+            matches = abs(Decimal(actual_value) - Decimal(expected_value)) <= tolerance
+        if not matches:
+            mismatches.append({"field": key, "expected": expected_value, "actual": actual_value})
+
+    if mismatches:
+        logger.warning("Float exposure kernel diverged from Decimal path for account %s: %s", account_id, mismatches)
+    return mismatches
+
+def _scenario_decimal(value):
+    return None if np.isnan(value) else round(Decimal(str(value)), 2)
+
+def calculate_what_if_scenarios(trades, moves=None):
+    if moves is None:
+        moves = stress_ladder()
+    return evaluate_scenarios(trades, moves, get_price_cached)
+
+def calculate_portfolio_stress_ladder(moves=None):
+    # One snapshot for the run, so every account is stressed from the same quotes.
+    snapshot = freeze_price_snapshot()
+    trades_by_account = group_by_account(Trade.objects.order_by('account_id', 'id'))
+    portfolio_scenarios = []
+
+    with use_price_snapshot(snapshot):
+        for account_id, trades in trades_by_account.items():
+            result = calculate_what_if_scenarios(get_position_book(account_id, trades), moves)
+            portfolio_scenarios.append({
+                "account_id": account_id,
+                "scenarios": [
+                    {
+                        "move": _scenario_decimal(result["moves"][j]),
+                        "what_if_exposure": _scenario_decimal(result["total_what_if_exposure"][j]),
+                        "net_loss": _scenario_decimal(result["net_loss"][j]),
+                        "what_if_equity": _scenario_decimal(result["what_if_equity"][j]),
+                        "what_if_leverage": _scenario_decimal(result["what_if_leverage"][j]),
+                    }
+                    for j in range(len(result["moves"]))
+                ],
+            })
+    return portfolio_scenarios
+
+def calculate_portfolio_replay(windows):
+    # Every account's current positions replayed over each historical window,
+    # priced from one snapshot so all accounts start from the same quotes.
+    snapshot = freeze_price_snapshot()
+    trades_by_account = group_by_account(Trade.objects.order_by('account_id', 'id'))
+    books = [get_position_book(account_id, trades) for account_id, trades in trades_by_account.items()]
+
+    with use_price_snapshot(snapshot):
+        replays, missing_tickers = replay_windows(books, windows, get_price_cached)
+
+    return {
+        "snapshot_id": snapshot.id,
+        "missing_tickers": missing_tickers,
+        "accounts": [
+            {
+                "account_id": book.account_id,
+                "windows": [
+                    {
+                        "window": replay["window"] if isinstance(replay["window"], str) else f"{replay['start']}:{replay['end']}",
+                        "start": replay["start"],
+                        "end": replay["end"],
+                        "max_drawdown": _scenario_decimal(replay["max_drawdown"]),
+                        "days": [
+                            {
+                                "date": day.astype(date),
+                                "portfolio_value": _scenario_decimal(replay["portfolio_value"][j]),
+                                "drawdown": _scenario_decimal(replay["drawdown"][j]),
+                                "leverage": _scenario_decimal(replay["leverage"][j]),
+                                "total_exposure_value": _scenario_decimal(replay["total_exposure_value"][j]),
+                            }
+                            for j, day in enumerate(replay["dates"])
+                        ],
+                    }
+                    for replay in account_replays
+                ],
+            }
+            for book, account_replays in zip(books, replays)
+        ],
+    }
+
+def reconcile_what_if_scenarios(trades, moves=None):
+    book = as_position_book(trades)
+    result = calculate_what_if_scenarios(book, moves)
+    mismatches = []
+
+    for j, move in enumerate(result["moves"]):
+        move_dec = Decimal(str(move))
+        scalar = calculate_what_if_exposure(book, abs(move_dec), move_dec > 0)
+        expected = {
+            "total_what_if_exposure": scalar["total_what_if_exposure"],
+            "net_loss": scalar["net_loss"],
+            "what_if_equity": calculate_what_if_down_equity(book, -move_dec) + scalar["net_loss"],
+        }
+        for key, expected_value in expected.items():
+            actual = Decimal(str(result[key][j]))
+            tolerance = max(SCENARIO_ABS_TOLERANCE, abs(expected_value) * SCENARIO_REL_TOLERANCE)
+            if abs(actual - expected_value) > tolerance:
+                mismatches.append({
+                    "move": move_dec,
+                    "field": key,
+                    "expected": expected_value,
+                    "actual": actual,
+                })
+
+    if mismatches:
+        logger.warning("Scenario engine diverged from Decimal path on %d values", len(mismatches))
+    return mismatches
 
 def safe_trade_dataframe(tradeHistory, required_fields=None):
     if required_fields is None:
@@ -504,7 +782,7 @@ def process_standard_options(tradeHistory):
     logger.info("Starting process_standard_options for %d trades", len(tradeHistory))
     df = safe_trade_dataframe(tradeHistory, required_fields=["symbol", "code"])
     df = df[df['symbol'].apply(lambda x: isinstance(x, str))]
-    df.loc[:, 'letter'] = df['symbol'].apply(lambda x: extract_number_and_letter(x)[1])
+    df.loc[:, 'letter'] = parse_option_symbols(df['symbol'])['option_type']
     df = df[df['letter'].isin(['C', 'P'])]
     df.loc[:, 'code_upper'] = df['code'].str.upper()
     contracts_sold = df[df['code_upper'] == 'O'].shape[0]
@@ -543,7 +821,7 @@ def match_standard_options(closed_positions):
     df = pd.DataFrame(closed_positions)
     df = df[df['code'].str.upper() != "C;EP"]
     logger.debug("After filtering out code 'C;EP': %d trades", len(df))
-    df['option_letter'] = df['symbol'].apply(lambda s: extract_number_and_letter(s)[1])
+    df['option_letter'] = parse_option_symbols(df['symbol'])['option_type']
     
     calls_df = df[df['option_letter'] == "C"]
     puts_df = df[df['option_letter'] == "P"]
@@ -567,7 +845,7 @@ def process_assigned_trades(tradeHistory):
     df = safe_trade_dataframe(tradeHistory, required_fields=["symbol", "code"])
 
     df = df[df['symbol'].apply(lambda x: isinstance(x, str))]
-    df.loc[:, 'letter'] = df['symbol'].apply(lambda x: extract_number_and_letter(x)[1])
+    df.loc[:, 'letter'] = parse_option_symbols(df['symbol'])['option_type']
     df = df[~df['letter'].isin(['C', 'P'])]
     df.loc[:, 'code_upper'] = df['code'].str.upper()
     
@@ -608,156 +886,267 @@ def calculate_options_premiums(tradeHistory):
     logger.info("Options premiums calculated: %s", premiums)
     return premiums
 
-def calculate_portfolio_premiums():
-    logger.info("Starting calculate_portfolio_premiums")
-    total_trade_history = Trade_History.objects.all()
-    account_ids = total_trade_history.values_list('account_id', flat=True).distinct()
-    portfolio_premiums = []
-    logger.info("Found %d unique account IDs", len(account_ids))
-
-    for account_id in account_ids:
-        trade_history = total_trade_history.filter(account_id=account_id)
-        if not trade_history.exists():
-            logger.debug("No trades for account_id: %s", account_id)
-            continue
+def build_account_premium_data(account_id, premium, first_date, last_date):
+    return {
+        "account_id": account_id,
+        "total_contracts_sold": premium["total_contracts_sold"],
+        "expired_calls": premium["expired_calls"],
+        "expired_call_premiums": premium["expired_call_premiums"],
+        "expired_puts": premium["expired_puts"],
+        "expired_put_premiums": premium["expired_put_premiums"],
+        "calls_bought_back": premium["calls_bought_back"],
+        "pnl_calls_bought_back": premium["pnl_calls_bought_back"],
+        "puts_bought_back": premium["puts_bought_back"],
+        "pnl_puts_bought_back": premium["pnl_puts_bought_back"],
+        "assigned_closed_count": premium["assigned_closed_count"],
+        "assigned_closed_realized_pnl": premium["assigned_closed_realized_pnl"],
+        "assigned_opened_count": premium["assigned_opened_count"],
+        "assigned_opened_mtm_pnl": premium["assigned_opened_mtm_pnl"],
+        "expired_contracts_premiums": premium["expired_call_premiums"] + premium["expired_put_premiums"],
+        "bought_back_contracts_pnl": premium["pnl_calls_bought_back"] + premium["pnl_puts_bought_back"],
+        "assigned_contracts_pnl": premium["assigned_closed_realized_pnl"] + premium["assigned_opened_mtm_pnl"],
+        "total_premiums": (
+            premium["expired_call_premiums"] + premium["expired_put_premiums"] +
+            premium["pnl_calls_bought_back"] + premium["pnl_puts_bought_back"] +
+            premium["assigned_closed_realized_pnl"] + premium["assigned_opened_mtm_pnl"]
+        ),
+        "first_date": first_date,
+        "last_date": last_date
+    }
 
-        dates = trade_history.aggregate(first_date=Min('date'), last_date=Max('date'))
-        first_date = dates['first_date']
-        last_date = dates['last_date']
-        logger.debug("Account %s: first_date=%s, last_date=%s", account_id, first_date, last_date)
-
-        premium = calculate_options_premiums(trade_history)
-        
-        account_data = {
-            "account_id": account_id,
-            "total_contracts_sold": premium["total_contracts_sold"],
-            "expired_calls": premium["expired_calls"],
-            "expired_call_premiums": premium["expired_call_premiums"],
-            "expired_puts": premium["expired_puts"],
-            "expired_put_premiums": premium["expired_put_premiums"],
-            "calls_bought_back": premium["calls_bought_back"],
-            "pnl_calls_bought_back": premium["pnl_calls_bought_back"],
-            "puts_bought_back": premium["puts_bought_back"],
-            "pnl_puts_bought_back": premium["pnl_puts_bought_back"],
-            "assigned_closed_count": premium["assigned_closed_count"],
-            "assigned_closed_realized_pnl": premium["assigned_closed_realized_pnl"],
-            "assigned_opened_count": premium["assigned_opened_count"],
-            "assigned_opened_mtm_pnl": premium["assigned_opened_mtm_pnl"],
-            "expired_contracts_premiums": premium["expired_call_premiums"] + premium["expired_put_premiums"],
-            "bought_back_contracts_pnl": premium["pnl_calls_bought_back"] + premium["pnl_puts_bought_back"],
-            "assigned_contracts_pnl": premium["assigned_closed_realized_pnl"] + premium["assigned_opened_mtm_pnl"],
-            "total_premiums": (
-                premium["expired_call_premiums"] + premium["expired_put_premiums"] +
-                premium["pnl_calls_bought_back"] + premium["pnl_puts_bought_back"] +
-                premium["assigned_closed_realized_pnl"] + premium["assigned_opened_mtm_pnl"]
-            ),
-            "first_date": first_date,
-            "last_date": last_date
-        }
-        portfolio_premiums.append(account_data)
-        logger.debug("Processed account %s: %s", account_id, account_data)
+def calculate_account_premiums(account_id, trade_history):
+    dates = [t.date for t in trade_history if t.date is not None]
+    first_date = min(dates) if dates else None
+    last_date = max(dates) if dates else None
+    logger.debug("Account %s: first_date=%s, last_date=%s", account_id, first_date, last_date)
+
+    premium = calculate_options_premiums(trade_history)
+
+    account_data = build_account_premium_data(account_id, premium, first_date, last_date)
+    logger.debug("Processed account %s: %s", account_id, account_data)
+    return account_data
+
+def calculate_account_premiums_for_range(account_id, start_date=None, end_date=None):
+    premium, first_date, last_date = premium_range(account_id, start_date, end_date)
+    return build_account_premium_data(account_id, premium, first_date, last_date)
+
+def calculate_portfolio_premiums(start_date=None, end_date=None, processes=None):
+    logger.info("Starting calculate_portfolio_premiums")
+    if start_date is not None or end_date is not None:
+        portfolio_premiums = [
+            build_account_premium_data(account_id, premium, first_date, last_date)
+            for account_id, (premium, first_date, last_date) in premium_ranges(start_date, end_date).items()
+        ]
+        logger.info("Finished calculate_portfolio_premiums, processed %d accounts", len(portfolio_premiums))
+        return portfolio_premiums
+
+    if processes is not None and processes > 1:
+        # Loading and parsing happen in the pool workers.
+        with stage("compute"):
+            totals = premium_totals_parallel(processes)
+    elif Trade_History.objects.filter(option_fields_parsed=False).exists():
+        with stage("parse"):
+            df = load_trade_history_frame()
+        count("trade_history_rows", len(df))
+        with stage("compute"):
+            totals = premium_totals(df)
+    else:
+        with stage("compute"):
+            totals = premium_totals_sql()
+    date_bounds = indexed_date_bounds()
+    portfolio_premiums = [
+        build_account_premium_data(account_id, premium, *date_bounds.get(account_id, (first_date, last_date)))
+        for account_id, premium, first_date, last_date in totals
+    ]
     logger.info("Finished calculate_portfolio_premiums, processed %d accounts", len(portfolio_premiums))
     return portfolio_premiums
 
-def calculate_all_portfolio_aths():
-    results = {}
-    submissions_qs = ATHSubmission.objects.all().values(
-        'account_id', 'portfolioATHValue', 'portfolioATHDate', 'currentNAVValue'
-    )
-    sub_df = pd.DataFrame(list(submissions_qs))
-    if sub_df.empty:
-        return results
+def calculate_account_ath(row, trades):
+    account_id = row['account_id']
+    submitted_value = Decimal(str(row['portfolioATHValue'])) if row['portfolioATHValue'] is not None else Decimal('0.0')
+    ath_date = row['portfolioATHDate']
+    currentNAVValue = Decimal(str(row['currentNAVValue'])) if row.get('currentNAVValue') is not None else Decimal('0.0')
+    if isinstance(ath_date, (datetime, date)):
+        ath_date_str = ath_date.strftime("%Y-%m-%d")
+    else:
+        ath_date_str = ath_date
+
+    equity_values = Decimal('0.0')
+    original_equity_values = Decimal('0.0')
+    total_options_value = Decimal('0.0') 
+    total_futures_values = Decimal('0.0')
+    total_original_futures_values = Decimal('0.0')
+
+    trades_df = pd.DataFrame(trades, columns=['stock_name', 'quantity', 'market_value', 'price'])
+    if trades_df.empty:
+        return account_id, {
+            "new_ath_value": Decimal('0.0'),
+            "ath_difference": -submitted_value,
+            "total_options_value": total_options_value,
+        }
 
-    for idx, row in sub_df.iterrows():
-        account_id = row['account_id']
-        submitted_value = Decimal(str(row['portfolioATHValue'])) if row['portfolioATHValue'] is not None else Decimal('0.0')
-        ath_date = row['portfolioATHDate']
-        currentNAVValue = Decimal(str(row['currentNAVValue'])) if row.get('currentNAVValue') is not None else Decimal('0.0')
-        if isinstance(ath_date, (datetime, date)):
-            ath_date_str = ath_date.strftime("%Y-%m-%d")
-        else:
-            ath_date_str = ath_date
+    parsed = parse_option_symbols(trades_df['stock_name'])
+    option_mask = parsed['option_type'].isin(["C", "P"])
+    if not trades_df[option_mask].empty:
+        options_sum = trades_df.loc[option_mask, 'market_value'].sum()
+        total_options_value = Decimal(str(options_sum))
+
+    trades_df = trades_df[~option_mask].copy()
+
+    underlyings = parsed.loc[~option_mask, 'underlying']
+    normalized = {symbol: normalize_stock_symbol(symbol) for symbol in underlyings.dropna().unique()}
+    trades_df['stock_symbol'] = underlyings.map(normalized)
+    trades_df = trades_df.dropna(subset=['stock_symbol']).copy()
+    unique_symbols = trades_df['stock_symbol'].unique()
+    price_dict = fetch_concurrently(lambda sym: fetch_stock_price_by_date(sym, ath_date_str), unique_symbols)
+
+    trades_df['stock_price'] = trades_df['stock_symbol'].map(price_dict)
+    trades_df['multiplier'] = trades_df['stock_symbol'].apply(lambda x: get_multiplier(NET_LOSS_MULTIPLIERS, x))
+    futures_df = trades_df[trades_df['multiplier'].notnull()].copy()
+    equity_df = trades_df[trades_df['multiplier'].isnull()].copy()
+
+    def calc_futures_value(row):
+        mult = Decimal(str(row['multiplier']))
+        qty = Decimal(str(row['quantity']))
+        return row['stock_price'] * qty * mult
+
+    def calc_original_futures_value(row):
+        mult = Decimal(str(row['multiplier']))
+        qty = Decimal(str(row['quantity']))
+        trade_price = Decimal(str(row['price']))
+        return qty * mult * trade_price
+
+    if not futures_df.empty:
+        futures_df['futures_values'] = futures_df.apply(calc_futures_value, axis=1)
+        futures_df['original_futures_values'] = futures_df.apply(calc_original_futures_value, axis=1)
+        total_futures_values = futures_df['futures_values'].sum()
+        total_original_futures_values = futures_df['original_futures_values'].sum()
+    else:
+        total_futures_values = Decimal('0.0')
+        total_original_futures_values = Decimal('0.0')
 
+    if not equity_df.empty:
+        equity_df['new_equity_value'] = equity_df.apply(
+            lambda r: r['stock_price'] * Decimal(str(r['quantity'])), axis=1
+        )
+        equity_values = equity_df['new_equity_value'].sum()
+        equity_df['original_equity_value'] = equity_df.apply(
+            lambda r: Decimal(str(r['quantity'])) * Decimal(str(r['price'])), axis=1
+        )
+        original_equity_values = equity_df['original_equity_value'].sum()
+    else:
         equity_values = Decimal('0.0')
         original_equity_values = Decimal('0.0')
-        total_options_value = Decimal('0.0') 
-        total_futures_values = Decimal('0.0')
-        total_original_futures_values = Decimal('0.0')
 
-        trades = Trade.objects.filter(account_id=account_id).values('stock_name', 'quantity', 'market_value', 'price')
-        trades_df = pd.DataFrame(list(trades))
-        if trades_df.empty:
-            results[account_id] = {
-                "new_ath_value": Decimal('0.0'),
-                "ath_difference": -submitted_value,
-                "total_options_value": total_options_value,
-            }
-            continue
+    equity_diff = equity_values - original_equity_values
+    net_difference = total_futures_values - total_original_futures_values
 
-        option_mask = trades_df['stock_name'].apply(lambda x: extract_number_and_letter(x)[1] in ["C", "P"])
-        if not trades_df[option_mask].empty:
-            options_sum = trades_df.loc[option_mask, 'market_value'].sum()
-            total_options_value = Decimal(str(options_sum))
+    new_ath_value = currentNAVValue + equity_diff + net_difference
+    ath_difference = new_ath_value - submitted_value
+    return account_id, {
+        "new_ath_value": new_ath_value,
+        "ath_difference": ath_difference,
+        "total_options_value": total_options_value,
+    }
 
-        trades_df = trades_df[~option_mask].copy()
+def calculate_all_portfolio_aths_batch():
+    submissions = ath_submission_frame(
+        ATHSubmission.objects.all().values('account_id', 'portfolioATHValue', 'portfolioATHDate', 'currentNAVValue')
+    )
+    if submissions.empty:
+        return {}
 
-        trades_df['stock_symbol'] = trades_df['stock_name'].apply(
-            lambda x: normalize_stock_symbol(extract_stock_symbol(x)) if extract_stock_symbol(x) else None
+    with stage("parse"):
+        trades = ath_trade_frame(
+            Trade.objects.filter(account_id__in=set(submissions['account_id'].dropna()))
+            .values(*ATH_TRADE_FIELDS)
         )
-        trades_df = trades_df.dropna(subset=['stock_symbol']).copy()
-        unique_symbols = trades_df['stock_symbol'].unique()
-        price_dict = {}
-        for sym in unique_symbols:
-            price = fetch_stock_price_by_date(sym, ath_date_str)
-            price_dict[sym] = price
-            #print(f"Fetched ATH price for {sym} on {ath_date_str}: {price}")
-
-        trades_df['stock_price'] = trades_df['stock_symbol'].map(price_dict)
-        trades_df['multiplier'] = trades_df['stock_symbol'].apply(lambda x: get_multiplier(NET_LOSS_MULTIPLIERS, x))
-        futures_df = trades_df[trades_df['multiplier'].notnull()].copy()
-        equity_df = trades_df[trades_df['multiplier'].isnull()].copy()
-
-        def calc_futures_value(row):
-            mult = Decimal(str(row['multiplier']))
-            qty = Decimal(str(row['quantity']))
-            return row['stock_price'] * qty * mult
-
-        def calc_original_futures_value(row):
-            mult = Decimal(str(row['multiplier']))
-            qty = Decimal(str(row['quantity']))
-            trade_price = Decimal(str(row['price']))
-            return qty * mult * trade_price
-
-        if not futures_df.empty:
-            futures_df['futures_values'] = futures_df.apply(calc_futures_value, axis=1)
-            futures_df['original_futures_values'] = futures_df.apply(calc_original_futures_value, axis=1)
-            total_futures_values = futures_df['futures_values'].sum()
-            total_original_futures_values = futures_df['original_futures_values'].sum()
-        else:
-            total_futures_values = Decimal('0.0')
-            total_original_futures_values = Decimal('0.0')
-
-        if not equity_df.empty:
-            equity_df['new_equity_value'] = equity_df.apply(
-                lambda r: r['stock_price'] * Decimal(str(r['quantity'])), axis=1
-            )
-            equity_values = equity_df['new_equity_value'].sum()
-            equity_df['original_equity_value'] = equity_df.apply(
-                lambda r: Decimal(str(r['quantity'])) * Decimal(str(r['price'])), axis=1
-            )
-            original_equity_values = equity_df['original_equity_value'].sum()
-        else:
-            equity_values = Decimal('0.0')
-            original_equity_values = Decimal('0.0')
+        positions = ath_positions(submissions, trades)
+        pairs = ath_price_pairs(positions)
+    count("ath_trades", len(trades))
+    count("ath_price_pairs", len(pairs))
+    with stage("fetch"):
+        prices = fetch_concurrently(lambda pair: fetch_stock_price_by_date(*pair), pairs)
+    logger.info("Priced %d symbol/date pairs for %d ATH submissions", len(pairs), len(submissions))
+    with stage("compute"):
+        return portfolio_ath_values(submissions, positions, prices)
+
+def calculate_all_portfolio_aths(max_workers=ACCOUNT_MAX_WORKERS, batch=True):
+    if batch:
+        return calculate_all_portfolio_aths_batch()
 
-        equity_diff = equity_values - original_equity_values
-        net_difference = total_futures_values - total_original_futures_values
+    results = {}
+    submissions_qs = ATHSubmission.objects.all().values(
+        'account_id', 'portfolioATHValue', 'portfolioATHDate', 'currentNAVValue'
+    )
+    sub_df = pd.DataFrame(list(submissions_qs))
+    if sub_df.empty:
+        return results
 
-        new_ath_value = currentNAVValue + equity_diff + net_difference
-        ath_difference = new_ath_value - submitted_value
-        results[account_id] = {
-            "new_ath_value": new_ath_value,
-            "ath_difference": ath_difference,
-            "total_options_value": total_options_value,
-        }
+    trades_by_account = group_by_account(
+        Trade.objects.filter(account_id__in=set(sub_df['account_id'].dropna()))
+        .values('account_id', 'stock_name', 'quantity', 'market_value', 'price'),
+        key=lambda trade: trade['account_id'],
+    )
+    account_results = map_accounts(
+        calculate_account_ath,
+        ((row, trades_by_account.get(row['account_id'], [])) for _, row in sub_df.iterrows()),
+        max_workers=max_workers,
+    )
+    for account_id, account_result in account_results:
+        results[account_id] = account_result
     return results
+
+def _ath_data_version():
+    return get_portfolio_trades_version(), get_ath_submissions_version()
+
+# name: (params, compute, data_version). data_version reads the counters of
+# the rows a result is computed from; a snapshot taken at another version
+# is stale.
+DASHBOARD_SNAPSHOTS = {
+    "exposures": (
+        _exposure_params(DEFAULT_PERCENTAGE_UP, DEFAULT_PERCENTAGE_DOWN, DEFAULT_EXPIRATION_THRESHOLD),
+        lambda: calculate_portfolio_exposures(
+            DEFAULT_PERCENTAGE_UP, DEFAULT_PERCENTAGE_DOWN, DEFAULT_EXPIRATION_THRESHOLD
+        ),
+        get_portfolio_trades_version,
+    ),
+    "premiums": ({}, calculate_portfolio_premiums, get_trade_history_version),
+    "aths": ({}, calculate_all_portfolio_aths, _ath_data_version),
+}
+
+def refresh_dashboard_snapshots(names=None):
+    prefetch_portfolio_prices()
+    versions = {}
+    for name in names or DASHBOARD_SNAPSHOTS:
+        params, compute, data_version = DASHBOARD_SNAPSHOTS[name]
+        with stage(f"snapshot_{name}"):
+            # Read before computing: a change made mid-refresh leaves the
+            # snapshot stale instead of hiding the change.
+            current = data_version()
+            versions[name] = store_snapshot(name, compute(), params, data_version=current)
+    logger.info("Refreshed dashboard snapshots: %s", versions)
+    return versions
+
+def _snapshot_or_compute(name, params, compute):
+    snapshot = latest_snapshot(name)
+    data_version = DASHBOARD_SNAPSHOTS[name][2]
+    if snapshot is not None and snapshot["params"] == params and snapshot["data_version"] == data_version():
+        return snapshot["data"]
+    return compute()
+
+def get_portfolio_exposures(percentageUp=DEFAULT_PERCENTAGE_UP, percentageDown=DEFAULT_PERCENTAGE_DOWN,
+                            expirationThreshold=DEFAULT_EXPIRATION_THRESHOLD):
+    return _snapshot_or_compute(
+        "exposures",
+        _exposure_params(percentageUp, percentageDown, expirationThreshold),
+        lambda: calculate_portfolio_exposures(percentageUp, percentageDown, expirationThreshold),
+    )
+
+def get_portfolio_premiums(start_date=None, end_date=None):
+    if start_date is not None or end_date is not None:
+        return calculate_portfolio_premiums(start_date, end_date)
+    return _snapshot_or_compute("premiums", {}, calculate_portfolio_premiums)
+
+def get_all_portfolio_aths():
+    return _snapshot_or_compute("aths", {}, calculate_all_portfolio_aths)
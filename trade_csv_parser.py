@@ -1,12 +1,15 @@
 import csv
 from decimal import Decimal
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from django.db import transaction
 from api.models import Trade
+from api.utils.option_fields import apply_option_fields
+from api.utils.csv_import_utils import IMPORT_CHUNK_SIZE, iter_chunks, iter_in_background, quantize_decimal_fields
+from api.utils.position_book import invalidate_position_book
 
-def parse_ibkr_trades(filename: str) -> List[Dict[str, Any]]:
-    parsed_trades = []
+IMPORT_BATCH_SIZE = 1000
 
+def iter_ibkr_trades(filename: str) -> Iterator[Dict[str, Any]]:
     with open(filename, newline='', encoding='utf-8-sig') as f:
         reader = csv.reader(f)
         header_found = False
@@ -27,7 +30,7 @@ def parse_ibkr_trades(filename: str) -> List[Dict[str, Any]]:
                     cost_basis = Decimal(row[9].strip().replace(',', '')) if row[9].strip() else Decimal('0')
                     gain_loss = Decimal(row[13].strip().replace(',', '')) if row[13].strip() else Decimal('0')
 
-                    trade_dict = {
+                    yield {
                         'stock_name': symbol,
                         'quantity': quantity,
                         'price': price,
@@ -35,32 +38,28 @@ def parse_ibkr_trades(filename: str) -> List[Dict[str, Any]]:
                         'cost_basis': cost_basis,
                         'gain_loss': gain_loss
                     }
-                    parsed_trades.append(trade_dict)
                 except Exception as e:
                     print(f"Skipping row due to error: {e}")
                     continue
 
-    return parsed_trades
-
-def parse_schwab_trades(filename: str) -> List[Dict[str, Any]]:
-    parsed_trades = []
+def parse_ibkr_trades(filename: str) -> List[Dict[str, Any]]:
+    return list(iter_ibkr_trades(filename))
 
+def iter_schwab_trades(filename: str) -> Iterator[Dict[str, Any]]:
     with open(filename, newline='', encoding='utf-8-sig') as f:
-        lines = f.readlines()
-
-    header_index = None
-    for idx, line in enumerate(lines):
-        if line.startswith('"Symbol"'):
-            header_index = idx
-            break
+        header_found = False
+        for line in f:
+            if line.startswith('"Symbol"'):
+                header_found = True
+                break
 
-    if header_index is None:
-        print("No header row found in the Schwab file.")
-        return []
+        if not header_found:
+            print("No header row found in the Schwab file.")
+            return
 
-    reader = csv.reader(lines[header_index:])
-    next(reader) 
+        yield from _iter_schwab_rows(csv.reader(f))
 
+def _iter_schwab_rows(reader) -> Iterator[Dict[str, Any]]:
     for row in reader:
         try:
             if len(row) < 11:
@@ -72,7 +71,7 @@ def parse_schwab_trades(filename: str) -> List[Dict[str, Any]]:
 
             if "Cash & Cash Investments" in symbol:
                 market_value = Decimal(row[6].replace(',', '').replace('$', '')) if row[6].strip() else Decimal('0')
-                trade_dict = {
+                yield {
                     'stock_name': "Cash & Cash Investments",
                     'quantity': Decimal('0'), 
                     'price': Decimal('0'),  
@@ -80,7 +79,6 @@ def parse_schwab_trades(filename: str) -> List[Dict[str, Any]]:
                     'cost_basis': Decimal('0'),
                     'gain_loss': Decimal('0')
                 }
-                parsed_trades.append(trade_dict)
                 continue
 
             quantity = int(float(row[2].replace(',', '')))
@@ -97,19 +95,36 @@ def parse_schwab_trades(filename: str) -> List[Dict[str, Any]]:
                 'cost_basis': cost_basis,
                 'gain_loss': gain_loss
             }
-            parsed_trades.append(trade_dict)
         except Exception as e:
             print(f"Skipping row due to error: {e}")
             continue
+        yield trade_dict
+
+def parse_schwab_trades(filename: str) -> List[Dict[str, Any]]:
+    return list(iter_schwab_trades(filename))
 
-    return parsed_trades
+def build_trade_objects(trades: List[Dict[str, Any]], account_id: int):
+    trade_objects = []
+    errors = []
 
-def import_trades_from_csv(filename: str, account_id: int, csv_type: str) -> Dict[str, Any]:
+    for trade_data in trades:
+        try:
+            trade_data['account_id'] = account_id
+            trade = quantize_decimal_fields(apply_option_fields(Trade(**trade_data)))
+            trade.full_clean(validate_unique=False)
+            trade_objects.append(trade)
+        except Exception as e:
+            errors.append(f"Error importing trade {trade_data.get('stock_name', 'Unknown')}: {str(e)}")
+
+    return trade_objects, errors
+
+def import_trades_from_csv(filename: str, account_id: int, csv_type: str, batch_size: int = IMPORT_BATCH_SIZE,
+                           chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict[str, Any]:
     try:
         if csv_type.lower() == 'ibkr':
-            trades = parse_ibkr_trades(filename)
+            trades = iter_ibkr_trades(filename)
         elif csv_type.lower() == 'schwab':
-            trades = parse_schwab_trades(filename)
+            trades = iter_schwab_trades(filename)
         else:
             return {
                 'success': False,
@@ -118,25 +133,31 @@ def import_trades_from_csv(filename: str, account_id: int, csv_type: str) -> Dic
                 'errors': ['Unsupported CSV type']
             }
 
-        if not trades:
-            return {
-                'success': False,
-                'message': 'No valid trades found in the CSV file.',
-                'total_trades': 0,
-                'errors': []
-            }
+        validated_chunks = iter_in_background(
+            build_trade_objects(chunk, account_id)
+            for chunk in iter_chunks(trades, chunk_size)
+        )
 
         with transaction.atomic():
+            parsed_count = 0
             imported_count = 0
             errors = []
 
-            for trade_data in trades:
-                try:
-                    trade_data['account_id'] = account_id
-                    Trade.objects.create(**trade_data)
-                    imported_count += 1
-                except Exception as e:
-                    errors.append(f"Error importing trade {trade_data.get('stock_name', 'Unknown')}: {str(e)}")
+            for trade_objects, chunk_errors in validated_chunks:
+                parsed_count += len(trade_objects) + len(chunk_errors)
+                errors.extend(chunk_errors)
+                Trade.objects.bulk_create(trade_objects, batch_size=batch_size)
+                imported_count += len(trade_objects)
+
+            if not parsed_count:
+                return {
+                    'success': False,
+                    'message': 'No valid trades found in the CSV file.',
+                    'total_trades': 0,
+                    'errors': []
+                }
+
+            transaction.on_commit(lambda: invalidate_position_book(account_id))
 
             if errors and imported_count == 0:
                 raise Exception("No trades were imported successfully.")
@@ -1,13 +1,16 @@
 import csv
 from decimal import Decimal
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from django.db import transaction
 from api.models import Trade_History
+from api.utils.option_fields import apply_option_fields
+from api.utils.premium_index import bump_trade_history_version, update_premium_index
+from api.utils.csv_import_utils import IMPORT_CHUNK_SIZE, iter_chunks, iter_in_background, quantize_decimal_fields
 
-def parse_raw_ibkr(filename: str) -> List[Dict[str, Any]]:
-    parsed_orders = []
+IMPORT_BATCH_SIZE = 1000
 
+def iter_raw_ibkr(filename: str) -> Iterator[Dict[str, Any]]:
     with open(filename, newline='', encoding='utf-8-sig') as f:
         reader = csv.reader(f)
         header_found = False
@@ -34,7 +37,7 @@ def parse_raw_ibkr(filename: str) -> List[Dict[str, Any]]:
                     mtm_pl = Decimal(row[14].strip().replace(',', '')) if row[14].strip() else Decimal('0')
                     code = row[15].strip() if len(row) > 15 else ''
 
-                    trade_dict = {
+                    yield {
                         'symbol': symbol,
                         'date': date,
                         'quantity': quantity,
@@ -47,40 +50,61 @@ def parse_raw_ibkr(filename: str) -> List[Dict[str, Any]]:
                         'mtm_profit_loss': mtm_pl,
                         'code': code
                     }
-                    parsed_orders.append(trade_dict)
                 except Exception as e:
                     print(f"Skipping row due to error: {e}")
                     continue
 
-    return parsed_orders
+def parse_raw_ibkr(filename: str) -> List[Dict[str, Any]]:
+    return list(iter_raw_ibkr(filename))
+
+def build_trade_objects(trades: List[Dict[str, Any]], account_id: int):
+    trade_objects = []
+    errors = []
 
-def import_trades_from_csv(filename: str, account_id: int) -> Dict[str, Any]:
+    for trade_data in trades:
+        try:
+            trade_data['account_id'] = account_id
+            trade = quantize_decimal_fields(apply_option_fields(Trade_History(**trade_data)))
+            trade.full_clean(validate_unique=False)
+            trade_objects.append(trade)
+        except Exception as e:
+            errors.append(f"Error importing trade {trade_data.get('symbol', 'Unknown')}: {str(e)}")
+
+    return trade_objects, errors
+
+def import_trades_from_csv(filename: str, account_id: int, batch_size: int = IMPORT_BATCH_SIZE,
+                           chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict[str, Any]:
     try:
-        trades = parse_raw_ibkr(filename)
-        
-        if not trades:
-            return {
-                'success': False,
-                'message': 'No valid trades found in the CSV file.',
-                'total_trades': 0,
-                'errors': []
-            }
-        
+        validated_chunks = iter_in_background(
+            build_trade_objects(chunk, account_id)
+            for chunk in iter_chunks(iter_raw_ibkr(filename), chunk_size)
+        )
+
         with transaction.atomic():
+            parsed_count = 0
             imported_count = 0
             errors = []
 
-            for trade_data in trades:
-                try:
-                    trade_data['account_id'] = account_id
-                    Trade_History.objects.create(**trade_data)
-                    imported_count += 1
-                except Exception as e:
-                    errors.append(f"Error importing trade {trade_data.get('symbol', 'Unknown')}: {str(e)}")
+            for trade_objects, chunk_errors in validated_chunks:
+                parsed_count += len(trade_objects) + len(chunk_errors)
+                errors.extend(chunk_errors)
+                Trade_History.objects.bulk_create(trade_objects, batch_size=batch_size)
+                update_premium_index(trade_objects)
+                imported_count += len(trade_objects)
+
+            if not parsed_count:
+                return {
+                    'success': False,
+                    'message': 'No valid trades found in the CSV file.',
+                    'total_trades': 0,
+                    'errors': []
+                }
 
             if errors and imported_count == 0:
                 raise Exception("No trades were imported successfully.")
 
+            transaction.on_commit(bump_trade_history_version)
+
             return {
                 'success': True,
                 'message': f"Successfully imported {imported_count} trades" +